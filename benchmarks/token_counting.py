@@ -0,0 +1,88 @@
+"""
+Microbenchmarks for prompt token counting
+
+Compares the previous counting paths (LangChain's
+``get_num_tokens_from_messages`` and a per-call ``tiktoken.encoding_for_model``
+lookup) with ``src.core.tokens.count_message_tokens``.
+
+Run from the repository root:
+
+    python -m benchmarks.token_counting
+"""
+
+import os
+import timeit
+from typing import Callable, Dict, List
+
+import tiktoken
+
+from src.core.tokens import count_message_tokens
+
+MODEL = "gpt-3.5-turbo"
+
+
+def build_messages(turns: int, words_per_message: int) -> List[Dict[str, str]]:
+    """Build a synthetic multi-turn conversation"""
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+    for turn in range(turns):
+        role = "user" if turn % 2 == 0 else "assistant"
+        content = " ".join(f"word{turn}_{i}" for i in range(words_per_message))
+        messages.append({"role": role, "content": content})
+    return messages
+
+
+def uncached_encoder_count(messages: List[Dict[str, str]]) -> int:
+    """Previous utils.count_tokens behaviour: encoder lookup on every call"""
+    total = 0
+    for message in messages:
+        encoding = tiktoken.encoding_for_model(MODEL)
+        total += len(encoding.encode(message["content"]))
+    return total
+
+
+def langchain_count() -> Callable[[List[Dict[str, str]]], int]:
+    """Previous ModelService.count_tokens behaviour via LangChain"""
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    from langchain.chat_models import ChatOpenAI
+    from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+    client = ChatOpenAI(model_name=MODEL)
+    message_map = {
+        "system": SystemMessage,
+        "user": HumanMessage,
+        "assistant": AIMessage,
+    }
+
+    def count(messages: List[Dict[str, str]]) -> int:
+        converted = [message_map[m["role"]](content=m["content"]) for m in messages]
+        return client.get_num_tokens_from_messages(converted)
+
+    return count
+
+
+def bench(name: str, func: Callable[[], int], number: int) -> None:
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {name:<28} {seconds * 1e6:>10.1f} us/call")
+
+
+def main() -> None:
+    candidates = {
+        "count_message_tokens": lambda m: count_message_tokens(m, MODEL),
+        "encoding_for_model per call": uncached_encoder_count,
+    }
+    try:
+        candidates["langchain"] = langchain_count()
+    except ImportError:
+        print("langchain not installed, skipping LangChain baseline")
+
+    for turns, words in [(2, 20), (20, 100), (100, 400)]:
+        messages = build_messages(turns, words)
+        tokens = count_message_tokens(messages, MODEL)
+        number = max(1, 20_000 // (turns * words))
+        print(f"{turns} messages, {tokens} tokens:")
+        for name, func in candidates.items():
+            bench(name, lambda func=func: func(messages), number)
+
+
+if __name__ == "__main__":
+    main()
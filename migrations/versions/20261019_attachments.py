@@ -0,0 +1,52 @@
+"""add content-addressed attachments
+
+Revision ID: 20261019_attachments
+Revises: 20261019_prompt_templates
+Create Date: 2026-10-19 11:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261019_attachments'
+down_revision = '20261019_prompt_templates'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    """Create the attachments table"""
+    op.create_table(
+        "attachments",
+        sa.Column("id", sa.String(64), primary_key=True),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("content", sa.LargeBinary(), nullable=False),
+        sa.Column(
+            "token_counts",
+            postgresql.JSON(none_as_null=True),
+            nullable=False,
+            default={},
+        ),
+        sa.Column(
+            "created_by",
+            sa.String(36),
+            sa.ForeignKey("users.id", ondelete="SET NULL"),
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+
+def downgrade() -> None:
+    """Drop the attachments table"""
+    op.drop_table("attachments")
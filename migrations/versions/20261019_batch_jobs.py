@@ -0,0 +1,65 @@
+"""add batch jobs
+
+Revision ID: 20261019_batch_jobs
+Revises: 20261019_attachments
+Create Date: 2026-10-19 12:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261019_batch_jobs'
+down_revision = '20261019_attachments'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    """Create the batch jobs table"""
+    op.create_table(
+        "batch_jobs",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column(
+            "tenant_id",
+            sa.String(36),
+            sa.ForeignKey("tenants.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("api_key_id", sa.String(36), nullable=False),
+        sa.Column("user_id", sa.String(36)),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("input_file_id", sa.String(64), nullable=False),
+        sa.Column("output_file_id", sa.String(64)),
+        sa.Column("total_items", sa.Integer(), nullable=False),
+        sa.Column("completed_items", sa.Integer(), nullable=False, default=0),
+        sa.Column("failed_items", sa.Integer(), nullable=False, default=0),
+        sa.Column("checkpoint_line", sa.Integer(), nullable=False, default=0),
+        sa.Column("input_offset", sa.BigInteger(), nullable=False, default=0),
+        sa.Column("output_offset", sa.BigInteger(), nullable=False, default=0),
+        sa.Column("locked_by", sa.String(255)),
+        sa.Column("locked_until", sa.DateTime(timezone=True)),
+        sa.Column("completed_at", sa.DateTime(timezone=True)),
+        sa.Column("error", sa.String(1024)),
+        sa.Column(
+            "batch_data", postgresql.JSON(none_as_null=True), nullable=False, default={}
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_index("ix_batch_jobs_status", "batch_jobs", ["status"])
+
+def downgrade() -> None:
+    """Drop the batch jobs table"""
+    op.drop_index("ix_batch_jobs_status", table_name="batch_jobs")
+    op.drop_table("batch_jobs")
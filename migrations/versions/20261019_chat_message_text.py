@@ -0,0 +1,27 @@
+"""store chat message content as text
+
+Revision ID: 20261019_chat_message_text
+Revises: 20250218_api_key_user
+Create Date: 2026-10-19 09:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_chat_message_text'
+down_revision = '20250218_api_key_user'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    """Lift the 4096 character limit on chat message content"""
+    op.alter_column(
+        "chat_messages", "content", type_=sa.Text(), existing_nullable=False
+    )
+
+def downgrade() -> None:
+    """Restore the 4096 character limit"""
+    op.alter_column(
+        "chat_messages", "content", type_=sa.String(4096), existing_nullable=False
+    )
@@ -0,0 +1,57 @@
+"""add prompt templates
+
+Revision ID: 20261019_prompt_templates
+Revises: 20261019_chat_message_text
+Create Date: 2026-10-19 10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '20261019_prompt_templates'
+down_revision = '20261019_chat_message_text'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    """Create the prompt templates table"""
+    op.create_table(
+        "prompt_templates",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("name", sa.String(255), unique=True, nullable=False),
+        sa.Column("model", sa.String(255), nullable=False),
+        sa.Column("messages", postgresql.JSON(none_as_null=True), nullable=False),
+        sa.Column(
+            "variables", postgresql.JSON(none_as_null=True), nullable=False, default=[]
+        ),
+        sa.Column("static_prefix_length", sa.Integer(), nullable=False),
+        sa.Column(
+            "static_prefix_tokens",
+            postgresql.JSON(none_as_null=True),
+            nullable=False,
+            default={},
+        ),
+        sa.Column(
+            "created_by",
+            sa.String(36),
+            sa.ForeignKey("users.id", ondelete="SET NULL"),
+        ),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+
+def downgrade() -> None:
+    """Drop the prompt templates table"""
+    op.drop_table("prompt_templates")
@@ -0,0 +1,27 @@
+"""add quota windows
+
+Revision ID: 20261019_quota_windows
+Revises: 20261019_batch_jobs
+Create Date: 2026-10-19 12:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261019_quota_windows'
+down_revision = '20261019_batch_jobs'
+branch_labels = None
+depends_on = None
+
+TABLES = ("tenants", "users", "api_keys")
+
+def upgrade() -> None:
+    """Add the quota window of tenants, users and API keys"""
+    for table in TABLES:
+        op.add_column(table, sa.Column("quota_window", sa.String(16)))
+
+def downgrade() -> None:
+    """Drop the quota window columns"""
+    for table in TABLES:
+        op.drop_column(table, "quota_window")
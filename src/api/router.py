@@ -1,7 +1,8 @@
 from fastapi import APIRouter
 
-from src.api.routes import admin, auth, llm, metrics, users
+from src.api.routes import admin, attachments, auth, batches, jobs, llm, metrics, sessions, templates, tokens, users
 from src.core.logging import get_logger
+from src.services.quota_fallback import get_quota_fallback
 
 # Create logger
 logger = get_logger(__name__)
@@ -14,6 +15,18 @@ api_router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 
 api_router.include_router(llm.router, tags=["LLM API"])
 
+api_router.include_router(tokens.router, tags=["Tokens"])
+
+api_router.include_router(sessions.router, prefix="/sessions", tags=["Chat Sessions"])
+
+api_router.include_router(templates.router, prefix="/templates", tags=["Prompt Templates"])
+
+api_router.include_router(attachments.router, prefix="/attachments", tags=["Attachments"])
+
+api_router.include_router(batches.router, tags=["Batches"])
+
+api_router.include_router(jobs.router, prefix="/jobs", tags=["Async Jobs"])
+
 api_router.include_router(admin.router, prefix="/admin", tags=["Administration"])
 
 api_router.include_router(users.router, prefix="/users", tags=["User Management"])
@@ -23,8 +36,13 @@ api_router.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
 # Health check endpoint only (other routes are included from modules)
 @api_router.get("/health", tags=["System"])
 async def health_check() -> dict:
-    """Health check endpoint"""
-    return {"status": "healthy", "version": "0.1.0"}
+    """Health check endpoint, reporting degraded quota enforcement"""
+    fallback = await get_quota_fallback()
+    return {
+        "status": "degraded" if fallback.active else "healthy",
+        "version": "0.1.0",
+        "quota": fallback.status(),
+    }
 
 # OpenAPI customization
 api_router.title = "LLM Backend API"
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
 
 from src.core.auth import AuthService, check_permissions, get_current_tenant_and_key
+from src.core.bulkhead import Bulkhead
 from src.core.database import create_tenant_database, get_tenant_db_session
 from src.core.exceptions import DatabaseError
 from src.core.utils import validate_tenant_config
@@ -49,6 +50,7 @@ async def create_tenant(
                 id=tenant_id,
                 name=tenant_data.name,
                 quota_limit=tenant_data.quota_limit,
+                quota_window=tenant_data.quota_window,
                 config=tenant_data.config,
             )
             session.add(tenant)
@@ -97,6 +99,8 @@ async def update_tenant(
             tenant.name = update_data.name
         if update_data.quota_limit is not None:
             tenant.quota_limit = update_data.quota_limit
+        if update_data.quota_window is not None:
+            tenant.quota_window = update_data.quota_window
         if update_data.is_active is not None:
             tenant.is_active = update_data.is_active
         if update_data.config is not None:
@@ -127,6 +131,8 @@ async def create_api_key(
             name=key_data.name,
             key_hash=key_hash,
             permissions=key_data.permissions,
+            quota_limit=key_data.quota_limit,
+            quota_window=key_data.quota_window,
             expires_at=key_data.expires_at,
         )
         session.add(api_key)
@@ -215,7 +221,7 @@ async def get_tenant_usage(
     permissions: None = Depends(check_permissions({"admin:read_usage"})),
 ) -> Dict:
     """Get token usage statistics for a tenant"""
-    async with get_tenant_db_session(tenant_id) as session:
+    async with get_tenant_db_session(tenant_id, Bulkhead.BACKGROUND) as session:
         # Get usage logs for the period
         result = await session.execute(
             select(UsageLog).where(
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+
+from src.core.auth import get_current_tenant_and_key
+from src.core.config import get_settings
+from src.models.system import APIKey, Tenant
+from src.schemas import AttachmentResponse
+from src.services.attachment import get_attachment_service
+
+settings = get_settings()
+router = APIRouter()
+
+
+@router.post("", response_model=AttachmentResponse)
+async def upload_attachment(
+    request: Request,
+    response: Response,
+    model: str = Query(settings.DEFAULT_MODEL),
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> AttachmentResponse:
+    """
+    Upload message content for reuse across requests
+
+    The request body is the UTF-8 text itself. Identical content is stored
+    once; the returned ``id`` is its SHA-256 and can be sent as a message's
+    ``content_ref`` in chat completions.
+    """
+    tenant, api_key = tenant_key
+
+    body = bytearray()
+    async for block in request.stream():
+        # Checked before growing, so no more than the limit is ever buffered
+        if len(body) + len(block) > settings.ATTACHMENT_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Attachment too large")
+        body += block
+    try:
+        text = body.decode()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Attachment must be UTF-8 text")
+    if not text:
+        raise HTTPException(status_code=400, detail="Attachment is empty")
+
+    attachment_service = await get_attachment_service()
+    attachment = await attachment_service.store(
+        tenant.id, text, model, created_by=api_key.user_id
+    )
+    response.status_code = 201 if attachment["created"] else 200
+    return AttachmentResponse(
+        id=attachment["id"],
+        size=attachment["size"],
+        model=model,
+        tokens=attachment["tokens"],
+    )
+
+
+@router.get("/{attachment_id}", response_model=AttachmentResponse)
+async def get_attachment(
+    attachment_id: str,
+    model: str = Query(settings.DEFAULT_MODEL),
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> AttachmentResponse:
+    """Get an attachment's size and token count for a model"""
+    tenant, _ = tenant_key
+    attachment_service = await get_attachment_service()
+    attachment = await attachment_service.get(tenant.id, attachment_id, model)
+    if not attachment:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return AttachmentResponse(
+        id=attachment_id,
+        size=attachment["size"],
+        model=model,
+        tokens=attachment["tokens"],
+    )
@@ -0,0 +1,130 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+
+from src.core.auth import get_current_tenant_and_key
+from src.core.logging import get_logger
+from src.models.system import APIKey, BatchJob, Tenant
+from src.schemas import (
+    BatchCreate,
+    BatchFileResponse,
+    BatchRequestCounts,
+    BatchResponse,
+)
+from src.services.batch import BATCH_ENDPOINT, get_batch_service
+
+logger = get_logger(__name__)
+router = APIRouter()
+
+
+def _batch_response(job: BatchJob) -> BatchResponse:
+    return BatchResponse(
+        id=job.id,
+        endpoint=BATCH_ENDPOINT,
+        status=job.status,
+        input_file_id=job.input_file_id,
+        output_file_id=job.output_file_id,
+        created_at=int(job.created_at.timestamp()),
+        completed_at=int(job.completed_at.timestamp()) if job.completed_at else None,
+        request_counts=BatchRequestCounts(
+            total=job.total_items,
+            completed=job.completed_items,
+            failed=job.failed_items,
+        ),
+        error=job.error,
+        metadata=job.batch_data.get("metadata", {}),
+    )
+
+
+@router.post("/files", response_model=BatchFileResponse)
+async def upload_batch_file(
+    request: Request,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> BatchFileResponse:
+    """
+    Upload a JSONL batch input file
+
+    The request body holds one request per line:
+    ``{"custom_id": ..., "method": "POST", "url": "/v1/chat/completions",
+    "body": {"model": ..., "messages": [...]}}``.
+    """
+    tenant, _ = tenant_key
+    batch_service = await get_batch_service()
+    stored = await batch_service.store_file(tenant.id, request.stream())
+    return BatchFileResponse(id=stored["id"], bytes=stored["bytes"], lines=stored["lines"])
+
+
+@router.get("/files/{file_id}/content")
+async def get_batch_file_content(
+    file_id: str,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> FileResponse:
+    """Download a batch input or output file"""
+    tenant, _ = tenant_key
+    batch_service = await get_batch_service()
+    path = batch_service.file_path(tenant.id, file_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(path, media_type="application/x-ndjson")
+
+
+@router.post("/batches", response_model=BatchResponse)
+async def create_batch(
+    batch_data: BatchCreate,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> BatchResponse:
+    """Create a batch from an uploaded input file"""
+    tenant, api_key = tenant_key
+    if batch_data.endpoint != BATCH_ENDPOINT:
+        raise HTTPException(
+            status_code=400, detail=f"Only {BATCH_ENDPOINT} is supported"
+        )
+
+    batch_service = await get_batch_service()
+    job = await batch_service.create_job(
+        tenant.id, api_key, batch_data.input_file_id, batch_data.metadata
+    )
+    logger.info("batch_created", tenant_id=tenant.id, batch_id=job.id, total=job.total_items)
+    return _batch_response(job)
+
+
+@router.get("/batches", response_model=List[BatchResponse])
+async def list_batches(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> List[BatchResponse]:
+    """List batches"""
+    tenant, _ = tenant_key
+    batch_service = await get_batch_service()
+    jobs = await batch_service.list_jobs(tenant.id, offset, limit)
+    return [_batch_response(job) for job in jobs]
+
+
+@router.get("/batches/{batch_id}", response_model=BatchResponse)
+async def get_batch(
+    batch_id: str,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> BatchResponse:
+    """Get a batch and its progress"""
+    tenant, _ = tenant_key
+    batch_service = await get_batch_service()
+    job = await batch_service.get_job(tenant.id, batch_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _batch_response(job)
+
+
+@router.post("/batches/{batch_id}/cancel", response_model=BatchResponse)
+async def cancel_batch(
+    batch_id: str,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> BatchResponse:
+    """Cancel a batch; finished results stay in its output file"""
+    tenant, _ = tenant_key
+    batch_service = await get_batch_service()
+    job = await batch_service.cancel_job(tenant.id, batch_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return _batch_response(job)
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from src.core.auth import get_current_tenant_and_key
+from src.core.config import get_settings
+from src.models.system import APIKey, Tenant
+from src.schemas import GenerationJobResponse
+from src.services.job import get_generation_job_service
+
+settings = get_settings()
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=GenerationJobResponse)
+async def get_generation_job(
+    job_id: str,
+    wait: int = Query(0, ge=0, le=settings.JOB_MAX_WAIT),
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> GenerationJobResponse:
+    """
+    Get an async chat completion job
+
+    With ``wait`` the request is held until the job finishes or ``wait``
+    seconds pass, so clients can long-poll instead of polling in a loop.
+    """
+    tenant, _ = tenant_key
+    job_service = await get_generation_job_service()
+    job = await job_service.get(tenant.id, job_id, wait)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return GenerationJobResponse(**job)
@@ -1,10 +1,22 @@
+import json
 import uuid
+from typing import Any, Dict, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
 
 from src.core.auth import get_current_tenant_and_key
+from src.core.config import get_settings
+from src.core.context import (
+    ContextPolicy,
+    fit_messages,
+    get_context_limit,
+    get_context_policy,
+)
 from src.core.database import get_tenant_db_session
+from src.core.exceptions import LLMBackendException
 from src.core.logging import get_logger
+from src.core.utils import generate_hash
 from src.models.system import APIKey, Tenant
 from src.schemas import (
     ChatCompletionChoice,
@@ -12,12 +24,25 @@ from src.schemas import (
     ChatCompletionResponse,
     ChatCompletionUsage,
     ChatMessage,
+    EmbeddingData,
+    EmbeddingRequest,
+    EmbeddingResponse,
+    EmbeddingUsage,
     ModelInfo,
     ModelsResponse,
 )
+from src.services.attachment import get_attachment_service
+from src.services.cache import get_near_duplicate_cache_service
+from src.services.embedding import get_embedding_service
+from src.services.idempotency import StoredResponse, get_idempotency_service
+from src.services.job import get_generation_job_service
 from src.services.model import get_model_service
 from src.services.quota import get_quota_service
+from src.services.ratelimit import get_rate_limit_service
+from src.services.template import get_prompt_template_service
+from src.services.tokenizer import get_tokenizer_service
 
+settings = get_settings()
 logger = get_logger(__name__)
 router = APIRouter()
 
@@ -25,22 +50,78 @@ router = APIRouter()
 @router.post("/chat/completions", response_model=ChatCompletionResponse)
 async def create_chat_completion(
     request: ChatCompletionRequest,
+    response: Response,
+    async_mode: bool = Query(False, alias="async"),
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", max_length=255
+    ),
     tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
-) -> ChatCompletionResponse:
-    """Create a chat completion"""
+) -> Any:
+    """
+    Create a chat completion
+
+    With ``?async=true`` the request is queued for the generation workers
+    and a job is returned with 202; fetch the result from ``/jobs/{id}``.
+
+    With an ``Idempotency-Key`` header the request runs at most once per key:
+    retries get the stored response (``Idempotent-Replayed: true``), and
+    retries of a request still running wait for it.
+    """
     tenant, api_key = tenant_key
+    if not idempotency_key:
+        return await _create_chat_completion(
+            request, response, async_mode, tenant, api_key
+        )
+
+    async def call() -> StoredResponse:
+        result = await _create_chat_completion(
+            request, response, async_mode, tenant, api_key
+        )
+        if isinstance(result, JSONResponse):
+            return result.status_code, json.loads(result.body), _replay_headers(result)
+        return 200, result.model_dump(), _replay_headers(response)
+
+    idempotency_service = await get_idempotency_service()
+    (status_code, body, headers), replayed = await idempotency_service.execute(
+        tenant.id,
+        idempotency_key,
+        generate_hash({"request": request.model_dump(), "async": async_mode}),
+        call,
+    )
+    headers["Idempotent-Replayed"] = "true" if replayed else "false"
+    return JSONResponse(status_code=status_code, content=body, headers=headers)
+
+
+def _replay_headers(response: Response) -> Dict[str, str]:
+    """Headers of a response worth storing for idempotent replays"""
+    return {
+        name: value
+        for name, value in response.headers.items()
+        if name.startswith("x-") or name == "location"
+    }
 
+
+async def _create_chat_completion(
+    request: ChatCompletionRequest,
+    response: Response,
+    async_mode: bool,
+    tenant: Tenant,
+    api_key: APIKey,
+) -> Union[ChatCompletionResponse, JSONResponse]:
     logger.debug(
         "chat_completion_request",
         tenant_id=tenant.id,
         model=request.model,
-        message_count=len(request.messages)
+        message_count=len(request.messages),
+        template_id=request.template_id,
     )
 
     # Get services
     try:
         model_service = await get_model_service()
         quota_service = await get_quota_service()
+        cache_service = await get_near_duplicate_cache_service()
+        tokenizer = await get_tokenizer_service()
 
         if not model_service.providers:
             raise HTTPException(
@@ -55,27 +136,142 @@ async def create_chat_completion(
             detail=f"Failed to initialize services: {str(e)}",
         )
 
+    # Inline content referenced by attachment hash
+    attachment_service = await get_attachment_service()
+    messages = await attachment_service.resolve(
+        tenant.id,
+        [msg.dict(exclude_none=True) for msg in request.messages],
+        request.model,
+    )
+
+    # Render a stored template in front of the request messages. Its static
+    # prefix was counted when the template was saved.
+    static_length = static_tokens = 0
+    if request.template_id:
+        template_service = await get_prompt_template_service()
+        template = await template_service.get_template(tenant.id, request.template_id)
+        if not template:
+            raise HTTPException(status_code=404, detail="Template not found")
+        rendered, static_length, static_tokens = await template_service.render(
+            template, request.template_variables, request.model
+        )
+        messages = rendered + messages
+    if not messages:
+        raise HTTPException(
+            status_code=400, detail="Either messages or template_id is required"
+        )
+
+    # Serve near-duplicate prompts from the API key's cache when enabled
+    similarity, cached = cache_service.lookup(
+        tenant,
+        api_key.id,
+        messages,
+        request.model,
+        request.temperature,
+        request.max_tokens,
+    )
+    if similarity is not None:
+        response.headers["X-Cache-Similarity"] = f"{similarity:.4f}"
+        response.headers["X-Cache"] = "HIT" if cached else "MISS"
+    if cached:
+        return ChatCompletionResponse(**cached)
+
+    # Fit the conversation into the model's context window before spending
+    # an upstream round trip on it. Exact per-message counts are only needed
+    # when the estimate does not fit, and they are cached for the quota check.
+    context_limit = get_context_limit(
+        request.model, settings.MODEL_CONTEXT_LIMITS, settings.DEFAULT_CONTEXT_LIMIT
+    )
+    estimated_tokens = static_tokens + tokenizer.estimate_messages(
+        messages[static_length:], request.model
+    )
+    if estimated_tokens + (request.max_tokens or 0) > context_limit:
+        policy = get_context_policy(
+            tenant.config, ContextPolicy(settings.DEFAULT_CONTEXT_POLICY)
+        )
+        message_tokens = await tokenizer.count_message_list(messages, request.model)
+        fitted = fit_messages(
+            messages, message_tokens, context_limit, policy, request.max_tokens
+        )
+        if len(fitted) < len(messages):
+            logger.info(
+                "context_trimmed",
+                tenant_id=tenant.id,
+                model=request.model,
+                policy=policy.value,
+                dropped_messages=len(messages) - len(fitted),
+            )
+            response.headers["X-Context-Dropped-Messages"] = str(
+                len(messages) - len(fitted)
+            )
+            messages = fitted
+            estimated_tokens = tokenizer.estimate_messages(messages, request.model)
+
+    # Charge the tenant, key and model TPM/RPM buckets with the estimate;
+    # they are reconciled with the actual usage once it is known
+    rate_limit_service = await get_rate_limit_service()
+    token_lease = await rate_limit_service.admit_tokens(
+        tenant, api_key, request.model, estimated_tokens + (request.max_tokens or 0)
+    )
+
     # Use system database for tenant operations
     async with get_tenant_db_session("system") as session:
         try:
-            # Count tokens in the request
-            input_tokens = await model_service.count_tokens(
-                [msg.dict() for msg in request.messages], request.model
+            # Admit with a fast upper-bound estimate, the exact count only
+            # runs when the estimate falls near a quota limit
+            input_tokens = await quota_service.check_quota(
+                tenant.id,
+                api_key.user_id,
+                estimated_tokens,
+                session,
+                api_key,
+                exact_tokens=lambda: model_service.count_tokens(
+                    messages, request.model
+                ),
             )
-            logger.debug("token_count", tenant_id=tenant.id, input_tokens=input_tokens)
-
-            # Check quota before processing
-            await quota_service.check_quota(
-                tenant.id, api_key.user_id, input_tokens, session, api_key
+            logger.debug(
+                "token_count",
+                tenant_id=tenant.id,
+                estimated_tokens=estimated_tokens,
+                input_tokens=input_tokens,
             )
 
+            if async_mode:
+                job_service = await get_generation_job_service()
+                job = await job_service.enqueue(
+                    tenant.id,
+                    api_key,
+                    messages,
+                    request.model,
+                    request.temperature,
+                    request.max_tokens,
+                    rate_limit_lease=token_lease,
+                )
+                return JSONResponse(
+                    status_code=202,
+                    content={
+                        "id": job["id"],
+                        "object": job["object"],
+                        "model": job["model"],
+                        "status": job["status"],
+                        "created": job["created"],
+                    },
+                    headers={"Location": f"{settings.API_V1_STR}/jobs/{job['id']}"},
+                )
+
             # Generate completion
             result = await model_service.generate(
-                [msg.dict() for msg in request.messages],
+                messages,
                 model=request.model,
                 temperature=request.temperature,
                 max_tokens=request.max_tokens,
             )
+            tokenizer.observe_usage(
+                messages, request.model, result["usage"]["prompt_tokens"]
+            )
+            await rate_limit_service.reconcile_tokens(
+                token_lease, result["usage"]["total_tokens"]
+            )
 
             # Update usage tracking
             try:
@@ -112,7 +308,7 @@ async def create_chat_completion(
                 # Continue since we have the model response
                 # but log the error for investigation
 
-            return ChatCompletionResponse(
+            completion = ChatCompletionResponse(
                 id=f"chatcmpl-{api_key.id}",
                 created=int(result.get("created", 0)),
                 model=request.model,
@@ -131,8 +327,19 @@ async def create_chat_completion(
                     total_tokens=result["usage"]["total_tokens"],
                 ),
             )
+            cache_service.store(
+                tenant,
+                api_key.id,
+                messages,
+                request.model,
+                completion.model_dump(),
+                request.temperature,
+                request.max_tokens,
+            )
+            return completion
 
         except Exception as e:
+            await rate_limit_service.reconcile_tokens(token_lease, 0)
             logger.error(
                 "chat_completion_error",
                 error=str(e),
@@ -145,6 +352,93 @@ async def create_chat_completion(
             )
 
 
+@router.post("/embeddings", response_model=EmbeddingResponse)
+async def create_embeddings(
+    request: EmbeddingRequest,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> EmbeddingResponse:
+    """
+    Create embeddings
+
+    Inputs are merged with those of concurrent requests into batched
+    upstream calls; usage is reported for this request's inputs only.
+    """
+    tenant, api_key = tenant_key
+    inputs = [request.input] if isinstance(request.input, str) else request.input
+    if not inputs or len(inputs) > settings.EMBEDDING_BATCH_MAX_INPUTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"input must hold 1 to {settings.EMBEDDING_BATCH_MAX_INPUTS} texts",
+        )
+
+    quota_service = await get_quota_service()
+    tokenizer = await get_tokenizer_service()
+    embedding_service = await get_embedding_service()
+    rate_limit_service = await get_rate_limit_service()
+
+    input_tokens = await tokenizer.count_texts(inputs, request.model)
+    token_lease = await rate_limit_service.admit_tokens(
+        tenant, api_key, request.model, sum(input_tokens)
+    )
+
+    async with get_tenant_db_session("system") as session:
+        try:
+            await quota_service.check_quota(
+                tenant.id, api_key.user_id, sum(input_tokens), session, api_key
+            )
+            embeddings, prompt_tokens = await embedding_service.embed(
+                inputs, request.model, input_tokens
+            )
+            await rate_limit_service.reconcile_tokens(token_lease, prompt_tokens)
+        except LLMBackendException:
+            await rate_limit_service.reconcile_tokens(token_lease, 0)
+            raise
+        except Exception as e:
+            await rate_limit_service.reconcile_tokens(token_lease, 0)
+            logger.error(
+                "embedding_error",
+                error=str(e),
+                tenant_id=tenant.id,
+                error_type=e.__class__.__name__,
+            )
+            raise HTTPException(
+                status_code=500, detail=f"Embedding failed: {str(e)}"
+            )
+
+        try:
+            await quota_service.update_usage(
+                tenant_id=tenant.id,
+                user_id=api_key.user_id,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=0,
+                model=request.model,
+                request_id=f"{uuid.uuid4()}",
+                metadata={
+                    "api_key_id": api_key.id,
+                    "provider": "openai",
+                    "input_count": len(inputs),
+                },
+                session=session,
+                api_key=api_key,
+            )
+        except Exception as e:
+            logger.error(
+                "usage_update_error",
+                error=str(e),
+                tenant_id=tenant.id,
+                user_id=api_key.user_id or "default",
+            )
+
+    return EmbeddingResponse(
+        data=[
+            EmbeddingData(index=i, embedding=embedding)
+            for i, embedding in enumerate(embeddings)
+        ],
+        model=request.model,
+        usage=EmbeddingUsage(prompt_tokens=prompt_tokens, total_tokens=prompt_tokens),
+    )
+
+
 @router.get("/models", response_model=ModelsResponse)
 async def list_models(
     tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
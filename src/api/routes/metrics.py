@@ -6,6 +6,7 @@ from sqlalchemy import select, func, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.auth import get_current_tenant_and_key
+from src.core.bulkhead import Bulkhead
 from src.core.database import get_tenant_db_session
 from src.models.system import APIKey, Tenant
 from src.models.tenant import User, UsageLog
@@ -20,7 +21,7 @@ async def get_dashboard_metrics(
     now = datetime.utcnow()
     last_24h = now - timedelta(hours=24)
 
-    async with get_tenant_db_session(tenant.id) as session:
+    async with get_tenant_db_session(tenant.id, Bulkhead.BACKGROUND) as session:
         # Obter a contagem total de usuários
         users_result = await session.execute(
             select(func.count()).select_from(User)
@@ -72,7 +73,7 @@ async def get_request_metrics(
 ) -> dict:
     tenant, _ = tenant_key
     
-    async with get_tenant_db_session(tenant.id) as session:
+    async with get_tenant_db_session(tenant.id, Bulkhead.BACKGROUND) as session:
         # Get request counts per day for the last 7 days
         last_7_days = datetime.utcnow() - timedelta(days=7)
         result = await session.execute(
@@ -100,7 +101,7 @@ async def get_token_metrics(
 ) -> dict:
     tenant, _ = tenant_key
     
-    async with get_tenant_db_session(tenant.id) as session:
+    async with get_tenant_db_session(tenant.id, Bulkhead.BACKGROUND) as session:
         # Get total tokens per day for the last 7 days
         last_7_days = datetime.utcnow() - timedelta(days=7)
         result = await session.execute(
@@ -128,7 +129,7 @@ async def get_error_metrics(
 ) -> dict:
     tenant, _ = tenant_key
     
-    async with get_tenant_db_session(tenant.id) as session:
+    async with get_tenant_db_session(tenant.id, Bulkhead.BACKGROUND) as session:
         # Obter taxa de erro por dia para os últimos 7 dias
         last_7_days = datetime.utcnow() - timedelta(days=7)
         result = await session.execute(
@@ -0,0 +1,251 @@
+import uuid
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from src.core.auth import get_current_tenant_and_key
+from src.core.context import (
+    ContextPolicy,
+    fit_messages,
+    get_context_limit,
+    get_context_policy,
+)
+from src.core.config import get_settings
+from src.core.database import get_tenant_db_session
+from src.core.exceptions import LLMBackendException
+from src.core.logging import get_logger
+from src.core.tokens import REPLY_PRIMING_TOKENS
+from src.models.system import APIKey, Tenant
+from src.schemas import (
+    ChatCompletionUsage,
+    ChatMessage,
+    SessionCreate,
+    SessionMessageCreate,
+    SessionMessageResponse,
+    SessionReply,
+    SessionResponse,
+)
+from src.services.model import get_model_service
+from src.services.quota import get_quota_service
+from src.services.ratelimit import get_rate_limit_service
+from src.services.session import get_chat_session_service
+from src.services.tokenizer import get_tokenizer_service
+
+settings = get_settings()
+logger = get_logger(__name__)
+router = APIRouter()
+
+
+def _require_user(api_key: APIKey) -> str:
+    if not api_key.user_id:
+        raise HTTPException(
+            status_code=400, detail="Chat sessions require an API key bound to a user"
+        )
+    return api_key.user_id
+
+
+def _session_response(chat_session) -> SessionResponse:
+    return SessionResponse(
+        id=chat_session.id,
+        title=chat_session.title,
+        model=chat_session.model,
+        total_tokens=chat_session.total_tokens,
+        total_messages=chat_session.total_messages,
+    )
+
+
+@router.post("", response_model=SessionResponse)
+async def create_session(
+    session_data: SessionCreate,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> SessionResponse:
+    """Create a server-side chat session"""
+    tenant, api_key = tenant_key
+    user_id = _require_user(api_key)
+
+    session_service = await get_chat_session_service()
+    chat_session = await session_service.create_session(
+        tenant.id,
+        user_id,
+        model=session_data.model,
+        title=session_data.title,
+        system_prompt=session_data.system_prompt,
+    )
+    return _session_response(chat_session)
+
+
+@router.get("/{session_id}", response_model=SessionResponse)
+async def get_session(
+    session_id: str,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> SessionResponse:
+    """Get a chat session"""
+    tenant, api_key = tenant_key
+    session_service = await get_chat_session_service()
+    chat_session = await session_service.get_session(
+        tenant.id, session_id, _require_user(api_key)
+    )
+    if not chat_session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return _session_response(chat_session)
+
+
+@router.get("/{session_id}/messages", response_model=List[SessionMessageResponse])
+async def list_session_messages(
+    session_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> List[SessionMessageResponse]:
+    """List the stored messages of a chat session"""
+    tenant, api_key = tenant_key
+    session_service = await get_chat_session_service()
+    chat_session = await session_service.get_session(
+        tenant.id, session_id, _require_user(api_key)
+    )
+    if not chat_session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    messages = await session_service.list_messages(tenant.id, session_id, offset, limit)
+    return [
+        SessionMessageResponse(role=m.role, content=m.content, tokens=m.tokens)
+        for m in messages
+    ]
+
+
+@router.post("/{session_id}/messages", response_model=SessionReply)
+async def send_session_message(
+    session_id: str,
+    message_data: SessionMessageCreate,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> SessionReply:
+    """
+    Send a new user message to a chat session
+
+    Only the new message is uploaded and tokenized. The prompt is the
+    session's system prompt plus its recent message window, whose token
+    counts were stored with the messages.
+    """
+    tenant, api_key = tenant_key
+    user_id = _require_user(api_key)
+
+    session_service = await get_chat_session_service()
+    model_service = await get_model_service()
+    quota_service = await get_quota_service()
+    tokenizer = await get_tokenizer_service()
+
+    chat_session = await session_service.get_session(tenant.id, session_id, user_id)
+    if not chat_session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    user_message = {"role": "user", "content": message_data.content}
+    [user_tokens] = await tokenizer.count_message_list([user_message], chat_session.model)
+    user_message["tokens"] = user_tokens
+
+    window, window_cached = await session_service.get_window(tenant.id, chat_session)
+    messages, message_tokens = session_service.build_prompt(
+        chat_session, window, user_message
+    )
+
+    # Sessions outgrow any context window, so drop old turns unless the
+    # tenant asked for middle truncation
+    policy = get_context_policy(tenant.config, ContextPolicy.DROP_OLDEST)
+    if policy == ContextPolicy.REJECT:
+        policy = ContextPolicy.DROP_OLDEST
+    context_limit = get_context_limit(
+        chat_session.model, settings.MODEL_CONTEXT_LIMITS, settings.DEFAULT_CONTEXT_LIMIT
+    )
+    kept = fit_messages(
+        messages, message_tokens, context_limit, policy, message_data.max_tokens
+    )
+    kept_ids = {id(message) for message in kept}
+    prompt_tokens = REPLY_PRIMING_TOKENS + sum(
+        tokens
+        for message, tokens in zip(messages, message_tokens)
+        if id(message) in kept_ids
+    )
+
+    rate_limit_service = await get_rate_limit_service()
+    token_lease = await rate_limit_service.admit_tokens(
+        tenant,
+        api_key,
+        chat_session.model,
+        prompt_tokens + (message_data.max_tokens or 0),
+    )
+
+    async with get_tenant_db_session("system") as session:
+        try:
+            await quota_service.check_quota(
+                tenant.id, user_id, prompt_tokens, session, api_key
+            )
+
+            result = await model_service.generate(
+                kept,
+                model=chat_session.model,
+                temperature=message_data.temperature,
+                max_tokens=message_data.max_tokens,
+            )
+            await rate_limit_service.reconcile_tokens(
+                token_lease, result["usage"]["total_tokens"]
+            )
+
+            try:
+                await quota_service.update_usage(
+                    tenant_id=tenant.id,
+                    user_id=user_id,
+                    prompt_tokens=result["usage"]["prompt_tokens"],
+                    completion_tokens=result["usage"]["completion_tokens"],
+                    model=chat_session.model,
+                    request_id=f"{uuid.uuid4()}",
+                    metadata={
+                        "temperature": message_data.temperature,
+                        "max_tokens": message_data.max_tokens,
+                        "api_key_id": api_key.id,
+                        "provider": result.get("provider", "openai"),
+                        "session_id": chat_session.id,
+                    },
+                    session=session,
+                    api_key=api_key,
+                )
+            except Exception as e:
+                logger.error(
+                    "usage_update_error",
+                    error=str(e),
+                    tenant_id=tenant.id,
+                    user_id=user_id,
+                )
+
+        except LLMBackendException:
+            await rate_limit_service.reconcile_tokens(token_lease, 0)
+            raise
+        except Exception as e:
+            await rate_limit_service.reconcile_tokens(token_lease, 0)
+            logger.error(
+                "session_completion_error",
+                error=str(e),
+                tenant_id=tenant.id,
+                session_id=session_id,
+                error_type=e.__class__.__name__,
+            )
+            raise HTTPException(
+                status_code=500, detail=f"Chat completion failed: {str(e)}"
+            )
+
+    chat_session = await session_service.append_turn(
+        tenant.id,
+        chat_session,
+        window_cached,
+        user_message,
+        result["content"],
+        result["usage"]["completion_tokens"],
+    )
+
+    return SessionReply(
+        session=_session_response(chat_session),
+        message=ChatMessage(role="assistant", content=result["content"]),
+        usage=ChatCompletionUsage(
+            prompt_tokens=result["usage"]["prompt_tokens"],
+            completion_tokens=result["usage"]["completion_tokens"],
+            total_tokens=result["usage"]["total_tokens"],
+        ),
+    )
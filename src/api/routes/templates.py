@@ -0,0 +1,90 @@
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from src.core.auth import check_permissions, get_current_tenant_and_key
+from src.core.tokens import get_encoding
+from src.models.system import APIKey, Tenant
+from src.schemas import PromptTemplateCreate, PromptTemplateResponse
+from src.services.template import get_prompt_template_service
+
+router = APIRouter()
+
+
+def _template_response(template: Dict[str, Any]) -> PromptTemplateResponse:
+    prefix_tokens = template["static_prefix_tokens"].get(
+        get_encoding(template["model"]).name, []
+    )
+    return PromptTemplateResponse(
+        id=template["id"],
+        name=template["name"],
+        model=template["model"],
+        messages=template["messages"],
+        variables=template["variables"],
+        static_prefix_length=template["static_prefix_length"],
+        static_prefix_tokens=sum(prefix_tokens),
+    )
+
+
+@router.post("", response_model=PromptTemplateResponse)
+async def create_template(
+    template_data: PromptTemplateCreate,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+    permissions: None = Depends(check_permissions({"admin:create_template"})),
+) -> PromptTemplateResponse:
+    """Create a prompt template"""
+    tenant, api_key = tenant_key
+    template_service = await get_prompt_template_service()
+
+    if await template_service.get_template_by_name(tenant.id, template_data.name):
+        raise HTTPException(status_code=400, detail="Template name already exists")
+
+    template = await template_service.create_template(
+        tenant.id,
+        name=template_data.name,
+        model=template_data.model,
+        messages=[msg.dict() for msg in template_data.messages],
+        created_by=api_key.user_id,
+    )
+    return _template_response(template)
+
+
+@router.get("", response_model=List[PromptTemplateResponse])
+async def list_templates(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> List[PromptTemplateResponse]:
+    """List prompt templates"""
+    tenant, _ = tenant_key
+    template_service = await get_prompt_template_service()
+    templates = await template_service.list_templates(tenant.id, offset, limit)
+    return [_template_response(template) for template in templates]
+
+
+@router.get("/{template_id}", response_model=PromptTemplateResponse)
+async def get_template(
+    template_id: str,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> PromptTemplateResponse:
+    """Get a prompt template"""
+    tenant, _ = tenant_key
+    template_service = await get_prompt_template_service()
+    template = await template_service.get_template(tenant.id, template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return _template_response(template)
+
+
+@router.delete("/{template_id}")
+async def delete_template(
+    template_id: str,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+    permissions: None = Depends(check_permissions({"admin:delete_template"})),
+) -> dict:
+    """Delete a prompt template"""
+    tenant, _ = tenant_key
+    template_service = await get_prompt_template_service()
+    if not await template_service.delete_template(tenant.id, template_id):
+        raise HTTPException(status_code=404, detail="Template not found")
+    return {"status": "success"}
@@ -0,0 +1,159 @@
+import asyncio
+import json
+from typing import AsyncIterator, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from src.core.auth import get_current_tenant_and_key
+from src.core.config import get_settings
+from src.core.database import get_tenant_db_session
+from src.core.logging import get_logger
+from src.core.redis import CONNECTION_ERRORS, get_redis
+from src.models.system import APIKey, Tenant
+from src.models.tenant import User
+from src.schemas import TokenizeRequest, TokenizeResponse, TokenizeResult
+from src.services.quota_fallback import get_quota_fallback
+from src.services.tokenizer import get_tokenizer_service
+
+settings = get_settings()
+logger = get_logger(__name__)
+router = APIRouter()
+
+
+async def _iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines without buffering the whole body"""
+    buffer = bytearray()
+    async for block in stream:
+        start = len(buffer)
+        buffer += block
+        # Only the new block can hold a newline; a long line is never rescanned
+        end = buffer.rfind(b"\n", start)
+        if end < 0:
+            continue
+        for line in bytes(buffer[:end]).split(b"\n"):
+            yield line
+        del buffer[: end + 1]
+    if buffer:
+        yield bytes(buffer)
+
+
+@router.post("/tokenize", response_model=TokenizeResponse)
+async def tokenize(
+    request: TokenizeRequest,
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> TokenizeResponse:
+    """
+    Count prompt tokens of many message lists at once
+
+    Uses the gateway's cached encoders and per-message token cache, and
+    reports the quota left under the tenant, user and API key limits,
+    without calling the upstream provider.
+    """
+    tenant, api_key = tenant_key
+    tokenizer = await get_tokenizer_service()
+
+    counts = await asyncio.gather(
+        *(
+            tokenizer.count_messages([msg.dict() for msg in messages], request.model)
+            for messages in request.inputs
+        )
+    )
+
+    user = None
+    if api_key.user_id:
+        async with get_tenant_db_session(tenant.id) as db:
+            user = await db.get(User, api_key.user_id)
+
+    windows = [
+        tenant.quota_window,
+        user.quota_window if user else None,
+        api_key.quota_window,
+    ]
+    fallback = await get_quota_fallback()
+    usage = None
+    if not fallback.active:
+        try:
+            redis = await get_redis()
+            usage = await redis.get_token_usage(
+                tenant.id, api_key.user_id, api_key.id, windows
+            )
+        except CONNECTION_ERRORS as e:
+            fallback.enter(e)
+    if usage is None:
+        usage = fallback.journal.usage(
+            (tenant.id, api_key.user_id, api_key.id, tuple(windows))
+        )
+    # Same limits as QuotaService.check_quota
+    limits = [
+        ("tenant_usage", tenant.quota_limit),
+        ("user_usage", user.quota_limit if user else None),
+        ("api_key_usage", api_key.quota_limit),
+    ]
+    remaining = max(
+        min(
+            limit - usage.get(field, 0)
+            for field, limit in limits
+            if limit is not None
+        ),
+        0,
+    )
+
+    return TokenizeResponse(
+        model=request.model,
+        data=[
+            TokenizeResult(index=i, prompt_tokens=tokens, fits_quota=tokens <= remaining)
+            for i, tokens in enumerate(counts)
+        ],
+        total_tokens=sum(counts),
+        remaining_quota=remaining,
+    )
+
+
+@router.post("/chunk")
+async def chunk_documents(
+    request: Request,
+    max_tokens: int = Query(..., gt=0),
+    overlap: int = Query(0, ge=0),
+    model: str = Query(settings.DEFAULT_MODEL),
+    tenant_key: tuple[Tenant, APIKey] = Depends(get_current_tenant_and_key),
+) -> StreamingResponse:
+    """
+    Chunk an NDJSON stream of documents by token count
+
+    The request body holds one ``{"id": ..., "text": ...}`` object per line.
+    The response streams one ``{"id", "index", "text"}`` object per chunk,
+    in input order. A malformed line ends the stream with an error object.
+    """
+    tenant, _ = tenant_key
+    if overlap >= max_tokens:
+        raise HTTPException(status_code=400, detail="overlap must be below max_tokens")
+
+    tokenizer = await get_tokenizer_service()
+
+    async def documents() -> AsyncIterator[Tuple[str, str]]:
+        line_number = 0
+        async for line in _iter_lines(request.stream()):
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                document = json.loads(line)
+                text = document["text"]
+                if not isinstance(text, str):
+                    raise TypeError("text must be a string")
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"Invalid document on line {line_number}: {e}")
+            yield str(document.get("id", line_number)), text
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in tokenizer.chunk_documents(
+                documents(), max_tokens, model, overlap
+            ):
+                yield json.dumps(chunk).encode() + b"\n"
+        except ValueError as e:
+            logger.warning("chunk_stream_error", tenant_id=tenant.id, error=str(e))
+            yield json.dumps({"error": str(e)}).encode() + b"\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
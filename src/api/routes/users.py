@@ -97,6 +97,7 @@ async def create_user(
             name=user_data.name,
             role=user_data.role,
             quota_limit=user_data.quota_limit,
+            quota_window=user_data.quota_window,
             settings=user_data.settings,
         )
         session.add(user)
@@ -163,6 +164,8 @@ async def update_user(
             user.is_active = update_data.is_active
         if update_data.quota_limit is not None:
             user.quota_limit = update_data.quota_limit
+        if update_data.quota_window is not None:
+            user.quota_window = update_data.quota_window
         if update_data.settings is not None:
             user.settings = update_data.settings
 
@@ -0,0 +1,41 @@
+from fastapi import FastAPI
+
+from src.core.config import get_settings
+from src.core.logging import get_logger
+from src.core.redis import close_redis
+from src.services.batch import start_batch_worker_pool, stop_batch_worker_pool
+from src.services.embedding import close_embedding_service
+from src.services.quota_fallback import close_quota_fallback, start_quota_fallback
+from src.services.quota_lease import close_quota_lease_manager
+from src.services.ratelimit import close_rate_limit_service
+from src.services.reconcile import start_quota_reconciler, stop_quota_reconciler
+from src.services.tokenizer import close_tokenizer_service
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+def setup_events(app: FastAPI) -> None:
+    """Configure startup and shutdown handlers for the application"""
+
+    @app.on_event("startup")
+    async def startup() -> None:
+        """Start background workers"""
+        if settings.BATCH_WORKER_ENABLED:
+            await start_batch_worker_pool()
+        await start_quota_fallback()
+        if settings.QUOTA_RECONCILE_ENABLED:
+            await start_quota_reconciler()
+
+    @app.on_event("shutdown")
+    async def shutdown() -> None:
+        """Release process-wide resources"""
+        await stop_batch_worker_pool()
+        await stop_quota_reconciler()
+        await close_embedding_service()
+        await close_quota_lease_manager()
+        await close_quota_fallback()
+        await close_rate_limit_service()
+        await close_tokenizer_service()
+        await close_redis()
+        logger.info("application_shutdown")
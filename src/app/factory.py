@@ -4,6 +4,7 @@ from fastapi.staticfiles import StaticFiles
 from prometheus_client import make_asgi_app
 
 from src.api.router import api_router
+from src.app.events import setup_events
 from src.app.handlers import setup_exception_handlers
 from src.app.middleware import setup_middleware
 from src.app.openapi import setup_openapi
@@ -39,6 +40,9 @@ def create_app() -> FastAPI:
     # Setup exception handlers
     setup_exception_handlers(app)
 
+    # Setup startup and shutdown events
+    setup_events(app)
+
     # Mount static files
     app.mount("/static", StaticFiles(directory="static"), name="static")
 
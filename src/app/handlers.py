@@ -133,9 +133,14 @@ def setup_exception_handlers(app: FastAPI) -> None:
             extra=exc.extra,
         )
 
-        return JSONResponse(
+        response = JSONResponse(
             status_code=exc.status_code,
             content=format_error_response(
                 message=str(exc), status_code=exc.status_code, extra=exc.extra
             ),
         )
+
+        if exc.extra.get("retry_after"):
+            response.headers["Retry-After"] = str(exc.extra["retry_after"])
+
+        return response
@@ -5,9 +5,12 @@ from src.core.config import get_settings
 from src.core.middleware import (
     LoggingMiddleware,
     PrometheusMiddleware,
+    RateLimitMiddleware,
     RequestIdMiddleware,
     TenantMiddleware,
+    UnitOfWorkMiddleware,
 )
+from src.services.ratelimit import get_rate_limit_service
 
 settings = get_settings()
 
@@ -15,6 +18,10 @@ settings = get_settings()
 def setup_middleware(app: FastAPI) -> None:
     """Configure middleware for the application"""
 
+    # Added first so it runs innermost, committing before the logging and
+    # metrics middleware record the response
+    app.add_middleware(UnitOfWorkMiddleware)
+
     # Set up CORS
     app.add_middleware(
         CORSMiddleware,
@@ -29,3 +36,7 @@ def setup_middleware(app: FastAPI) -> None:
     app.add_middleware(TenantMiddleware)
     app.add_middleware(LoggingMiddleware)
     app.add_middleware(PrometheusMiddleware)
+
+    # Added last so it runs first and the tenant context it sets reaches the
+    # logging and metrics middleware
+    app.add_middleware(RateLimitMiddleware, rate_limit_service=get_rate_limit_service)
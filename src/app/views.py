@@ -3,6 +3,8 @@ from pathlib import Path
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
 
+from src.services.quota_fallback import get_quota_fallback
+
 
 def setup_views(app: FastAPI) -> None:
     """Configure basic views for the application"""
@@ -15,5 +17,9 @@ def setup_views(app: FastAPI) -> None:
 
     @app.get("/health")
     async def health_check():
-        """Health check endpoint"""
-        return {"status": "healthy"}
+        """Health check endpoint, reporting degraded quota enforcement"""
+        fallback = await get_quota_fallback()
+        return {
+            "status": "degraded" if fallback.active else "healthy",
+            "quota": fallback.status(),
+        }
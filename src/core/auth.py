@@ -98,7 +98,7 @@ class AuthService:
             SELECT ak.id, ak.tenant_id, ak.user_id, ak.name, ak.key_hash, 
                    ak.is_active, ak.permissions, ak.expires_at, 
                    ak.last_used_at, ak.created_at, ak.updated_at,
-                   ak.quota_limit, ak.current_quota_usage,
+                   ak.quota_limit, ak.current_quota_usage, ak.quota_window,
                    t.is_active as tenant_is_active
             FROM api_keys ak
             JOIN tenants t ON t.id = ak.tenant_id
@@ -126,6 +126,7 @@ class AuthService:
             updated_at=record.updated_at,
             quota_limit=record.quota_limit,
             current_quota_usage=record.current_quota_usage,
+            quota_window=record.quota_window,
         )
 
         # Validate key and tenant status
@@ -138,10 +139,10 @@ class AuthService:
         if api_key_obj.expires_at and api_key_obj.expires_at < datetime.utcnow():
             raise InvalidAPIKeyError("API key has expired")
 
-        # Update last used timestamp
+        # Update last used timestamp; written when the caller's session
+        # commits, so no row lock is held until then
         api_key_obj.last_used_at = datetime.utcnow()
         await session.merge(api_key_obj)
-        await session.commit()
 
         return api_key_obj
 
@@ -0,0 +1,123 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple, Type
+
+BatchHandler = Callable[[Hashable, List[Any]], Awaitable[List[Any]]]
+
+
+def split_usage(total: int, weights: List[int]) -> List[int]:
+    """
+    Split a batch total across items in proportion to their weights
+
+    Uses largest remainders, so the parts always sum to ``total``.
+    """
+    if not weights:
+        return []
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        weights = [1] * len(weights)
+        weight_sum = len(weights)
+
+    shares = [total * weight / weight_sum for weight in weights]
+    parts = [int(share) for share in shares]
+    by_remainder = sorted(
+        range(len(weights)), key=lambda i: shares[i] - parts[i], reverse=True
+    )
+    for i in by_remainder[: total - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+
+class MicroBatcher:
+    """
+    Merge concurrent submissions into batched handler calls
+
+    Submissions with the same key are queued until ``max_items`` items are
+    pending or ``max_delay`` seconds passed since the first one, then the
+    handler is called once with all their items. It must return one result
+    per item; each submitter gets back the results of its own items. When a
+    batch of several submissions fails with one of ``split_errors``, errors
+    caused by some input such as an invalid request, each submission is
+    retried alone, so only the submission at fault gets the exception. Any
+    other error, e.g. throttling, fails the whole batch without more calls.
+    Items of one submission are never split across batches, so a submission
+    larger than ``max_items`` is a batch of its own.
+    """
+
+    def __init__(
+        self,
+        handler: BatchHandler,
+        max_items: int,
+        max_delay: float,
+        split_errors: Tuple[Type[BaseException], ...] = (),
+    ) -> None:
+        self.handler = handler
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.split_errors = split_errors
+        self._pending: Dict[Hashable, List[Tuple[List[Any], asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: "set[asyncio.Task]" = set()
+
+    def _pending_items(self, key: Hashable) -> int:
+        return sum(len(items) for items, _ in self._pending.get(key, []))
+
+    async def submit(self, key: Hashable, items: List[Any]) -> List[Any]:
+        """Queue items for the next batch of a key and wait for their results"""
+        if not items:
+            return []
+
+        if self._pending_items(key) + len(items) > self.max_items:
+            self._flush(key)
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.setdefault(key, []).append((items, future))
+
+        if self._pending_items(key) >= self.max_items:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_delay, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: Hashable) -> None:
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            task = asyncio.ensure_future(self._run(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self, key: Hashable, batch: List[Tuple[List[Any], asyncio.Future]]
+    ) -> None:
+        items = [item for submitted, _ in batch for item in submitted]
+        try:
+            results = await self.handler(key, items)
+            if len(results) != len(items):
+                raise ValueError(
+                    f"Batch handler returned {len(results)} results for {len(items)} items"
+                )
+        except Exception as e:
+            if len(batch) > 1 and isinstance(e, self.split_errors):
+                await asyncio.gather(*(self._run(key, [entry]) for entry in batch))
+                return
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for submitted, future in batch:
+            if not future.done():
+                future.set_result(results[offset : offset + len(submitted)])
+            offset += len(submitted)
+
+    async def close(self) -> None:
+        """Flush pending submissions and wait for in-flight batches"""
+        for key in list(self._pending):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
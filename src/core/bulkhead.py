@@ -0,0 +1,14 @@
+import enum
+
+
+class Bulkhead(str, enum.Enum):
+    """
+    Isolated connection pools
+
+    Hot-path requests and analytics or background work draw database and
+    Redis connections from separate, separately sized pools, so slow reports
+    can not starve completions of connections.
+    """
+
+    HOT = "hot"
+    BACKGROUND = "background"
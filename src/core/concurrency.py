@@ -0,0 +1,34 @@
+import asyncio
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limit that adapts to upstream capacity (AIMD)
+
+    Every successful call raises the limit by ``1 / limit``, i.e. by about
+    one per round of calls, up to ``max_limit``. A throttled call (rate
+    limited or overloaded upstream) halves it, down to ``min_limit``.
+    """
+
+    def __init__(self, min_limit: int, max_limit: int, initial: int = 0) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(initial or min_limit)
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        """Wait for a free slot"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, throttled: bool = False) -> None:
+        """Free a slot and adjust the limit from the call's outcome"""
+        async with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(float(self.min_limit), self.limit / 2)
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._condition.notify_all()
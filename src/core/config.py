@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import PostgresDsn, RedisDsn, SecretStr, validator
 from pydantic_settings import BaseSettings
@@ -46,11 +46,28 @@ class Settings(BaseSettings):
             path=f"/{values['POSTGRES_DB']}",
         )
 
+    # Database pools, per tenant database and process: hot path (requests)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 10.0  # seconds to wait for a connection
+    # Analytics reports and background work
+    DB_BACKGROUND_POOL_SIZE: int = 2
+    DB_BACKGROUND_MAX_OVERFLOW: int = 2
+    DB_BACKGROUND_POOL_TIMEOUT: float = 5.0
+    DB_BACKGROUND_STATEMENT_TIMEOUT: float = 30.0  # seconds before a query is cancelled
+    # Requests that share one session per database and commit once at the end
+    UNIT_OF_WORK_PATHS: List[str] = ["/api/v1/chat/completions", "/api/v1/embeddings"]
+
     # Redis
     REDIS_HOST: str
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: Optional[SecretStr] = None
     REDIS_URI: Optional[RedisDsn] = None
+    REDIS_CONNECT_TIMEOUT: float = 2.0  # seconds
+    REDIS_CLUSTER_ENABLED: bool = False  # REDIS_URI is any node of the cluster
+    REDIS_MAX_CONNECTIONS: int = 100  # per process, per node in cluster mode
+    REDIS_POOL_TIMEOUT: float = 1.0  # seconds to wait for a connection, single node
+    REDIS_BACKGROUND_MAX_CONNECTIONS: int = 10  # analytics and background work
 
     @validator("REDIS_URI", pre=True)
     def assemble_redis_uri(cls, v: Optional[str], values: dict) -> str:
@@ -67,16 +84,126 @@ class Settings(BaseSettings):
     RATE_LIMIT_ENABLED: bool = True
     RATE_LIMIT_DEFAULT_LIMIT: int = 100
     RATE_LIMIT_DEFAULT_PERIOD: int = 3600  # 1 hour in seconds
+    RATE_LIMIT_KEY_CACHE_TTL: int = 60  # seconds an API key -> tenant lookup is reused
+    RATE_LIMIT_KEY_CACHE_MAX_ENTRIES: int = 10_000
+
+    # Host-local rate limit tier: worker processes share counters in memory
+    # and sync them to Redis every interval. Longer intervals save Redis round
+    # trips but let hosts overshoot a limit by what they admit in between;
+    # above the exact threshold (share of a limit) requests sync first.
+    RATE_LIMIT_SHM_ENABLED: bool = False
+    RATE_LIMIT_SHM_PATH: str = "/dev/shm/llm_backend_rate_limit"
+    RATE_LIMIT_SHM_SLOTS: int = 16_384
+    RATE_LIMIT_SHM_SYNC_INTERVAL_MS: int = 250
+    RATE_LIMIT_SHM_EXACT_THRESHOLD: float = 0.9
 
     # Token Management
     DEFAULT_TOKEN_QUOTA: int = 100_000
     TOKEN_QUOTA_ALERT_THRESHOLD: float = 0.9  # Alert at 90% usage
+    QUOTA_ROLLING_WINDOW_HOURS: int = 24  # length of "rolling" quota windows
+
+    # Quota leasing: workers admit requests against locally leased blocks
+    QUOTA_LEASING_ENABLED: bool = False
+    QUOTA_LEASE_TTL: int = 10  # seconds before unused tokens are returned
+    QUOTA_LEASE_TARGET_SECONDS: float = 5.0  # block covers this much traffic
+    QUOTA_LEASE_MIN_BLOCK: int = 1_000
+    QUOTA_LEASE_MAX_BLOCK: int = 100_000
+    QUOTA_LEASE_MAX_HEADROOM_SHARE: float = 0.1  # of tokens left under the limit
+
+    # Degraded mode: quotas enforced from per-worker counters while Redis is down
+    QUOTA_DEGRADED_HEADROOM_SHARE: float = 0.05  # of headroom each worker may use
+    QUOTA_DEGRADED_PROBE_INTERVAL: float = 1.0  # seconds between Redis checks
+    QUOTA_DEGRADED_MAX_ENTRIES: int = 100_000  # last seen usages kept per worker
+    QUOTA_WORKER_REPORT_INTERVAL: float = 5.0  # seconds between journal reports
+    QUOTA_WORKER_EXPIRY: int = 3600  # seconds before a silent worker is dropped
+
+    # Reconciliation: usage counters rebuilt and corrected from usage logs
+    QUOTA_RECONCILE_ENABLED: bool = True
+    QUOTA_RECONCILE_INTERVAL: int = 3600  # seconds between runs
+    QUOTA_RECONCILE_CONCURRENCY: int = 8  # tenant databases aggregated at once
+    QUOTA_RECONCILE_MIN_DRIFT: int = 1_000  # tokens before a counter is corrected
 
     # Model Settings
     DEFAULT_MODEL: str = "gpt-3.5-turbo"
     FALLBACK_MODEL: str = "gpt-3.5-turbo"
     MAX_TOKENS: int = 4096
 
+    # Context windows, matched by model name prefix
+    MODEL_CONTEXT_LIMITS: Dict[str, int] = {
+        "gpt-4-32k": 32_768,
+        "gpt-4-turbo": 128_000,
+        "gpt-4o": 128_000,
+        "gpt-4": 8_192,
+        "gpt-3.5-turbo-16k": 16_385,
+        "gpt-3.5-turbo": 16_385,
+    }
+    DEFAULT_CONTEXT_LIMIT: int = 4_096
+    DEFAULT_CONTEXT_POLICY: str = "reject"  # reject, drop_oldest, truncate_middle
+
+    # Tokenization
+    TOKENIZE_OFFLOAD_THRESHOLD: int = 32_000  # characters per request
+    TOKENIZER_POOL_SIZE: Optional[int] = None  # defaults to CPU count
+    TOKENIZE_MAX_INPUTS: int = 256  # message lists per /tokenize request
+    TOKEN_CACHE_MAX_ENTRIES: int = 100_000  # per-message counts held in memory
+    TOKEN_CACHE_REDIS_ENABLED: bool = False
+    TOKEN_CACHE_TTL: int = 86_400  # seconds
+    TOKEN_ESTIMATE_MARGIN: float = 0.1  # added to the highest observed ratio
+    TOKEN_ESTIMATE_WINDOW: int = 200  # observations kept per model
+    TOKEN_ESTIMATE_MIN_SAMPLES: int = 20
+
+    # Chat sessions
+    SESSION_WINDOW_MESSAGES: int = 50  # recent messages sent with each turn
+    SESSION_CACHE_TTL: int = 3600  # seconds
+
+    # Prompt templates
+    TEMPLATE_CACHE_MAX_ENTRIES: int = 1000
+    TEMPLATE_CACHE_TTL: int = 60  # seconds a worker may serve a deleted template
+
+    # Embeddings
+    DEFAULT_EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    EMBEDDING_BATCH_MAX_INPUTS: int = 2048  # upstream limit per request
+    EMBEDDING_BATCH_WINDOW_MS: int = 10  # wait for concurrent callers
+
+    # Batch API
+    BATCH_STORAGE_DIR: str = "data/batches"  # shared by all gateway replicas
+    BATCH_MAX_FILE_BYTES: int = 200 * 1024 * 1024
+    BATCH_MAX_ITEMS: int = 200_000
+    BATCH_WORKER_ENABLED: bool = True
+    BATCH_WORKER_JOBS: int = 2  # jobs processed concurrently per process
+    BATCH_MIN_CONCURRENCY: int = 1
+    BATCH_MAX_CONCURRENCY: int = 32  # upstream calls in flight per process
+    BATCH_MAX_RETRIES: int = 5
+    BATCH_CHECKPOINT_ITEMS: int = 100
+    BATCH_LEASE_SECONDS: int = 60
+    BATCH_POLL_INTERVAL: float = 5.0
+
+    # Idempotency keys
+    IDEMPOTENCY_TTL: int = 86_400  # seconds a completed response is replayed
+    IDEMPOTENCY_LOCK_TTL: int = 600  # in-flight marker expiry if a node dies
+    IDEMPOTENCY_MAX_WAIT: int = 120  # seconds a replay waits for the original
+
+    # Async generation jobs
+    JOB_STREAM: str = "generation_jobs"
+    JOB_CONSUMER_GROUP: str = "generation_workers"
+    JOB_STREAM_MAXLEN: int = 100_000
+    JOB_RESULT_TTL: int = 86_400  # seconds results can be fetched
+    JOB_WORKER_CONCURRENCY: int = 16  # generations in flight per worker process
+    JOB_CLAIM_IDLE_SECONDS: int = 120  # reclaim jobs of workers silent this long
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_MAX_WAIT: int = 60  # long-poll limit in seconds
+
+    # Attachments
+    ATTACHMENT_MAX_BYTES: int = 10 * 1024 * 1024
+    ATTACHMENT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # hot content per worker
+
+    # Near-duplicate cache (opt-in per tenant via config["near_duplicate_cache"])
+    NEAR_DUPLICATE_CACHE_THRESHOLD: float = 0.95
+    NEAR_DUPLICATE_CACHE_MAX_ENTRIES: int = 10_000  # per API key and model
+    NEAR_DUPLICATE_CACHE_MAX_INDEXES: int = 1_000
+    NEAR_DUPLICATE_CACHE_MAX_TOTAL_ENTRIES: int = 100_000  # across all indexes
+    NEAR_DUPLICATE_CACHE_BANDS: int = 8
+    NEAR_DUPLICATE_CACHE_TTL: int = 3600  # seconds
+
     # Cloud Provider Settings
     OPENAI_API_KEY: Optional[SecretStr] = None
     AZURE_API_KEY: Optional[SecretStr] = None
@@ -0,0 +1,110 @@
+import enum
+from typing import Any, Dict, List, Optional
+
+from src.core.exceptions import ContextLengthExceededError
+from src.core.logging import get_logger
+from src.core.tokens import REPLY_PRIMING_TOKENS
+
+logger = get_logger(__name__)
+
+
+class ContextPolicy(str, enum.Enum):
+    """How to handle conversations that exceed the model context window"""
+
+    REJECT = "reject"
+    DROP_OLDEST = "drop_oldest"
+    TRUNCATE_MIDDLE = "truncate_middle"
+
+
+def get_context_policy(
+    config: Optional[Dict[str, Any]], default: ContextPolicy
+) -> ContextPolicy:
+    """Get the context policy of a tenant config, or ``default`` if unknown"""
+    value = (config or {}).get("context_policy", default)
+    try:
+        return ContextPolicy(value)
+    except ValueError:
+        # Config written before it was validated; not worth failing requests
+        logger.warning("unknown_context_policy", context_policy=value)
+        return default
+
+
+def get_context_limit(
+    model: str, limits: Dict[str, int], default: int
+) -> int:
+    """Get a model's context window, matching dated variants by prefix"""
+    if model in limits:
+        return limits[model]
+    matches = [name for name in limits if model.startswith(name)]
+    if matches:
+        return limits[max(matches, key=len)]
+    return default
+
+
+def fit_messages(
+    messages: List[Dict[str, Any]],
+    message_tokens: List[int],
+    context_limit: int,
+    policy: ContextPolicy,
+    reserved_tokens: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fit a conversation into a context window according to a policy
+
+    System messages and the latest message are always kept. ``drop_oldest``
+    drops the oldest other turns first; ``truncate_middle`` also keeps the
+    first non-system turn and drops turns from the middle of the
+    conversation.
+
+    Args:
+        messages: Chat messages in conversation order
+        message_tokens: Token count of each message, including format overhead
+        context_limit: Model context window in tokens
+        policy: Policy to apply when the conversation does not fit
+        reserved_tokens: Tokens reserved for the completion
+
+    Returns:
+        The messages to send, in conversation order
+
+    Raises:
+        ContextLengthExceededError: If the policy is ``reject`` or the kept
+            messages alone do not fit
+    """
+    budget = context_limit - (reserved_tokens or 0) - REPLY_PRIMING_TOKENS
+    total = sum(message_tokens)
+    if total <= budget:
+        return messages
+
+    if policy == ContextPolicy.REJECT or not messages:
+        raise ContextLengthExceededError(
+            context_limit=context_limit, prompt_tokens=total + REPLY_PRIMING_TOKENS
+        )
+
+    last = len(messages) - 1
+    keep = {
+        i for i, message in enumerate(messages) if message.get("role") == "system"
+    }
+    keep.add(last)
+    if policy == ContextPolicy.TRUNCATE_MIDDLE:
+        first_turn = next((i for i in range(len(messages)) if i not in keep), None)
+        if first_turn is not None:
+            keep.add(first_turn)
+
+    used = sum(message_tokens[i] for i in keep)
+    if used > budget:
+        raise ContextLengthExceededError(
+            message="Conversation exceeds the model context window after trimming",
+            context_limit=context_limit,
+            prompt_tokens=used + REPLY_PRIMING_TOKENS,
+        )
+
+    # Add back the most recent droppable turns while they fit
+    for i in range(last - 1, -1, -1):
+        if i in keep:
+            continue
+        if used + message_tokens[i] > budget:
+            break
+        keep.add(i)
+        used += message_tokens[i]
+
+    return [message for i, message in enumerate(messages) if i in keep]
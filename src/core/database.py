@@ -1,8 +1,16 @@
+import asyncio
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Dict
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
 
 import asyncpg
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
@@ -10,13 +18,36 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.pool import NullPool
 
+from src.core.bulkhead import Bulkhead
 from src.core.config import get_settings
-from src.core.exceptions import DatabaseError
+from src.core.exceptions import DatabaseError, ServiceOverloadedError
 from src.core.logging import get_logger
 
 settings = get_settings()
 logger = get_logger(__name__)
 
+db_pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds",
+    "Time waiting for a database connection from the pool",
+    ["bulkhead"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+db_connections_checked_out = Gauge(
+    "db_connections_checked_out",
+    "Database connections checked out of the pools",
+    ["bulkhead"],
+)
+db_connection_hold_seconds = Histogram(
+    "db_connection_hold_seconds",
+    "Time a database connection is checked out, from checkout to checkin",
+    ["bulkhead"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# SQLSTATE of a statement cancelled by statement_timeout
+QUERY_CANCELED = "57014"
+
 
 class Base(DeclarativeBase):
     """Base class for SQLAlchemy models"""
@@ -24,9 +55,11 @@ class Base(DeclarativeBase):
     pass
 
 
-# Store tenant-specific engines and session factories
-tenant_engines: Dict[str, AsyncSession] = {}
-tenant_session_factories: Dict[str, async_sessionmaker[AsyncSession]] = {}
+# Store tenant-specific engines and session factories, per bulkhead
+tenant_engines: Dict[Tuple[str, Bulkhead], AsyncEngine] = {}
+tenant_session_factories: Dict[
+    Tuple[str, Bulkhead], async_sessionmaker[AsyncSession]
+] = {}
 
 
 def get_system_db_url() -> str:
@@ -100,15 +133,70 @@ async def create_tenant_database(tenant_id: str) -> None:
         )
 
 
-def get_tenant_session_factory(tenant_id: str) -> async_sessionmaker[AsyncSession]:
+def _pool_options(bulkhead: Bulkhead) -> Dict[str, Any]:
+    """Engine pool options of a bulkhead"""
+    if bulkhead == Bulkhead.BACKGROUND:
+        timeout = settings.DB_BACKGROUND_STATEMENT_TIMEOUT
+        return {
+            "pool_size": settings.DB_BACKGROUND_POOL_SIZE,
+            "max_overflow": settings.DB_BACKGROUND_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_BACKGROUND_POOL_TIMEOUT,
+            "connect_args": {
+                # Postgres cancels statements running longer; the client
+                # gives up a little later if the server does not answer
+                "server_settings": {"statement_timeout": str(int(timeout * 1000))},
+                "command_timeout": timeout + 5,
+            },
+        }
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def _is_overload(error: Exception) -> bool:
+    """Whether an error means a pool or query limit shed the work"""
+    if isinstance(error, PoolTimeoutError):
+        return True
+    return (
+        isinstance(error, DBAPIError)
+        and getattr(error.orig, "sqlstate", None) == QUERY_CANCELED
+    )
+
+
+def _instrument_pool(engine: AsyncEngine, bulkhead: Bulkhead) -> None:
+    """Track connection checkouts and checkins of an engine's pool"""
+    checked_out = db_connections_checked_out.labels(bulkhead=bulkhead.value)
+    hold_seconds = db_connection_hold_seconds.labels(bulkhead=bulkhead.value)
+
+    def checkout(dbapi_connection: Any, record: Any, proxy: Any) -> None:
+        record.info["checked_out_at"] = time.perf_counter()
+        checked_out.inc()
+
+    def checkin(dbapi_connection: Any, record: Any) -> None:
+        start = record.info.pop("checked_out_at", None)
+        if start is not None:
+            checked_out.dec()
+            hold_seconds.observe(time.perf_counter() - start)
+
+    event.listen(engine.sync_engine, "checkout", checkout)
+    event.listen(engine.sync_engine, "checkin", checkin)
+
+
+def get_tenant_session_factory(
+    tenant_id: str, bulkhead: Bulkhead = Bulkhead.HOT
+) -> async_sessionmaker[AsyncSession]:
     """Get or create session factory for a tenant"""
-    if tenant_id not in tenant_session_factories:
+    key = (tenant_id, bulkhead)
+    if key not in tenant_session_factories:
         db_url = get_tenant_db_url(tenant_id)
         logger.debug(
             "creating_session_factory",
             tenant_id=tenant_id,
+            bulkhead=bulkhead.value,
             db_url=db_url,
-            existing_factories=list(tenant_session_factories.keys()),
+            existing_factories=len(tenant_session_factories),
         )
 
         engine = create_async_engine(
@@ -116,29 +204,143 @@ def get_tenant_session_factory(tenant_id: str) -> async_sessionmaker[AsyncSessio
             pool_pre_ping=True,
             echo=settings.DEBUG,
             isolation_level="READ COMMITTED",
+            **_pool_options(bulkhead),
         )
-        tenant_engines[tenant_id] = engine
-        tenant_session_factories[tenant_id] = async_sessionmaker(
+        _instrument_pool(engine, bulkhead)
+        tenant_engines[key] = engine
+        tenant_session_factories[key] = async_sessionmaker(
             engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
         )
-        logger.info("session_factory_created", tenant_id=tenant_id, db_url=db_url)
+        logger.info(
+            "session_factory_created",
+            tenant_id=tenant_id,
+            bulkhead=bulkhead.value,
+            db_url=db_url,
+        )
     else:
         logger.debug(
             "reusing_session_factory",
             tenant_id=tenant_id,
-            db_url=str(tenant_engines[tenant_id].url),
+            bulkhead=bulkhead.value,
+            db_url=str(tenant_engines[key].url),
         )
 
-    return tenant_session_factories[tenant_id]
+    return tenant_session_factories[key]
+
+
+class UnitOfWork:
+    """
+    Tenant sessions shared by everything one request does
+
+    Inside a unit of work ``get_tenant_db_session`` lazily opens at most one
+    session per database and bulkhead and hands it to every caller, so the
+    authentication, quota check and usage tracking of a request share one
+    connection per database. Leaving a ``get_tenant_db_session`` block does
+    not commit; ``commit`` commits every session once at the end. An error
+    inside a block still rolls back that block's session.
+
+    Sessions are only shared with the task that first uses the unit of work;
+    tasks it spawns, which may run concurrently or outlive the request, get
+    sessions of their own.
+    """
+
+    def __init__(self) -> None:
+        self.sessions: Dict[Tuple[str, Bulkhead], AsyncSession] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def owns(self) -> bool:
+        """Whether the current task shares the unit of work's sessions"""
+        if self._closed:
+            return False
+        if self._task is None:
+            self._task = asyncio.current_task()
+        return self._task is asyncio.current_task()
+
+    def session(self, tenant_id: str, bulkhead: Bulkhead) -> AsyncSession:
+        """Session of a database, opened on first use"""
+        key = (tenant_id, bulkhead)
+        if key not in self.sessions:
+            self.sessions[key] = get_tenant_session_factory(tenant_id, bulkhead)()
+        return self.sessions[key]
+
+    async def commit(self) -> None:
+        """Commit every session"""
+        for (tenant_id, _), session in self.sessions.items():
+            if not session.in_transaction():
+                continue
+            try:
+                await session.commit()
+            except Exception as e:
+                logger.error("session_commit_failed", tenant_id=tenant_id, error=str(e))
+                raise DatabaseError(
+                    message="Database session error",
+                    operation="commit",
+                    details=str(e),
+                )
+            logger.debug("session_committed", tenant_id=tenant_id)
+
+    async def close(self) -> None:
+        """Close every session, rolling back changes not committed"""
+        self._closed = True
+        for (tenant_id, _), session in self.sessions.items():
+            await session.close()
+            logger.debug("session_closed", tenant_id=tenant_id)
+        self.sessions.clear()
+
+
+# Unit of work of the current request, if any
+_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar(
+    "unit_of_work", default=None
+)
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncGenerator[UnitOfWork, None]:
+    """
+    Share tenant sessions within the block
+
+    Changes are kept by calling ``commit`` on the unit of work; the sessions
+    are closed, and uncommitted changes rolled back, when the block ends.
+    """
+    unit = UnitOfWork()
+    token = _unit_of_work.set(unit)
+    try:
+        yield unit
+    finally:
+        _unit_of_work.reset(token)
+        await unit.close()
 
 
 @asynccontextmanager
-async def get_tenant_db_session(tenant_id: str) -> AsyncGenerator[AsyncSession, None]:
-    """Get a database session for a tenant"""
+async def get_tenant_db_session(
+    tenant_id: str, bulkhead: Bulkhead = Bulkhead.HOT
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Get a database session for a tenant
+
+    Within a ``unit_of_work`` the session of the unit of work is reused and
+    left open; otherwise a session is opened, committed and closed.
+
+    Args:
+        tenant_id: Tenant ID, or "system" for the system database
+        bulkhead: Connection pool to draw from; analytics reports and
+            background work use ``Bulkhead.BACKGROUND``
+
+    Raises:
+        ServiceOverloadedError: If no connection frees up in time, or a
+            statement is cancelled by the bulkhead's statement timeout
+    """
+    unit = _unit_of_work.get()
+    if unit is not None and not unit.owns():
+        unit = None
     session = None
     try:
-        session_factory = get_tenant_session_factory(tenant_id)
-        session = session_factory()
+        if unit is None:
+            session_factory = get_tenant_session_factory(tenant_id, bulkhead)
+            session = session_factory()
+        else:
+            session = unit.session(tenant_id, bulkhead)
 
         logger.debug(
             "db_session_created",
@@ -147,18 +349,38 @@ async def get_tenant_db_session(tenant_id: str) -> AsyncGenerator[AsyncSession,
                 "bind": str(session.bind.url) if session.bind else None,
                 "in_transaction": session.in_transaction(),
                 "is_active": session.is_active,
+                "shared": unit is not None,
             },
         )
 
         try:
+            if not session.in_transaction():
+                start = time.perf_counter()
+                await session.connection()
+                db_pool_wait_seconds.labels(bulkhead=bulkhead.value).observe(
+                    time.perf_counter() - start
+                )
+
             yield session
-            if session.in_transaction():
+            if unit is None and session.in_transaction():
                 await session.commit()
                 logger.debug("session_committed", tenant_id=tenant_id)
         except Exception as e:
             if session.in_transaction():
                 await session.rollback()
                 logger.debug("session_rolled_back", tenant_id=tenant_id, error=str(e))
+            if isinstance(e, ServiceOverloadedError):
+                raise
+            if _is_overload(e):
+                logger.warning(
+                    "db_bulkhead_overloaded",
+                    tenant_id=tenant_id,
+                    bulkhead=bulkhead.value,
+                    error=str(e),
+                )
+                raise ServiceOverloadedError(
+                    message="Database is busy, retry later"
+                ) from e
             raise DatabaseError(
                 message="Database session error",
                 operation="session_management",
@@ -173,19 +395,20 @@ async def get_tenant_db_session(tenant_id: str) -> AsyncGenerator[AsyncSession,
         )
         raise
     finally:
-        if session:
+        if session and unit is None:
             await session.close()
             logger.debug("session_closed", tenant_id=tenant_id)
 
 
 async def cleanup_tenant_connections(tenant_id: str) -> None:
     """Cleanup database connections for a tenant"""
-    if tenant_id in tenant_engines:
-        engine = tenant_engines[tenant_id]
+    for key in [key for key in tenant_engines if key[0] == tenant_id]:
+        engine = tenant_engines.pop(key)
         await engine.dispose()
-        del tenant_engines[tenant_id]
-        del tenant_session_factories[tenant_id]
-        logger.info("tenant_connections_cleaned", tenant_id=tenant_id)
+        del tenant_session_factories[key]
+        logger.info(
+            "tenant_connections_cleaned", tenant_id=tenant_id, bulkhead=key[1].value
+        )
 
 
 async def initialize_database() -> None:
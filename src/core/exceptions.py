@@ -59,6 +59,15 @@ class RateLimitExceededError(LLMBackendException):
         )
 
 
+class IdempotencyConflictError(LLMBackendException):
+    """Raised when a request with the same idempotency key is still running"""
+
+    def __init__(
+        self, message: str = "A request with this Idempotency-Key is in progress"
+    ):
+        super().__init__(message=message, status_code=status.HTTP_409_CONFLICT)
+
+
 class InvalidAPIKeyError(LLMBackendException):
     """Raised when API key is invalid"""
 
@@ -82,6 +91,22 @@ class ModelNotAvailableError(LLMBackendException):
         )
 
 
+class ContextLengthExceededError(LLMBackendException):
+    """Raised when a conversation does not fit in the model's context window"""
+
+    def __init__(
+        self,
+        message: str = "Conversation exceeds the model context window",
+        context_limit: int = 0,
+        prompt_tokens: int = 0,
+    ):
+        super().__init__(
+            message=message,
+            status_code=status.HTTP_400_BAD_REQUEST,
+            extra={"context_limit": context_limit, "prompt_tokens": prompt_tokens},
+        )
+
+
 class WebhookDeliveryError(LLMBackendException):
     """Raised when webhook delivery fails"""
 
@@ -114,6 +139,17 @@ class DatabaseError(LLMBackendException):
         )
 
 
+class ServiceOverloadedError(LLMBackendException):
+    """Raised when a connection pool or query limit sheds a request"""
+
+    def __init__(self, message: str = "Service overloaded", retry_after: int = 1):
+        super().__init__(
+            message=message,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            extra={"retry_after": retry_after},
+        )
+
+
 class ValidationError(LLMBackendException):
     """Raised when validation fails"""
 
@@ -3,13 +3,20 @@ import uuid
 from contextvars import ContextVar
 from typing import Callable
 
-from fastapi import Request, Response
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
 from prometheus_client import Counter, Histogram
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.types import ASGIApp
 
-from src.core.exceptions import TenantNotFoundError
-from src.core.logging import log_request_info
+from src.core.config import get_settings
+from src.core.database import unit_of_work
+from src.core.exceptions import DatabaseError, TenantNotFoundError
+from src.core.logging import get_logger, log_request_info
+from src.core.utils import format_error_response
+
+settings = get_settings()
+logger = get_logger(__name__)
 
 # Context variables for request-scoped data
 request_id_ctx = ContextVar[str]("request_id", default="")
@@ -130,7 +137,14 @@ class PrometheusMiddleware(BaseHTTPMiddleware):
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Middleware to handle rate limiting"""
+    """
+    Middleware to handle rate limiting
+
+    Resolves the API key to its tenant, sets the tenant context for the
+    middleware and handlers below it, and admits the request against the
+    tenant and API key rate limits. Add it last (outermost) so logs and
+    metrics of admitted requests carry the tenant.
+    """
 
     def __init__(
         self,
@@ -143,14 +157,82 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     async def dispatch(
         self, request: Request, call_next: RequestResponseEndpoint
     ) -> Response:
-        tenant_id = tenant_id_ctx.get()
+        api_key = request.headers.get("X-API-Key")
 
         # Skip rate limiting for health check and metrics endpoints
-        if request.url.path in ["/health", "/metrics"]:
+        if not api_key or request.url.path in ["/health", "/metrics"]:
+            return await call_next(request)
+
+        service = await self.rate_limit_service()
+        try:
+            key = await service.resolve_key(api_key)
+        except Exception as e:
+            logger.error("rate_limit_key_lookup_failed", error=str(e))
+            key = None
+        if not key:
+            # Unknown keys are rejected by authentication
             return await call_next(request)
 
-        # Check rate limit
-        await self.rate_limit_service(tenant_id)
+        tenant_id_ctx.set(key["tenant_id"])
+        request.state.tenant_id = key["tenant_id"]
+
+        result = None
+        if settings.RATE_LIMIT_ENABLED:
+            try:
+                result = await service.check(
+                    key["tenant_id"], key["api_key_id"], key["config"]
+                )
+            except Exception as e:
+                # Fail open: a Redis outage must not take the API down
+                logger.error(
+                    "rate_limit_check_failed", tenant_id=key["tenant_id"], error=str(e)
+                )
+
+        if result and not result.allowed:
+            return JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content=format_error_response(
+                    message="Rate limit exceeded",
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    extra={"retry_after": int(result.headers()["Retry-After"])},
+                ),
+                headers=result.headers(),
+            )
 
         response = await call_next(request)
+        if result:
+            response.headers.update(result.headers())
+        return response
+
+
+class UnitOfWorkMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware to share database sessions across a request
+
+    Requests to ``UNIT_OF_WORK_PATHS`` run in a unit of work: authentication,
+    quota checks and usage tracking reuse one session per database, and the
+    sessions commit once, after the endpoint returns and before the response
+    is sent. Server errors roll back. Add it first (innermost) so the commit
+    happens inside the logging and metrics of the request.
+    """
+
+    async def dispatch(
+        self, request: Request, call_next: RequestResponseEndpoint
+    ) -> Response:
+        if request.url.path not in settings.UNIT_OF_WORK_PATHS:
+            return await call_next(request)
+
+        async with unit_of_work() as unit:
+            response = await call_next(request)
+            if response.status_code >= 500:
+                return response
+            try:
+                await unit.commit()
+            except DatabaseError as e:
+                return JSONResponse(
+                    status_code=e.status_code,
+                    content=format_error_response(
+                        message=str(e), status_code=e.status_code, extra=e.extra
+                    ),
+                )
         return response
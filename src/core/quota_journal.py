@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# (tenant ID, user ID, API key ID, quota windows of the three scopes)
+UsageKey = Tuple[str, str, Optional[str], Tuple[Optional[str], ...]]
+
+USAGE_FIELDS = ("tenant_usage", "user_usage", "api_key_usage")
+
+
+def usage_scopes(key: UsageKey) -> List[Tuple[str, Hashable]]:
+    """(usage field, counter) of each quota scope a usage key is charged to"""
+    tenant_id, user_id, api_key_id, windows = key
+    scopes = [
+        ("tenant_usage", (tenant_id, windows[0])),
+        ("user_usage", (tenant_id, user_id, windows[1])),
+    ]
+    if api_key_id:
+        scopes.append(("api_key_usage", (tenant_id, user_id, api_key_id, windows[2])))
+    return scopes
+
+
+class QuotaJournal:
+    """
+    Quota usage of one worker while the shared counters are unreachable
+
+    The worker remembers the last usage it saw per counter. While degraded it
+    admits requests against a ``share`` of the headroom that was left, since
+    every worker does the same without seeing the others, and journals the
+    usage it charges, per UTC hour, so it can be added to the shared counters
+    later in the window buckets it was charged in. Counters never seen are
+    given a ``share`` of the whole limit.
+    """
+
+    def __init__(self, share: float, max_entries: int = 100_000) -> None:
+        self.share = share
+        self.max_entries = max_entries
+        self._known: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._local: Dict[Hashable, int] = {}
+        self._pending: Dict[Tuple[UsageKey, datetime], int] = {}
+
+    @property
+    def pending_tokens(self) -> int:
+        return sum(self._pending.values())
+
+    def observe(self, key: UsageKey, usage: Dict[str, int]) -> None:
+        """Remember the shared counter values of a usage key"""
+        for field, counter in usage_scopes(key):
+            if field in usage:
+                self._known[counter] = usage[field]
+                self._known.move_to_end(counter)
+        while len(self._known) > self.max_entries:
+            self._known.popitem(last=False)
+
+    def usage(self, key: UsageKey) -> Dict[str, int]:
+        """Last seen usage plus the tokens charged locally since"""
+        return {
+            field: self._known.get(counter, 0) + self._local.get(counter, 0)
+            for field, counter in usage_scopes(key)
+        }
+
+    def allowance(
+        self, key: UsageKey, limits: List[Optional[int]]
+    ) -> List[Optional[int]]:
+        """
+        Tokens the worker may still admit under each limit while degraded
+
+        Args:
+            key: Usage key
+            limits: Limit of each scope of the key, None where unlimited
+        """
+        allowances = []
+        for (_, counter), limit in zip(usage_scopes(key), limits):
+            if limit is None:
+                allowances.append(None)
+                continue
+            known = self._known.get(counter)
+            headroom = max(limit - known if known is not None else limit, 0)
+            allowances.append(int(headroom * self.share) - self._local.get(counter, 0))
+        return allowances
+
+    def record(
+        self, key: UsageKey, tokens: int, at: Optional[datetime] = None
+    ) -> Dict[str, int]:
+        """
+        Charge tokens locally and journal them
+
+        Args:
+            key: Usage key
+            tokens: Tokens charged
+            at: UTC time the tokens were charged, now if None
+
+        Returns:
+            Approximate usage of each scope
+        """
+        hour = (at or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+        for _, counter in usage_scopes(key):
+            self._local[counter] = self._local.get(counter, 0) + tokens
+        self._pending[key, hour] = self._pending.get((key, hour), 0) + tokens
+        return self.usage(key)
+
+    def drain(self) -> Dict[Tuple[UsageKey, datetime], int]:
+        """Take the journal, tokens per usage key and UTC hour charged"""
+        pending, self._pending = self._pending, {}
+        for (key, _), tokens in pending.items():
+            for _, counter in usage_scopes(key):
+                self._local[counter] -= tokens
+                if not self._local[counter]:
+                    del self._local[counter]
+        return pending
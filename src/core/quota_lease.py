@@ -0,0 +1,66 @@
+import time
+from typing import List
+
+
+class QuotaLease:
+    """
+    Block of quota tokens a worker took from the shared usage counters
+
+    Requests are served from ``available`` without touching the counters.
+    The lease tracks an exponentially weighted rate of consumption so the
+    next block covers about ``target_seconds`` of traffic.
+    """
+
+    def __init__(self, ttl: float, half_life: float = 5.0) -> None:
+        self.ttl = ttl
+        self.half_life = half_life
+        self.available = 0
+        self.counters: List[int] = []  # counter values when last granted
+        self.expires_at = 0.0
+        self.rate = 0.0  # tokens per second
+        self._last = time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def grant(self, tokens: int, counters: List[int]) -> None:
+        """Add a granted block and renew the lease"""
+        self.available += tokens
+        self.counters = counters
+        self.expires_at = time.monotonic() + self.ttl
+
+    def take_unused(self) -> int:
+        """Give up the unused tokens, to be returned to the counters"""
+        unused, self.available = self.available, 0
+        self.expires_at = 0.0
+        return unused
+
+    def consume(self, tokens: int) -> int:
+        """
+        Charge tokens to the lease
+
+        Returns:
+            Tokens beyond the lease, to be charged to the counters directly
+        """
+        now = time.monotonic()
+        elapsed = max(now - self._last, 1e-3)
+        decay = 0.5 ** (elapsed / self.half_life)
+        self.rate = self.rate * decay + (1 - decay) * tokens / elapsed
+        self._last = now
+
+        used = min(tokens, self.available)
+        self.available -= used
+        return tokens - used
+
+    def usage(self) -> List[int]:
+        """Approximate counter values, excluding this lease's unused tokens"""
+        return [counter - self.available for counter in self.counters]
+
+    def next_block(
+        self, need: int, target_seconds: float, min_block: int, max_block: int
+    ) -> int:
+        """Size of the next block: the expected use over ``target_seconds``"""
+        block = int(self.rate * target_seconds)
+        return max(need, min(max(block, min_block), max_block))
+
@@ -0,0 +1,105 @@
+import calendar
+import enum
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+
+class QuotaWindow(str, enum.Enum):
+    """Period a token quota applies to"""
+
+    LIFETIME = "lifetime"
+    DAILY = "daily"
+    MONTHLY = "monthly"
+    ROLLING = "rolling"
+
+
+def is_lifetime(window: Optional[str]) -> bool:
+    return window in (None, QuotaWindow.LIFETIME)
+
+
+# (key suffix, bucket fields, TTL in seconds or -1 for none)
+Buckets = List[Tuple[str, List[str], int]]
+
+
+def _hours(day: datetime, first: int, last: int) -> Tuple[str, List[str]]:
+    return f":hours:{day:%Y%m%d}", [str(hour) for hour in range(first, last + 1)]
+
+
+def quota_buckets(
+    window: Optional[str], now: datetime, rolling_hours: int = 24
+) -> Buckets:
+    """
+    Counter buckets holding the usage of a quota window, oldest first
+
+    Windowed usage is kept in one Redis hash per UTC day with a field per
+    hour, or per month with a field per day, so the usage of any window is
+    the sum of a few fields of at most a few hashes. Daily and rolling
+    windows share the hourly layout. Lifetime usage is a plain counter.
+    The current bucket is the last field of the last entry.
+
+    Args:
+        window: Quota window; None means lifetime
+        now: Current UTC time
+        rolling_hours: Length of rolling windows in hours
+    """
+    if window == QuotaWindow.DAILY:
+        suffix, fields = _hours(now, 0, now.hour)
+        return [(suffix, fields, 2 * 86_400)]
+
+    if window == QuotaWindow.MONTHLY:
+        days = calendar.monthrange(now.year, now.month)[1]
+        fields = [str(day) for day in range(1, now.day + 1)]
+        return [(f":days:{now:%Y%m}", fields, (days + 1) * 86_400)]
+
+    if window == QuotaWindow.ROLLING:
+        ttl = (rolling_hours + 24) * 3_600
+        start = now - timedelta(hours=rolling_hours - 1)
+        buckets = []
+        day = start
+        while day.date() <= now.date():
+            first = start.hour if day.date() == start.date() else 0
+            last = now.hour if day.date() == now.date() else 23
+            suffix, fields = _hours(day, first, last)
+            buckets.append((suffix, fields, ttl))
+            day += timedelta(days=1)
+        return buckets
+
+    return [("", [], -1)]
+
+
+def bucket_usage(
+    window: Optional[str],
+    now: datetime,
+    total: int,
+    hourly: Dict[datetime, int],
+    rolling_hours: int = 24,
+) -> Dict[Tuple[str, Optional[str]], int]:
+    """
+    Expected value of every counter bucket of a window
+
+    Args:
+        window: Quota window; None means lifetime
+        now: Current UTC time
+        total: Lifetime usage
+        hourly: Usage per UTC hour, covering at least the window
+        rolling_hours: Length of rolling windows in hours
+
+    Returns:
+        Dict of (key suffix, hash field or None for a plain counter) to value
+    """
+    if is_lifetime(window):
+        return {("", None): total}
+
+    expected: Dict[Tuple[str, Optional[str]], int] = {
+        (suffix, field): 0
+        for suffix, fields, _ in quota_buckets(window, now, rolling_hours)
+        for field in fields
+    }
+    for hour, tokens in hourly.items():
+        if window == QuotaWindow.MONTHLY:
+            bucket = (f":days:{hour:%Y%m}", str(hour.day))
+        else:
+            bucket = (f":hours:{hour:%Y%m%d}", str(hour.hour))
+        if bucket in expected:
+            expected[bucket] += tokens
+    return expected
@@ -0,0 +1,229 @@
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Fields of a tenant or API key limit, and of a model limit
+LIMIT_FIELDS = ("requests", "period", "tpm", "rpm")
+MODEL_LIMIT_FIELDS = ("tpm", "rpm")
+
+
+@dataclass
+class RateLimitRule:
+    scope: str  # "tenant" or "api_key"
+    key: str
+    limit: int
+    period: int  # seconds
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float  # seconds until the window frees a request
+
+    def headers(self) -> Dict[str, str]:
+        """Standard rate limit response headers"""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(self.remaining, 0)),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(math.ceil(self.reset), 1))
+        return headers
+
+
+def _is_int(value: Any, minimum: int) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value >= minimum
+
+
+def _legacy_limits(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Limits of the legacy flat ``{"requests": N, "period": S}`` shape"""
+    return {field: config[field] for field in ("requests", "period") if field in config}
+
+
+def _tenant_limits(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Tenant limits of a ``rate_limit`` entry, including the legacy shape"""
+    if config.get("tenant") is not None:
+        return config["tenant"]
+    return _legacy_limits(config)
+
+
+def _validate_limits(
+    path: str, limits: Any, fields: Tuple[str, ...] = LIMIT_FIELDS
+) -> List[str]:
+    if not isinstance(limits, dict):
+        return [f"{path} must be an object"]
+    errors = []
+    for field, value in limits.items():
+        if field not in fields:
+            errors.append(f"{path}.{field} is not a known field")
+        elif field == "requests" and not _is_int(value, 0):
+            errors.append(f"{path}.requests must be a non-negative integer")
+        elif field != "requests" and not _is_int(value, 1):
+            errors.append(f"{path}.{field} must be a positive integer")
+    return errors
+
+
+def validate_rate_limit_config(config: Any) -> List[str]:
+    """
+    Validate the ``rate_limit`` entry of a tenant config
+
+    Accepts the shape read by ``rate_limit_rules`` and ``token_bucket_rules``
+    as well as the legacy flat ``{"requests": N, "period": S}`` tenant limit.
+
+    Returns:
+        Validation errors, empty if the entry is valid
+    """
+    if not isinstance(config, dict):
+        return ["rate_limit must be an object"]
+
+    errors = []
+    legacy = {"requests", "period"} & config.keys()
+    if legacy:
+        if "tenant" in config:
+            errors.append(
+                "rate_limit must not combine 'tenant' with 'requests'/'period'"
+            )
+        elif legacy != {"requests", "period"}:
+            errors.append("rate_limit must contain 'requests' and 'period' fields")
+        errors.extend(_validate_limits("rate_limit", _legacy_limits(config)))
+    for scope in ("tenant", "api_key"):
+        if scope in config:
+            errors.extend(_validate_limits(f"rate_limit.{scope}", config[scope]))
+    if "models" in config:
+        if not isinstance(config["models"], dict):
+            errors.append("rate_limit.models must be an object")
+        else:
+            for model, limits in config["models"].items():
+                path = f"rate_limit.models.{model}"
+                errors.extend(_validate_limits(path, limits, MODEL_LIMIT_FIELDS))
+    for field in sorted(
+        config.keys() - {"requests", "period", "tenant", "api_key", "models"}
+    ):
+        errors.append(f"rate_limit.{field} is not a known field")
+    return errors
+
+
+def _rule(
+    scope: str, key: str, config: Optional[Dict[str, Any]], default_period: int
+) -> Optional[RateLimitRule]:
+    if not config or not config.get("requests"):
+        return None
+    return RateLimitRule(
+        scope=scope,
+        key=key,
+        limit=int(config["requests"]),
+        period=int(config.get("period", default_period)),
+    )
+
+
+def rate_limit_rules(
+    tenant_id: str,
+    api_key_id: str,
+    tenant_config: Optional[Dict[str, Any]],
+    default_limit: int,
+    default_period: int,
+) -> List[RateLimitRule]:
+    """
+    Request rate limits that apply to an API key of a tenant
+
+    Limits are sliding windows of at most ``requests`` requests in any
+    ``period`` seconds, set in the tenant config per tenant and per key::
+
+        {"rate_limit": {"tenant": {"requests": 6000, "period": 60},
+                        "api_key": {"requests": 600, "period": 60}}}
+
+    Keys without a configured limit get the default one; ``"requests": 0``
+    turns a limit off. Tenants are only limited when configured. The legacy
+    flat ``{"rate_limit": {"requests": 6000, "period": 60}}`` sets the tenant
+    limit.
+
+    Args:
+        tenant_id: Tenant ID
+        api_key_id: API key ID
+        tenant_config: Tenant config holding an optional ``rate_limit`` entry
+        default_limit: Requests per period for keys without a configured limit
+        default_period: Period in seconds when a limit does not set one
+    """
+    config = (tenant_config or {}).get("rate_limit") or {}
+    rules = []
+    tenant_rule = _rule(
+        "tenant", f"tenant:{tenant_id}", _tenant_limits(config), default_period
+    )
+    if tenant_rule:
+        rules.append(tenant_rule)
+    key_rule = _rule(
+        "api_key",
+        f"api_key:{api_key_id}",
+        config.get("api_key") or {"requests": default_limit, "period": default_period},
+        default_period,
+    )
+    if key_rule:
+        rules.append(key_rule)
+    return rules
+
+
+@dataclass
+class TokenBucketRule:
+    scope: str  # "tenant", "api_key" or "model"
+    unit: str  # "tokens" or "requests"
+    key: str
+    per_minute: int
+
+    @property
+    def refill_per_ms(self) -> float:
+        return self.per_minute / 60_000
+
+
+def token_bucket_rules(
+    tenant_id: str,
+    api_key_id: str,
+    model: str,
+    tenant_config: Optional[Dict[str, Any]],
+    model_rate_limit: Optional[Dict[str, Any]] = None,
+) -> List[TokenBucketRule]:
+    """
+    Tokens-per-minute and requests-per-minute buckets that apply to a request
+
+    ``tpm`` and ``rpm`` are read from the tenant config per tenant and per
+    API key, and per model from the tenant's ``ModelConfig.rate_limit``,
+    falling back to the tenant config's ``models`` entry::
+
+        {"rate_limit": {"tenant": {"tpm": 200000, "rpm": 1000},
+                        "api_key": {"tpm": 40000},
+                        "models": {"gpt-4": {"tpm": 80000, "rpm": 200}}}}
+
+    Each bucket holds up to one minute of its limit and refills continuously.
+
+    Args:
+        tenant_id: Tenant ID
+        api_key_id: API key ID
+        model: Requested model
+        tenant_config: Tenant config holding an optional ``rate_limit`` entry
+        model_rate_limit: ``rate_limit`` of the tenant's config for the model
+    """
+    config = (tenant_config or {}).get("rate_limit") or {}
+    scopes = [
+        ("tenant", f"tenant:{tenant_id}", _tenant_limits(config)),
+        ("api_key", f"api_key:{api_key_id}", config.get("api_key")),
+        (
+            "model",
+            f"model:{tenant_id}:{model}",
+            model_rate_limit or (config.get("models") or {}).get(model),
+        ),
+    ]
+    rules = []
+    for scope, key, limits in scopes:
+        for unit, field in (("tokens", "tpm"), ("requests", "rpm")):
+            if limits and limits.get(field):
+                rules.append(
+                    TokenBucketRule(
+                        scope=scope,
+                        unit=unit,
+                        key=f"{key}:{unit}",
+                        per_minute=int(limits[field]),
+                    )
+                )
+    return rules
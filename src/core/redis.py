@@ -1,28 +1,300 @@
 import json
+import math
+import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import redis.asyncio as redis
+from prometheus_client import Histogram
 from redis.asyncio.client import Redis
+from redis.asyncio.cluster import RedisCluster
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
 
+from src.core.bulkhead import Bulkhead
 from src.core.config import get_settings
 from src.core.exceptions import ConfigurationError, RateLimitExceededError
+from src.core.quota_window import quota_buckets
 from src.core.utils import generate_hash
 
 settings = get_settings()
 
+# Errors meaning Redis is unreachable, rather than a bad command
+CONNECTION_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError)
+
+redis_pool_wait_seconds = Histogram(
+    "redis_pool_wait_seconds",
+    "Time waiting for a Redis connection from the pool",
+    ["bulkhead"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+# Sliding-window log limiter over any number of windows, in one round trip.
+# KEYS: one sorted set per window. ARGV: unique request member, then a
+# (limit, window ms) pair per key. The request is admitted and recorded in
+# every window only if all of them have room. Returns {allowed, remaining1,
+# reset_ms1, remaining2, reset_ms2, ...}.
+RATE_LIMIT_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local result = {1}
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i])
+    local window = tonumber(ARGV[2 * i + 1])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local count = redis.call('ZCARD', key)
+    local reset = window
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    if oldest[2] then
+        reset = tonumber(oldest[2]) + window - now
+    end
+    if count >= limit then
+        result[1] = 0
+    end
+    result[2 * i] = limit - count
+    result[2 * i + 1] = reset
+end
+if result[1] == 1 then
+    for i, key in ipairs(KEYS) do
+        redis.call('ZADD', key, now, ARGV[1])
+        redis.call('PEXPIRE', key, ARGV[2 * i + 1])
+        result[2 * i] = result[2 * i] - 1
+    end
+end
+return result
+"""
+
+# Token buckets charged and reconciled in one round trip. KEYS: one hash
+# (tokens, ts) per bucket. ARGV[1]: "admit" or "reconcile", then a
+# (capacity, refill per ms, amount) triple per key. "admit" takes the amount
+# from every bucket only if all of them hold it (capped at their capacity, so
+# a request larger than a bucket waits for a full bucket and leaves it in
+# debt); "reconcile" takes a signed correction unconditionally. Returns
+# {allowed, ms to wait, level1, level2, ...}.
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local admit = ARGV[1] == 'admit'
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[3 * i - 1])
+    local rate = tonumber(ARGV[3 * i])
+    local amount = tonumber(ARGV[3 * i + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    local needed = math.min(amount, capacity)
+    if admit and tokens < needed then
+        wait = math.max(wait, math.ceil((needed - tokens) / rate))
+    end
+end
+local allowed = 1
+if wait > 0 then
+    allowed = 0
+end
+local result = {allowed, wait}
+for i, key in ipairs(KEYS) do
+    local tokens = levels[i]
+    if allowed == 1 then
+        local capacity = tonumber(ARGV[3 * i - 1])
+        local rate = tonumber(ARGV[3 * i])
+        tokens = math.min(capacity, tokens - tonumber(ARGV[3 * i + 1]))
+        redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', now)
+        redis.call('PEXPIRE', key, math.ceil((capacity - tokens) / rate) + 1000)
+    end
+    result[i + 2] = math.floor(tokens)
+end
+return result
+"""
+
+# Quota lease renewal in one round trip. KEYS: the usage counters a lease
+# draws from. ARGV: unused tokens to return, block wanted, tokens needed now,
+# largest share of the remaining headroom one lease may take, then the limit
+# of each counter (-1 for none). Grants min(block, max(needed, share of
+# headroom)) if the needed tokens fit under every limit, else nothing.
+# Returns {granted, counter1, counter2, ...}.
+QUOTA_LEASE_SCRIPT = """
+local returned = tonumber(ARGV[1])
+local block = tonumber(ARGV[2])
+local need = tonumber(ARGV[3])
+local share = tonumber(ARGV[4])
+local counters = {}
+local headroom = nil
+for i, key in ipairs(KEYS) do
+    if returned > 0 then
+        counters[i] = redis.call('DECRBY', key, returned)
+    else
+        counters[i] = tonumber(redis.call('GET', key) or '0')
+    end
+    local limit = tonumber(ARGV[4 + i])
+    if limit >= 0 and (headroom == nil or limit - counters[i] < headroom) then
+        headroom = limit - counters[i]
+    end
+end
+local grant = block
+if headroom ~= nil then
+    grant = math.min(block, math.max(need, math.floor(headroom * share)))
+    if grant > headroom then
+        grant = 0
+    end
+end
+local result = {grant}
+for i, key in ipairs(KEYS) do
+    if grant > 0 then
+        counters[i] = redis.call('INCRBY', key, grant)
+    end
+    result[i + 1] = counters[i]
+end
+return result
+"""
+
+# Finish an idempotency key attempt. KEYS: the record, the done signal.
+# ARGV: attempt id, completed record (empty to release the key), record TTL,
+# signal TTL. The record is only written while it still belongs to the
+# attempt; a retry that claimed the key after its lock expired keeps it.
+# Waiters of the attempt are woken either way. Returns 1 if written.
+IDEMPOTENCY_FINISH_SCRIPT = """
+local written = 0
+local current = redis.call('GET', KEYS[1])
+if current and cjson.decode(current)['attempt'] == ARGV[1] then
+    if ARGV[2] == '' then
+        redis.call('DEL', KEYS[1])
+    else
+        redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    end
+    written = 1
+end
+redis.call('RPUSH', KEYS[2], 1)
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return written
+"""
+
+# Token usage of several quota scopes in one round trip, optionally adding
+# to each. KEYS: the counters of every scope in order. ARGV: tokens to add
+# (0 to read), then per scope its number of keys, then per key a TTL in
+# seconds (-1 for none), its number of hash fields (0 for a plain counter)
+# and the fields. Tokens are added to the last field of a scope's last key.
+# Returns the usage of each scope, the sum of its fields.
+QUOTA_USAGE_SCRIPT = """
+local amount = tonumber(ARGV[1])
+local pos = 2
+local k = 1
+local result = {}
+local scope = 1
+while pos <= #ARGV do
+    local nkeys = tonumber(ARGV[pos])
+    pos = pos + 1
+    local total = 0
+    for j = 1, nkeys do
+        local key = KEYS[k]
+        local ttl = tonumber(ARGV[pos])
+        local nfields = tonumber(ARGV[pos + 1])
+        local fields = {}
+        for f = 1, nfields do
+            fields[f] = ARGV[pos + 1 + f]
+        end
+        k = k + 1
+        pos = pos + 2 + nfields
+        if nfields == 0 then
+            if amount ~= 0 then
+                total = total + redis.call('INCRBY', key, amount)
+            else
+                total = total + tonumber(redis.call('GET', key) or '0')
+            end
+        else
+            if amount ~= 0 and j == nkeys then
+                redis.call('HINCRBY', key, fields[nfields], amount)
+                if ttl > 0 then
+                    redis.call('EXPIRE', key, ttl)
+                end
+            end
+            for _, value in ipairs(redis.call('HMGET', key, unpack(fields))) do
+                total = total + tonumber(value or '0')
+            end
+        end
+    end
+    result[scope] = total
+    scope = scope + 1
+end
+return result
+"""
+
+
+def key_tag(value: str) -> str:
+    """
+    Key part that keeps every key holding it in one cluster slot
+
+    In cluster mode the value is a hash tag, so keys of one tenant (or job)
+    map to one slot: scripts and transactions over them stay single-slot
+    while tenants spread over the shards. On a single node it is unchanged.
+    """
+    return f"{{{value}}}" if settings.REDIS_CLUSTER_ENABLED else value
+
+
+def token_quota_key(tenant_id: str, *scope_ids: str) -> str:
+    """Usage counter key of a tenant, or of one of its users or API keys"""
+    return ":".join(("token_quota", key_tag(tenant_id), *scope_ids))
+
+
+class TimedConnectionPool(redis.BlockingConnectionPool):
+    """Blocking connection pool recording how long callers wait for a connection"""
+
+    def __init__(self, *args: Any, bulkhead: str = Bulkhead.HOT.value, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._wait_seconds = redis_pool_wait_seconds.labels(bulkhead=bulkhead)
+
+    async def get_connection(self, *args: Any, **kwargs: Any):
+        start = time.perf_counter()
+        try:
+            return await super().get_connection(*args, **kwargs)
+        finally:
+            self._wait_seconds.observe(time.perf_counter() - start)
+
 
 class RedisService:
     """Service for Redis operations including rate limiting and caching"""
 
-    def __init__(self) -> None:
-        self.redis: Optional[Redis] = None
+    def __init__(self, bulkhead: Bulkhead = Bulkhead.HOT) -> None:
+        self.redis: Optional[Union[Redis, RedisCluster]] = None
+        self.bulkhead = bulkhead
         self._connect()
 
     def _connect(self) -> None:
         """Establish Redis connection"""
+        max_connections = (
+            settings.REDIS_BACKGROUND_MAX_CONNECTIONS
+            if self.bulkhead == Bulkhead.BACKGROUND
+            else settings.REDIS_MAX_CONNECTIONS
+        )
         try:
-            self.redis = redis.from_url(str(settings.REDIS_URI))
+            if settings.REDIS_CLUSTER_ENABLED:
+                # Discovers the other nodes and routes each key to its shard
+                self.redis = RedisCluster.from_url(
+                    str(settings.REDIS_URI),
+                    max_connections=max_connections,
+                    socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                )
+            else:
+                self.redis = Redis(
+                    connection_pool=TimedConnectionPool.from_url(
+                        str(settings.REDIS_URI),
+                        bulkhead=self.bulkhead.value,
+                        max_connections=max_connections,
+                        timeout=settings.REDIS_POOL_TIMEOUT,
+                        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                    )
+                )
+            self._rate_limit_script = self.redis.register_script(RATE_LIMIT_SCRIPT)
+            self._token_bucket_script = self.redis.register_script(TOKEN_BUCKET_SCRIPT)
+            self._quota_lease_script = self.redis.register_script(QUOTA_LEASE_SCRIPT)
+            self._quota_usage_script = self.redis.register_script(QUOTA_USAGE_SCRIPT)
+            self._idempotency_finish_script = self.redis.register_script(
+                IDEMPOTENCY_FINISH_SCRIPT
+            )
         except Exception as e:
             raise ConfigurationError(
                 message="Failed to connect to Redis",
@@ -35,6 +307,10 @@ class RedisService:
         if self.redis:
             await self.redis.close()
 
+    async def ping(self) -> bool:
+        """Check that Redis answers"""
+        return await self.redis.ping()
+
     async def check_rate_limit(
         self,
         tenant_id: str,
@@ -57,32 +333,125 @@ class RedisService:
         Raises:
             RateLimitExceededError: If rate limit is exceeded
         """
-        redis_key = f"rate_limit:{tenant_id}:{key}"
+        allowed, windows = await self.check_rate_limits(
+            tenant_id, [(key, limit, period)]
+        )
+        if not allowed:
+            raise RateLimitExceededError(
+                message=f"Rate limit exceeded for {key}",
+                retry_after=math.ceil(windows[0][1] / 1000),
+            )
+        return True
 
-        # Get current count and TTL
-        async with self.redis.pipeline() as pipe:
-            pipe.get(redis_key)
-            pipe.ttl(redis_key)
-            count, ttl = await pipe.execute()
+    async def check_rate_limits(
+        self, tenant_id: str, limits: List[Tuple[str, int, int]]
+    ) -> Tuple[bool, List[Tuple[int, int]]]:
+        """
+        Atomically admit a request against several sliding-window limits
 
-        if count is None:
-            # Initialize rate limit
-            await self.redis.setex(redis_key, period, 1)
-            return True
+        The request is counted in every window only if all of them have room.
 
-        current_count = int(count)
-        if current_count >= limit:
-            raise RateLimitExceededError(
-                message=f"Rate limit exceeded for {key}", retry_after=ttl
-            )
+        Args:
+            tenant_id: Tenant the windows belong to
+            limits: (key, limit, period in seconds) of each window
 
-        # Increment counter
-        await self.redis.incr(redis_key)
-        return True
+        Returns:
+            Tuple of (allowed, (remaining, ms until a request frees up) per window)
+        """
+        result = await self._rate_limit_script(
+            keys=[f"rate_limit:{key_tag(tenant_id)}:{key}" for key, _, _ in limits],
+            args=[uuid.uuid4().hex]
+            + [
+                value for _, limit, period in limits for value in (limit, period * 1000)
+            ],
+        )
+        windows = [
+            (int(result[2 * i + 1]), int(result[2 * i + 2])) for i in range(len(limits))
+        ]
+        return result[0] == 1, windows
+
+    async def sync_rate_limit_counters(
+        self, counts: List[Tuple[int, int, int, int]]
+    ) -> List[int]:
+        """
+        Add host-local counts to the cluster-wide fixed-window counters
+
+        Args:
+            counts: (key hash, window ms, window id, count) of each counter
+
+        Returns:
+            Cluster-wide count of each window after the update
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for key, period_ms, window, count in counts:
+            name = f"rate_limit_window:{key:016x}:{window}"
+            pipe.incrby(name, count)
+            pipe.pexpire(name, 2 * period_ms)
+        result = await pipe.execute()
+        return [int(value) for value in result[::2]]
+
+    async def take_token_buckets(
+        self, tenant_id: str, mode: str, buckets: List[Tuple[str, int, float, int]]
+    ) -> Tuple[bool, int, List[int]]:
+        """
+        Charge or reconcile token buckets atomically
+
+        Args:
+            tenant_id: Tenant the buckets belong to
+            mode: "admit" to take amounts only if every bucket holds them,
+                "reconcile" to apply signed corrections unconditionally
+            buckets: (key, capacity, refill per ms, amount) of each bucket
+
+        Returns:
+            Tuple of (allowed, ms to wait before retrying, level per bucket)
+        """
+        result = await self._token_bucket_script(
+            keys=[
+                f"rate_limit_bucket:{key_tag(tenant_id)}:{key}"
+                for key, _, _, _ in buckets
+            ],
+            args=[mode]
+            + [
+                value
+                for _, capacity, rate, amount in buckets
+                for value in (capacity, repr(rate), amount)
+            ],
+        )
+        return result[0] == 1, int(result[1]), [int(level) for level in result[2:]]
+
+    async def _token_usage(
+        self,
+        scopes: List[Tuple[str, str, Optional[str]]],
+        tokens: int,
+        at: Optional[datetime] = None,
+    ) -> Dict[str, int]:
+        """
+        Read, or add tokens to, the usage counters of quota scopes
+
+        Args:
+            scopes: (result field, counter key, quota window) of each scope
+            tokens: Number of tokens to add, or 0 to read
+            at: UTC time the tokens were charged, now if None
+
+        Returns:
+            Dict of the usage of each scope over its window ending at ``at``
+        """
+        now = at or datetime.utcnow()
+        keys, args = [], [tokens]
+        for _, key, window in scopes:
+            buckets = quota_buckets(window, now, settings.QUOTA_ROLLING_WINDOW_HOURS)
+            args.append(len(buckets))
+            for suffix, fields, ttl in buckets:
+                keys.append(key + suffix)
+                args.extend([ttl, len(fields), *fields])
+        result = await self._quota_usage_script(keys=keys, args=args)
+        return {field: int(usage) for (field, _, _), usage in zip(scopes, result)}
 
     async def update_token_quota(
         self, tenant_id: str, user_id: str, tokens: int,
-        api_key_id: Optional[str] = None
+        api_key_id: Optional[str] = None,
+        windows: Optional[List[Optional[str]]] = None,
+        at: Optional[datetime] = None,
     ) -> Dict[str, int]:
         """
         Update token usage quota for tenant, user and optionally API key
@@ -92,35 +461,132 @@ class RedisService:
             user_id: User identifier
             tokens: Number of tokens to add to usage
             api_key_id: Optional API key identifier
+            windows: Quota window of the tenant, user and API key; lifetime
+                where None
+            at: UTC time the tokens were charged, e.g. when replaying usage
+                journaled during an outage; they are added to the window
+                buckets of that time. Now if None.
 
         Returns:
             Dict containing current usage for tenant, user and optionally API key
         """
-        tenant_key = f"token_quota:{tenant_id}"
-        user_key = f"token_quota:{tenant_id}:{user_id}"
+        windows = windows or [None, None, None]
+        scopes = [
+            ("tenant_usage", token_quota_key(tenant_id), windows[0]),
+            ("user_usage", token_quota_key(tenant_id, user_id), windows[1]),
+        ]
+        if api_key_id:
+            scopes.append(
+                (
+                    "api_key_usage",
+                    token_quota_key(tenant_id, user_id, api_key_id),
+                    windows[2],
+                )
+            )
+        return await self._token_usage(scopes, tokens, at)
 
-        async with self.redis.pipeline() as pipe:
-            # Increment tenant and user quotas
-            pipe.incrby(tenant_key, tokens)
-            pipe.incrby(user_key, tokens)
-            tenant_usage, user_usage = await pipe.execute()
+    async def lease_token_quota(
+        self,
+        tenant_id: str,
+        user_id: str,
+        api_key_id: Optional[str],
+        limits: List[Optional[int]],
+        returned: int,
+        block: int,
+        need: int,
+        share: float,
+    ) -> Tuple[int, List[int]]:
+        """
+        Return a lease's unused tokens and take a new block in one step
 
-        result = {
-            "tenant_usage": int(tenant_usage),
-            "user_usage": int(user_usage)
-        }
+        The block is added to the tenant, user and API key usage counters
+        up front, so leased tokens count as used until they are returned.
 
-        # Update API key quota if provided
+        Args:
+            tenant_id: Tenant identifier
+            user_id: User identifier
+            api_key_id: Optional API key identifier
+            limits: Quota limit of the tenant, user and API key counters
+            returned: Unused tokens to give back
+            block: Tokens wanted
+            need: Tokens needed now; nothing is granted if they do not fit
+            share: Largest share of the remaining headroom to take
+
+        Returns:
+            Tuple of (tokens granted, counter values after the grant)
+        """
+        keys = [token_quota_key(tenant_id), token_quota_key(tenant_id, user_id)]
         if api_key_id:
-            api_key = f"token_quota:{tenant_id}:{user_id}:{api_key_id}"
-            api_key_usage = await self.redis.incrby(api_key, tokens)
-            result["api_key_usage"] = int(api_key_usage)
+            keys.append(token_quota_key(tenant_id, user_id, api_key_id))
+        result = await self._quota_lease_script(
+            keys=keys,
+            args=[returned, block, need, repr(share)]
+            + [-1 if limit is None else limit for limit in limits[: len(keys)]],
+        )
+        return int(result[0]), [int(value) for value in result[1:]]
+
+    async def read_counters(
+        self, counters: List[Tuple[str, Optional[str]]]
+    ) -> List[Optional[int]]:
+        """
+        Read counters in one round trip
 
-        return result
+        Args:
+            counters: (key, hash field or None for a plain counter) of each
+
+        Returns:
+            Value of each counter, None where missing
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for key, field in counters:
+            if field is None:
+                pipe.get(key)
+            else:
+                pipe.hget(key, field)
+        return [
+            None if value is None else int(value) for value in await pipe.execute()
+        ]
+
+    async def adjust_counters(
+        self, adjustments: List[Tuple[str, Optional[str], int, int]]
+    ) -> None:
+        """
+        Add to counters in one round trip
+
+        Args:
+            adjustments: (key, hash field or None, amount, TTL in seconds or
+                -1 for none) of each counter
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for key, field, amount, ttl in adjustments:
+            if field is None:
+                pipe.incrby(key, amount)
+            else:
+                pipe.hincrby(key, field, amount)
+            if ttl > 0:
+                pipe.expire(key, ttl)
+        await pipe.execute()
+
+    async def try_lock(self, name: str, ttl: int) -> bool:
+        """Take a lock held until it expires, if no one holds it"""
+        return bool(await self.redis.set(f"lock:{name}", 1, nx=True, ex=ttl))
+
+    async def report_quota_worker(self, worker_id: str, at: float) -> None:
+        """Record when a worker last had no journaled usage to replay"""
+        await self.redis.hset("quota_workers", worker_id, int(at))
+
+    async def get_quota_workers(self) -> Dict[str, int]:
+        """Last report time of every registered worker"""
+        reports = await self.redis.hgetall("quota_workers")
+        return {worker_id.decode(): int(at) for worker_id, at in reports.items()}
+
+    async def remove_quota_worker(self, worker_id: str) -> None:
+        await self.redis.hdel("quota_workers", worker_id)
 
     async def get_token_usage(
         self, tenant_id: str, user_id: Optional[str] = None,
-        api_key_id: Optional[str] = None
+        api_key_id: Optional[str] = None,
+        windows: Optional[List[Optional[str]]] = None,
     ) -> Dict[str, int]:
         """
         Get current token usage for tenant, user and optionally API key
@@ -129,26 +595,27 @@ class RedisService:
             tenant_id: Tenant identifier
             user_id: Optional user identifier
             api_key_id: Optional API key identifier
+            windows: Quota window of the tenant, user and API key; lifetime
+                where None
 
         Returns:
             Dict containing current usage
         """
-        tenant_key = f"token_quota:{tenant_id}"
-        tenant_usage = await self.redis.get(tenant_key)
-
-        result = {"tenant_usage": int(tenant_usage or 0)}
-
+        windows = windows or [None, None, None]
+        scopes = [("tenant_usage", token_quota_key(tenant_id), windows[0])]
         if user_id:
-            user_key = f"token_quota:{tenant_id}:{user_id}"
-            user_usage = await self.redis.get(user_key)
-            result["user_usage"] = int(user_usage or 0)
-
+            scopes.append(
+                ("user_usage", token_quota_key(tenant_id, user_id), windows[1])
+            )
             if api_key_id:
-                api_key = f"token_quota:{tenant_id}:{user_id}:{api_key_id}"
-                api_key_usage = await self.redis.get(api_key)
-                result["api_key_usage"] = int(api_key_usage or 0)
-
-        return result
+                scopes.append(
+                    (
+                        "api_key_usage",
+                        token_quota_key(tenant_id, user_id, api_key_id),
+                        windows[2],
+                    )
+                )
+        return await self._token_usage(scopes, 0)
 
     async def cache_response(
         self,
@@ -203,6 +670,286 @@ class RedisService:
         cache_data = json.loads(cached)
         return cache_data["response"]
 
+    async def get_token_counts(self, keys: List[str]) -> List[Optional[int]]:
+        """
+        Get cached token counts in a single round trip
+
+        Args:
+            keys: Token count cache keys (encoding name and content hash)
+
+        Returns:
+            List of token counts, None for keys that are not cached
+        """
+        if not keys:
+            return []
+        keys = [f"token_count:{key}" for key in keys]
+        if settings.REDIS_CLUSTER_ENABLED:
+            # The keys are spread over the shards
+            values = await self.redis.mget_nonatomic(keys)
+        else:
+            values = await self.redis.mget(keys)
+        return [int(value) if value is not None else None for value in values]
+
+    async def set_token_counts(self, counts: Dict[str, int], ttl: int) -> None:
+        """
+        Cache token counts
+
+        Args:
+            counts: Mapping of token count cache key to token count
+            ttl: Cache TTL in seconds
+        """
+        if not counts:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, tokens in counts.items():
+                pipe.setex(f"token_count:{key}", ttl, tokens)
+            await pipe.execute()
+
+    async def get_session_window(
+        self, tenant_id: str, session_id: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the cached recent messages of a chat session
+
+        Args:
+            tenant_id: Tenant identifier
+            session_id: Chat session identifier
+
+        Returns:
+            Cached messages in conversation order, empty if not cached
+        """
+        values = await self.redis.lrange(
+            f"chat_session:{tenant_id}:{session_id}", 0, -1
+        )
+        return [json.loads(value) for value in values]
+
+    async def push_session_messages(
+        self,
+        tenant_id: str,
+        session_id: str,
+        messages: List[Dict[str, Any]],
+        max_messages: int,
+        ttl: int,
+        replace: bool = False,
+    ) -> None:
+        """
+        Append messages to the cached recent window of a chat session
+
+        Args:
+            tenant_id: Tenant identifier
+            session_id: Chat session identifier
+            messages: Messages to append, in conversation order
+            max_messages: Number of most recent messages to keep
+            ttl: Cache TTL in seconds
+            replace: Replace the cached window instead of appending to it
+        """
+        key = f"chat_session:{tenant_id}:{session_id}"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if replace:
+                pipe.delete(key)
+            pipe.rpush(key, *[json.dumps(message) for message in messages])
+            pipe.ltrim(key, -max_messages, -1)
+            pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def drop_session_window(self, tenant_id: str, session_id: str) -> None:
+        """Drop the cached recent window of a chat session"""
+        await self.redis.delete(f"chat_session:{tenant_id}:{session_id}")
+
+    async def enqueue_generation_job(
+        self, job: Dict[str, Any], payload: Dict[str, Any], ttl: int
+    ) -> None:
+        """
+        Store a generation job record and add it to the job stream
+
+        Args:
+            job: Job record returned to clients (id, tenant_id, status, ...)
+            payload: Request the worker runs
+            ttl: Job record TTL in seconds
+        """
+        key = f"generation_job:{key_tag(job['id'])}"
+        fields = {"job_id": job["id"], "payload": json.dumps(payload)}
+        if settings.REDIS_CLUSTER_ENABLED:
+            # The record and the stream are in different slots; the record
+            # goes first so workers always find it
+            await self.redis.setex(key, ttl, json.dumps(job))
+            await self.redis.xadd(
+                settings.JOB_STREAM,
+                fields,
+                maxlen=settings.JOB_STREAM_MAXLEN,
+                approximate=True,
+            )
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.setex(key, ttl, json.dumps(job))
+            pipe.xadd(
+                settings.JOB_STREAM,
+                fields,
+                maxlen=settings.JOB_STREAM_MAXLEN,
+                approximate=True,
+            )
+            await pipe.execute()
+
+    async def ensure_job_consumer_group(self) -> None:
+        """Create the job stream consumer group if it does not exist"""
+        try:
+            await self.redis.xgroup_create(
+                settings.JOB_STREAM, settings.JOB_CONSUMER_GROUP, id="0", mkstream=True
+            )
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def read_generation_jobs(
+        self, consumer: str, count: int, block_ms: int, min_idle_ms: int
+    ) -> List[tuple]:
+        """
+        Read jobs for a consumer of the job consumer group
+
+        Jobs left pending by consumers that died for longer than
+        ``min_idle_ms`` are claimed first, then new jobs are read.
+
+        Returns:
+            List of (message id, fields) tuples
+        """
+        _, claimed, *_ = await self.redis.xautoclaim(
+            settings.JOB_STREAM,
+            settings.JOB_CONSUMER_GROUP,
+            consumer,
+            min_idle_time=min_idle_ms,
+            start_id="0-0",
+            count=count,
+        )
+        # Entries deleted by stream trimming come back empty
+        messages = [(message_id, fields) for message_id, fields in claimed if fields]
+        if messages:
+            return messages
+
+        streams = await self.redis.xreadgroup(
+            settings.JOB_CONSUMER_GROUP,
+            consumer,
+            {settings.JOB_STREAM: ">"},
+            count=count,
+            block=block_ms,
+        )
+        return [message for _, entries in streams for message in entries]
+
+    async def touch_generation_jobs(
+        self, consumer: str, message_ids: List[Any]
+    ) -> None:
+        """Reset the idle time of jobs a consumer is still running"""
+        if message_ids:
+            await self.redis.xclaim(
+                settings.JOB_STREAM,
+                settings.JOB_CONSUMER_GROUP,
+                consumer,
+                min_idle_time=0,
+                message_ids=message_ids,
+                justid=True,
+            )
+
+    async def ack_generation_job(self, message_id: Any) -> None:
+        """Acknowledge and delete a finished job message"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xack(settings.JOB_STREAM, settings.JOB_CONSUMER_GROUP, message_id)
+            pipe.xdel(settings.JOB_STREAM, message_id)
+            await pipe.execute()
+
+    async def get_generation_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a generation job record"""
+        value = await self.redis.get(f"generation_job:{key_tag(job_id)}")
+        return json.loads(value) if value else None
+
+    async def set_generation_job(
+        self, job: Dict[str, Any], ttl: int, finished: bool = False
+    ) -> None:
+        """
+        Update a generation job record
+
+        Args:
+            job: Job record
+            ttl: Job record TTL in seconds
+            finished: Wake clients long-polling for the job
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.setex(f"generation_job:{key_tag(job['id'])}", ttl, json.dumps(job))
+            if finished:
+                done_key = f"generation_job_done:{key_tag(job['id'])}"
+                pipe.rpush(done_key, 1)
+                pipe.expire(done_key, settings.JOB_MAX_WAIT * 2)
+            await pipe.execute()
+
+    async def wait_generation_job(self, job_id: str, timeout: int) -> bool:
+        """
+        Block until a generation job finishes or the timeout passes
+
+        Returns:
+            bool: True if the job finished
+        """
+        return await self._wait_for_signal(
+            f"generation_job_done:{key_tag(job_id)}", timeout
+        )
+
+    async def _wait_for_signal(self, done_key: str, timeout: float) -> bool:
+        """Block until a token is pushed to ``done_key`` or the timeout passes"""
+        result = await self.redis.blpop([done_key], timeout=timeout)
+        if result:
+            # Put the token back so other clients waiting on the key wake too
+            await self.redis.rpush(done_key, 1)
+        return result is not None
+
+    async def claim_idempotency_key(
+        self, key: str, record: Dict[str, Any], ttl: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Store an in-flight record for an idempotency key unless one exists
+
+        Returns:
+            The existing record, or None if the key was claimed
+        """
+        existing = await self.redis.set(
+            f"idempotency:{key_tag(key)}", json.dumps(record), nx=True, get=True, ex=ttl
+        )
+        return json.loads(existing) if existing else None
+
+    async def finish_idempotency_key(
+        self, key: str, attempt: str, record: Optional[Dict[str, Any]], ttl: int
+    ) -> bool:
+        """
+        Store the outcome of a claimed idempotency key and wake waiting replays
+
+        Args:
+            key: Idempotency key
+            attempt: Attempt id of the in-flight record
+            record: Completed record, or None to release the key for a retry
+            ttl: Completed record TTL in seconds
+
+        Returns:
+            False if the key no longer belongs to the attempt and was left
+            unchanged
+        """
+        result = await self._idempotency_finish_script(
+            keys=[
+                f"idempotency:{key_tag(key)}",
+                f"idempotency_done:{key_tag(key)}:{attempt}",
+            ],
+            args=[
+                attempt,
+                json.dumps(record) if record is not None else "",
+                max(ttl, 1),
+                settings.IDEMPOTENCY_MAX_WAIT * 2,
+            ],
+        )
+        return bool(result)
+
+    async def wait_idempotency_key(
+        self, key: str, attempt: str, timeout: float
+    ) -> bool:
+        """Block until an in-flight idempotency key attempt finishes"""
+        return await self._wait_for_signal(
+            f"idempotency_done:{key_tag(key)}:{attempt}", timeout
+        )
+
     async def set_webhook_status(
         self, webhook_id: str, status: str, ttl: int = 300
     ) -> None:
@@ -230,21 +977,19 @@ class RedisService:
         return status.decode() if status else None
 
 
-# Global Redis service instance
-redis_service: Optional[RedisService] = None
+# Global Redis service instances, one per bulkhead
+redis_services: Dict[Bulkhead, RedisService] = {}
 
 
-async def get_redis() -> RedisService:
-    """Get Redis service instance"""
-    global redis_service
-    if redis_service is None:
-        redis_service = RedisService()
-    return redis_service
+async def get_redis(bulkhead: Bulkhead = Bulkhead.HOT) -> RedisService:
+    """Get Redis service instance of a bulkhead"""
+    if bulkhead not in redis_services:
+        redis_services[bulkhead] = RedisService(bulkhead)
+    return redis_services[bulkhead]
 
 
 async def close_redis() -> None:
-    """Close Redis connection"""
-    global redis_service
-    if redis_service:
-        await redis_service.close()
-        redis_service = None
+    """Close Redis connections"""
+    while redis_services:
+        _, service = redis_services.popitem()
+        await service.close()
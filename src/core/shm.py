@@ -0,0 +1,289 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+# Header: magic, slot count, last sync time (ms), padded to one slot
+_HEADER = struct.Struct("<8sQq40x")
+_MAGIC = b"LLMRLCT1"
+
+# Slot: key hash (0 = free), window length (ms), current window id, count
+# not yet pushed to Redis, cluster-wide count of the window at the last
+# sync, total of the previous window, and a count of an older window still
+# to be pushed when the slot rolled over before a sync
+_SLOT = struct.Struct("<Qqqqqqqq")
+KEY, PERIOD, WINDOW, PENDING, GLOBAL, PREVIOUS, CARRY_WINDOW, CARRY = range(8)
+
+
+def key_hash(key: str) -> int:
+    """Non-zero 64-bit hash of a counter key"""
+    value = int.from_bytes(
+        hashlib.blake2b(key.encode(), digest_size=8).digest(), "little"
+    )
+    return value or 1
+
+
+class SharedCounterTable:
+    """
+    Fixed-size table of sliding-window counters shared by the processes of
+    one host
+
+    The table lives in a memory-mapped file and uses open addressing with
+    linear probing. Each slot is updated under an ``fcntl`` record lock on
+    its own bytes, so updates from different worker processes are atomic
+    without a global lock. Only claiming a slot for a new key takes a
+    table-wide lock, so two processes never claim one key twice. Windows
+    are fixed and the sliding count is estimated from the current and
+    previous window.
+
+    Counts are local until ``drain`` or ``take`` hands them to a sync that
+    pushes them to the cluster-wide store, and ``set_global`` records the
+    cluster totals it gets back.
+    """
+
+    def __init__(self, path: str, slots: int = 4096, max_probe: int = 32) -> None:
+        self.max_probe = max_probe
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = _HEADER.size + slots * _SLOT.size
+        with self._locked(0, _HEADER.size):
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, os.fstat(self._fd).st_size)
+            magic, existing, _ = _HEADER.unpack_from(self._map, 0)
+            if magic == _MAGIC:
+                slots = existing
+            else:
+                _HEADER.pack_into(self._map, 0, _MAGIC, slots, 0)
+        self.slots = slots
+        # Byte past the end of the table, locked while a slot is claimed
+        self._claim_offset = _HEADER.size + slots * _SLOT.size
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    @contextmanager
+    def _locked(self, offset: int, length: int) -> Iterator[None]:
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, offset)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, offset)
+
+    def _offset(self, index: int) -> int:
+        return _HEADER.size + index * _SLOT.size
+
+    def _read(self, index: int) -> List[int]:
+        return list(_SLOT.unpack_from(self._map, self._offset(index)))
+
+    def _write(self, index: int, slot: List[int]) -> None:
+        _SLOT.pack_into(self._map, self._offset(index), *slot)
+
+    @staticmethod
+    def _roll(slot: List[int], window: int) -> None:
+        """Move a slot to ``window``, keeping unsynced counts to push"""
+        if slot[WINDOW] == window:
+            return
+        if slot[PENDING]:
+            slot[CARRY_WINDOW], slot[CARRY] = slot[WINDOW], slot[PENDING]
+        total = slot[GLOBAL] + slot[PENDING]
+        slot[PREVIOUS] = total if window == slot[WINDOW] + 1 else 0
+        slot[WINDOW], slot[PENDING], slot[GLOBAL] = window, 0, 0
+
+    @staticmethod
+    def _stale(slot: Tuple[int, ...], now_ms: int) -> bool:
+        """Whether a slot is two windows old with nothing left to push"""
+        return (
+            now_ms // max(slot[PERIOD], 1) - slot[WINDOW] >= 2
+            and not slot[PENDING]
+            and not slot[CARRY]
+        )
+
+    def _find(self, key: int, now_ms: int) -> Tuple[Optional[int], Optional[int]]:
+        """Index of the key's slot, and of the first free or stale slot, in its chain"""
+        claimable = None
+        start = key % self.slots
+        for probe in range(min(self.max_probe, self.slots)):
+            index = (start + probe) % self.slots
+            current = _SLOT.unpack_from(self._map, self._offset(index))
+            if current[KEY] == key:
+                return index, claimable
+            if claimable is None and (not current[KEY] or self._stale(current, now_ms)):
+                claimable = index
+        return None, claimable
+
+    def _locate(self, key: int, period_ms: int, now_ms: int) -> Optional[int]:
+        """
+        Index of the key's slot, claiming one if the key has none
+
+        The whole chain is searched for the key before a free or stale slot
+        is claimed, so a key never gets a second slot. Returns None if no
+        slot within ``max_probe`` can be claimed.
+        """
+        index, _ = self._find(key, now_ms)
+        if index is not None:
+            return index
+        with self._locked(self._claim_offset, 1):
+            while True:
+                index, claimable = self._find(key, now_ms)
+                if index is not None or claimable is None:
+                    return index
+                with self._locked(self._offset(claimable), _SLOT.size):
+                    slot = self._read(claimable)
+                    if not slot[KEY] or self._stale(slot, now_ms):
+                        window = now_ms // period_ms
+                        self._write(claimable, [key, period_ms, window, 0, 0, 0, 0, 0])
+                        return claimable
+                # Its key was counted again meanwhile; search again
+
+    @contextmanager
+    def _slot(
+        self, key: int, period_ms: int, now_ms: int
+    ) -> Iterator[Optional[List[int]]]:
+        """
+        Locked slot of a key, claimed if needed, rolled to the current window
+
+        Yields None if the key has no slot and none is free within
+        ``max_probe`` slots. Changes to the yielded slot are written back.
+        """
+        window = now_ms // period_ms
+        while True:
+            index = self._locate(key, period_ms, now_ms)
+            if index is None:
+                yield None
+                return
+            offset = self._offset(index)
+            with self._locked(offset, _SLOT.size):
+                slot = self._read(index)
+                if slot[KEY] != key:
+                    continue  # Went stale and was claimed by another key
+                slot[PERIOD] = period_ms
+                self._roll(slot, window)
+                yield slot
+                self._write(index, slot)
+                return
+
+    def estimate(
+        self, key: int, period_ms: int, now_ms: Optional[int] = None
+    ) -> Optional[Tuple[float, int]]:
+        """
+        Estimated count of the sliding window ending now
+
+        Returns:
+            Tuple of (count, ms until the current window ends), or None if
+            the table is full
+        """
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        with self._slot(key, period_ms, now_ms) as slot:
+            if slot is None:
+                return None
+            elapsed = now_ms % period_ms
+            weight = 1 - elapsed / period_ms
+            count = slot[PREVIOUS] * weight + slot[GLOBAL] + slot[PENDING]
+            return count, period_ms - elapsed
+
+    def add(
+        self, key: int, period_ms: int, amount: int = 1, now_ms: Optional[int] = None
+    ) -> bool:
+        """Count ``amount`` hits locally; False if the table is full"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        with self._slot(key, period_ms, now_ms) as slot:
+            if slot is None:
+                return False
+            slot[PENDING] += amount
+            return True
+
+    def set_global(
+        self,
+        key: int,
+        period_ms: int,
+        window: int,
+        value: int,
+        now_ms: Optional[int] = None,
+    ) -> None:
+        """Record the cluster-wide count of the current or previous window"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        with self._slot(key, period_ms, now_ms) as slot:
+            if slot is None:
+                return
+            if slot[WINDOW] == window:
+                slot[GLOBAL] = max(slot[GLOBAL], value)
+            elif slot[WINDOW] == window + 1:
+                slot[PREVIOUS] = max(slot[PREVIOUS], value)
+
+    def try_begin_sync(self, interval_ms: int, now_ms: Optional[int] = None) -> bool:
+        """
+        Claim the next sync of the table for this process
+
+        Returns True at most once per ``interval_ms`` across all processes.
+        """
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, _HEADER.size, 0)
+        except OSError:
+            return False
+        try:
+            magic, slots, last_sync = _HEADER.unpack_from(self._map, 0)
+            if now_ms - last_sync < interval_ms:
+                return False
+            _HEADER.pack_into(self._map, 0, magic, slots, now_ms)
+            return True
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _HEADER.size, 0)
+
+    @staticmethod
+    def _take(slot: List[int]) -> List[Tuple[int, int, int, int]]:
+        taken = []
+        if slot[CARRY]:
+            taken.append((slot[KEY], slot[PERIOD], slot[CARRY_WINDOW], slot[CARRY]))
+        taken.append((slot[KEY], slot[PERIOD], slot[WINDOW], slot[PENDING]))
+        slot[PENDING] = slot[CARRY] = slot[CARRY_WINDOW] = 0
+        return taken
+
+    def take(
+        self, key: int, period_ms: int, now_ms: Optional[int] = None
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Take the counts of one key not yet pushed to the cluster-wide store
+
+        Returns:
+            List of (key, period ms, window id, count)
+        """
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        with self._slot(key, period_ms, now_ms) as slot:
+            return self._take(slot) if slot is not None else []
+
+    def drain(self) -> List[Tuple[int, int, int, int]]:
+        """
+        Take the counts of every key not yet pushed to the cluster-wide store
+
+        Every occupied slot is returned, with a zero count if it has none,
+        so the sync also learns the counts of other hosts.
+
+        Returns:
+            List of (key, period ms, window id, count)
+        """
+        drained = []
+        for index in range(self.slots):
+            offset = self._offset(index)
+            if not _SLOT.unpack_from(self._map, offset)[KEY]:
+                continue
+            with self._locked(offset, _SLOT.size):
+                slot = self._read(index)
+                if slot[KEY]:
+                    drained.extend(self._take(slot))
+                    self._write(index, slot)
+        return drained
+
+    def restore(
+        self, taken: List[Tuple[int, int, int, int]], now_ms: Optional[int] = None
+    ) -> None:
+        """Put back current-window counts a failed sync could not push"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        for key, period_ms, window, count in taken:
+            if count and window == now_ms // period_ms:
+                self.add(key, period_ms, count, now_ms)
@@ -0,0 +1,195 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+FINGERPRINT_BITS = 64
+_FINGERPRINT_MASK = (1 << FINGERPRINT_BITS) - 1
+
+# Volatile fragments that should not make two prompts look different
+_VOLATILE_PATTERNS = [
+    (
+        re.compile(
+            r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"
+        ),
+        " <uuid> ",
+    ),
+    (
+        re.compile(
+            r"\b\d{4}-\d{2}-\d{2}(?:[t ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:z|[+-]\d{2}:?\d{2})?)?\b"
+        ),
+        " <timestamp> ",
+    ),
+    (re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\b"), " <time> "),
+    (re.compile(r"\b[0-9a-f]{16,}\b"), " <hex> "),
+]
+_TOKEN_PATTERN = re.compile(r"<\w+>|\w+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for near-duplicate detection
+
+    Lowercases, replaces UUIDs, timestamps and long hex IDs with placeholders
+    and collapses whitespace. Other numbers are kept: they usually change
+    the answer.
+    """
+    normalized = text.lower()
+    for pattern, replacement in _VOLATILE_PATTERNS:
+        normalized = pattern.sub(replacement, normalized)
+    return " ".join(normalized.split())
+
+
+def _hash_feature(feature: str) -> int:
+    """Stable 64-bit hash of a feature"""
+    digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def simhash(text: str, shingle_size: int = 2) -> int:
+    """
+    Compute a 64-bit SimHash fingerprint of already normalized text
+
+    Features are word shingles of ``shingle_size`` words, so word order
+    matters locally but small edits only flip a few bits.
+    """
+    words = _TOKEN_PATTERN.findall(text)
+    if not words:
+        return 0
+
+    if len(words) < shingle_size:
+        features = [" ".join(words)]
+    else:
+        features = [
+            " ".join(words[i : i + shingle_size])
+            for i in range(len(words) - shingle_size + 1)
+        ]
+
+    weights: Dict[int, int] = {}
+    for feature in features:
+        feature_hash = _hash_feature(feature)
+        weights[feature_hash] = weights.get(feature_hash, 0) + 1
+
+    vector = [0] * FINGERPRINT_BITS
+    for feature_hash, weight in weights.items():
+        for bit in range(FINGERPRINT_BITS):
+            if feature_hash >> bit & 1:
+                vector[bit] += weight
+            else:
+                vector[bit] -= weight
+
+    fingerprint = 0
+    for bit, value in enumerate(vector):
+        if value > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def similarity(a: int, b: int) -> float:
+    """Similarity of two fingerprints in [0, 1] based on Hamming distance"""
+    distance = ((a ^ b) & _FINGERPRINT_MASK).bit_count()
+    return 1.0 - distance / FINGERPRINT_BITS
+
+
+@dataclass
+class _IndexEntry:
+    fingerprint: int
+    value: Any
+    expires_at: Optional[float]
+
+
+class SimHashIndex:
+    """
+    Bounded locality-sensitive index over SimHash fingerprints
+
+    Fingerprints are split into ``bands`` equal bit ranges and each band is
+    used as an exact-match bucket key. Any two fingerprints within
+    ``bands - 1`` bits of each other share at least one band, so they are
+    always found as candidates. A lookup costs ``bands`` dictionary probes
+    plus a popcount per candidate. Entries are evicted in LRU order once
+    ``max_entries`` is reached.
+    """
+
+    def __init__(
+        self, max_entries: int, bands: int = 8, ttl: Optional[int] = None
+    ) -> None:
+        if FINGERPRINT_BITS % bands:
+            raise ValueError(f"bands must divide {FINGERPRINT_BITS}")
+        self.max_entries = max_entries
+        self.bands = bands
+        self.ttl = ttl
+        self._band_bits = FINGERPRINT_BITS // bands
+        self._band_mask = (1 << self._band_bits) - 1
+        self._entries: "OrderedDict[int, _IndexEntry]" = OrderedDict()
+        self._buckets: List[Dict[int, Set[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        return [
+            (fingerprint >> (band * self._band_bits)) & self._band_mask
+            for band in range(self.bands)
+        ]
+
+    def _remove(self, fingerprint: int) -> None:
+        self._entries.pop(fingerprint, None)
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            bucket = self._buckets[band].get(key)
+            if bucket is None:
+                continue
+            bucket.discard(fingerprint)
+            if not bucket:
+                del self._buckets[band][key]
+
+    def add(self, fingerprint: int, value: Any) -> None:
+        """Add or replace the value stored for a fingerprint"""
+        if fingerprint in self._entries:
+            self._remove(fingerprint)
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._entries[fingerprint] = _IndexEntry(fingerprint, value, expires_at)
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            self._buckets[band].setdefault(key, set()).add(fingerprint)
+
+        while len(self._entries) > self.max_entries:
+            self.evict_oldest()
+
+    def evict_oldest(self) -> None:
+        """Evict the least recently used entry"""
+        if self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def query(self, fingerprint: int) -> Optional[Tuple[float, Any]]:
+        """
+        Find the most similar stored entry
+
+        Returns:
+            Tuple of (similarity, value) for the best candidate, or None if
+            no entry shares a band with the fingerprint
+        """
+        candidates: Set[int] = set()
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            bucket = self._buckets[band].get(key)
+            if bucket:
+                candidates.update(bucket)
+
+        now = time.monotonic()
+        best: Optional[_IndexEntry] = None
+        best_score = -1.0
+        for candidate in candidates:
+            entry = self._entries[candidate]
+            if entry.expires_at is not None and entry.expires_at <= now:
+                self._remove(candidate)
+                continue
+            score = similarity(fingerprint, candidate)
+            if score > best_score:
+                best, best_score = entry, score
+
+        if best is None:
+            return None
+
+        self._entries.move_to_end(best.fingerprint)
+        return best_score, best.value
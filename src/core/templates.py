@@ -0,0 +1,54 @@
+import re
+from typing import Any, Dict, List, Mapping, Set
+
+from src.core.exceptions import ValidationError
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+
+
+def template_variables(messages: List[Dict[str, Any]]) -> Set[str]:
+    """Get the ``{{ name }}`` placeholders used by template messages"""
+    return {
+        name
+        for message in messages
+        for name in PLACEHOLDER_PATTERN.findall(message.get("content", ""))
+    }
+
+
+def static_prefix_length(messages: List[Dict[str, Any]]) -> int:
+    """Number of leading template messages that contain no placeholders"""
+    for i, message in enumerate(messages):
+        if PLACEHOLDER_PATTERN.search(message.get("content", "")):
+            return i
+    return len(messages)
+
+
+def render_template(
+    messages: List[Dict[str, Any]], variables: Mapping[str, Any]
+) -> List[Dict[str, str]]:
+    """
+    Render template messages with variable values
+
+    Placeholders use ``{{ name }}``, so literal braces such as JSON examples
+    in a system prompt need no escaping.
+
+    Raises:
+        ValidationError: If a placeholder has no value
+    """
+    missing = template_variables(messages) - set(variables)
+    if missing:
+        raise ValidationError(
+            message="Missing template variables",
+            errors={"template_variables": sorted(missing)},
+        )
+
+    def substitute(match: "re.Match[str]") -> str:
+        return str(variables[match.group(1)])
+
+    return [
+        {
+            "role": message["role"],
+            "content": PLACEHOLDER_PATTERN.sub(substitute, message["content"]),
+        }
+        for message in messages
+    ]
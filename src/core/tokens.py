@@ -0,0 +1,151 @@
+import math
+from collections import deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+import tiktoken
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Tokens added by the chat format to prime the assistant reply
+REPLY_PRIMING_TOKENS = 3
+
+
+@lru_cache(maxsize=128)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """
+    Get the tiktoken encoding for a model, cached per model name
+
+    Falls back to cl100k_base for models tiktoken does not know about.
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def get_message_overhead(model: str) -> Tuple[int, int]:
+    """
+    Get the per-message and per-name token overhead of the chat format
+
+    Returns:
+        Tuple of (tokens_per_message, tokens_per_name)
+    """
+    if model.startswith("gpt-3.5-turbo-0301"):
+        # Every message follows <|start|>{role/name}\n{content}<|end|>\n and
+        # the role is omitted when a name is present
+        return 4, -1
+    return 3, 1
+
+
+def count_text_tokens(
+    text: str, model: str, encoding: Optional[tiktoken.Encoding] = None
+) -> int:
+    """Count the tokens of a plain text string"""
+    encoding = encoding or get_encoding(model)
+    return len(encoding.encode_ordinary(text))
+
+
+def count_message_content_tokens(
+    message: Dict[str, Any], model: str, encoding: Optional[tiktoken.Encoding] = None
+) -> int:
+    """Count the tokens of a message's string fields, without format overhead"""
+    encoding = encoding or get_encoding(model)
+    return sum(
+        len(encoding.encode_ordinary(value))
+        for value in message.values()
+        if isinstance(value, str)
+    )
+
+
+def get_message_format_tokens(message: Dict[str, Any], model: str) -> int:
+    """Get the chat format overhead of one message"""
+    tokens_per_message, tokens_per_name = get_message_overhead(model)
+    if isinstance(message.get("name"), str):
+        return tokens_per_message + tokens_per_name
+    return tokens_per_message
+
+
+def count_single_message_tokens(
+    message: Dict[str, Any], model: str, encoding: Optional[tiktoken.Encoding] = None
+) -> int:
+    """Count the tokens of one chat message, excluding reply priming"""
+    return get_message_format_tokens(message, model) + count_message_content_tokens(
+        message, model, encoding
+    )
+
+
+def count_message_tokens(
+    messages: Iterable[Dict[str, Any]],
+    model: str,
+    encoding: Optional[tiktoken.Encoding] = None,
+) -> int:
+    """
+    Count the prompt tokens of a list of chat messages in a single pass
+
+    Applies OpenAI's chat format overhead: a fixed number of tokens per
+    message, an adjustment per ``name`` field and the reply priming tokens.
+    Special-token text inside messages is counted as ordinary text.
+    """
+    encoding = encoding or get_encoding(model)
+    num_tokens = REPLY_PRIMING_TOKENS
+    for message in messages:
+        num_tokens += count_single_message_tokens(message, model, encoding)
+    return num_tokens
+
+
+def message_bytes(messages: Iterable[Dict[str, Any]]) -> int:
+    """UTF-8 byte length of the string fields of a list of messages"""
+    return sum(
+        len(value.encode())
+        for message in messages
+        for value in message.values()
+        if isinstance(value, str)
+    )
+
+
+class TokenEstimator:
+    """
+    Fast upper-bound prompt token estimate from UTF-8 byte length
+
+    Every BPE token covers at least one byte, so one token per byte is a
+    hard upper bound. Once enough upstream usage has been observed for a
+    model, the estimate uses the highest tokens-per-byte ratio seen in the
+    recent window plus a safety margin, capped at the hard bound.
+    """
+
+    def __init__(
+        self, margin: float = 0.1, window: int = 200, min_samples: int = 20
+    ) -> None:
+        self.margin = margin
+        self.window = window
+        self.min_samples = min_samples
+        self._ratios: Dict[str, Deque[float]] = {}
+
+    def ratio(self, model: str) -> float:
+        """Current tokens-per-byte upper bound for a model"""
+        ratios = self._ratios.get(model)
+        if not ratios or len(ratios) < self.min_samples:
+            return 1.0
+        return min(1.0, max(ratios) * (1 + self.margin))
+
+    def estimate(self, messages: List[Dict[str, Any]], model: str) -> int:
+        """Estimate an upper bound of the prompt tokens of a list of messages"""
+        format_tokens = REPLY_PRIMING_TOKENS + sum(
+            get_message_format_tokens(message, model) for message in messages
+        )
+        return format_tokens + math.ceil(message_bytes(messages) * self.ratio(model))
+
+    def observe(
+        self, messages: List[Dict[str, Any]], model: str, prompt_tokens: int
+    ) -> None:
+        """Calibrate the model's ratio from the actual prompt token usage"""
+        byte_length = message_bytes(messages)
+        if byte_length == 0:
+            return
+        format_tokens = REPLY_PRIMING_TOKENS + sum(
+            get_message_format_tokens(message, model) for message in messages
+        )
+        content_tokens = max(prompt_tokens - format_tokens, 0)
+        ratios = self._ratios.setdefault(model, deque(maxlen=self.window))
+        ratios.append(content_tokens / byte_length)
@@ -1,22 +1,18 @@
 import hashlib
 import json
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 
-import tiktoken
+from src.core.context import ContextPolicy
+from src.core.ratelimit import validate_rate_limit_config
+from src.core.tokens import count_text_tokens, get_encoding
 
 
 def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
     """
     Count the number of tokens in a text string for a specific model
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-        return len(encoding.encode(text))
-    except KeyError:
-        # Fallback to cl100k_base encoding if model-specific encoding not found
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(text))
+    return count_text_tokens(text, model)
 
 
 def generate_hash(data: Union[str, bytes, Dict[str, Any]]) -> str:
@@ -94,6 +90,7 @@ def calculate_token_cost(
         "gpt-4-32k": {"prompt": 0.06, "completion": 0.12},
         "gpt-3.5-turbo": {"prompt": 0.0015, "completion": 0.002},
         "gpt-3.5-turbo-16k": {"prompt": 0.003, "completion": 0.004},
+        "text-embedding-ada-002": {"prompt": 0.0001, "completion": 0.0},
     }
 
     if model not in model_costs:
@@ -118,31 +115,67 @@ def format_webhook_payload(
     return {"event_type": event_type, "timestamp": timestamp.isoformat(), "data": data}
 
 
+def _iter_segments(
+    text: Union[str, Iterable[str]], segment_chars: int
+) -> Iterator[str]:
+    """
+    Yield bounded text segments that end on whitespace where possible
+
+    Splitting before whitespace keeps words whole, so encoding segment by
+    segment matches encoding the whole text except at rare boundaries.
+    """
+    pieces = [text] if isinstance(text, str) else text
+    pending = ""
+    start = 0
+    for piece in pieces:
+        # Drop consumed text only when new input arrives, not per segment
+        pending = pending[start:] + piece
+        start = 0
+        while len(pending) - start >= segment_chars:
+            end = start + segment_chars
+            cut = max(pending.rfind(" ", start, end), pending.rfind("\n", start, end))
+            if cut <= start:
+                cut = end
+            yield pending[start:cut]
+            start = cut
+    if start < len(pending):
+        yield pending[start:]
+
+
 def chunk_text(
-    text: str, max_tokens: int, model: str = "gpt-3.5-turbo", overlap: int = 100
-) -> List[str]:
+    text: Union[str, Iterable[str]],
+    max_tokens: int,
+    model: str = "gpt-3.5-turbo",
+    overlap: int = 100,
+    segment_chars: int = 65_536,
+) -> Iterator[str]:
     """
     Split text into chunks based on token limit with optional overlap
-    """
-    tokens = count_tokens(text, model)
-    if tokens <= max_tokens:
-        return [text]
 
-    encoding = tiktoken.encoding_for_model(model)
-    tokens_list = encoding.encode(text)
+    Lazily yields chunks. The text may be a string or an iterable of string
+    pieces (e.g. a file read in blocks); it is encoded once, segment by
+    segment, so memory stays bounded by ``max_tokens`` plus one segment.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be positive")
+    if not 0 <= overlap < max_tokens:
+        raise ValueError("overlap must be between 0 and max_tokens - 1")
 
-    chunks = []
-    start_idx = 0
+    encoding = get_encoding(model)
+    buffer: List[int] = []
 
-    while start_idx < len(tokens_list):
-        chunk_tokens = tokens_list[start_idx : start_idx + max_tokens]
-        chunk = encoding.decode(chunk_tokens)
-        chunks.append(chunk)
+    for segment in _iter_segments(text, segment_chars):
+        buffer.extend(encoding.encode_ordinary(segment))
 
-        # Move start index, accounting for overlap
-        start_idx += max_tokens - overlap
+        # Keep at least one chunk's worth buffered until the input ends, so
+        # the final chunk is never just the overlap of the previous one
+        while len(buffer) > max_tokens:
+            yield encoding.decode(buffer[:max_tokens])
+            # Move start index, accounting for overlap
+            del buffer[: max_tokens - overlap]
 
-    return chunks
+    if buffer:
+        yield encoding.decode(buffer)
 
 
 def validate_tenant_config(config: Dict[str, Any]) -> List[str]:
@@ -160,11 +193,13 @@ def validate_tenant_config(config: Dict[str, Any]) -> List[str]:
         errors.append("quota_limit must be an integer")
 
     if "rate_limit" in config:
-        rate_limit = config["rate_limit"]
-        if not isinstance(rate_limit, dict):
-            errors.append("rate_limit must be an object")
-        elif "requests" not in rate_limit or "period" not in rate_limit:
-            errors.append("rate_limit must contain 'requests' and 'period' fields")
+        errors.extend(validate_rate_limit_config(config["rate_limit"]))
+
+    policies = [policy.value for policy in ContextPolicy]
+    if "context_policy" in config and config["context_policy"] not in policies:
+        errors.append(
+            "context_policy must be one of " + ", ".join(map(repr, policies))
+        )
 
     return errors
 
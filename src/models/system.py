@@ -1,8 +1,9 @@
+import enum
 from datetime import datetime
 from typing import Optional
 
 from sqlalchemy import (
-    JSON, Boolean, DateTime, ForeignKey, ForeignKeyConstraint,
+    JSON, BigInteger, Boolean, DateTime, ForeignKey, ForeignKeyConstraint,
     Integer, String
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -36,6 +37,7 @@ class Tenant(Base, TimestampMixin):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     quota_limit: Mapped[int] = mapped_column(Integer, nullable=False)
     current_quota_usage: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    quota_window: Mapped[Optional[str]] = mapped_column(String(16))  # QuotaWindow
     config: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
 
     # Relationships
@@ -61,6 +63,7 @@ class APIKey(Base, TimestampMixin):
     permissions: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
     quota_limit: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     current_quota_usage: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    quota_window: Mapped[Optional[str]] = mapped_column(String(16))  # QuotaWindow
 
     # Relationships
     tenant: Mapped[Tenant] = relationship(back_populates="api_keys")
@@ -133,3 +136,45 @@ class BillingEvent(Base, TimestampMixin):
     currency: Mapped[str] = mapped_column(String(3), nullable=False, default="USD")
     description: Mapped[str] = mapped_column(String(1024), nullable=False)
     billing_data: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+
+
+class BatchStatus(str, enum.Enum):
+    """Batch job status enumeration"""
+
+    QUEUED = "queued"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLING = "cancelling"
+    CANCELLED = "cancelled"
+
+
+class BatchJob(Base, TimestampMixin):
+    """Offline batch of chat completion requests read from a JSONL file"""
+
+    __tablename__ = "batch_jobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    tenant_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
+    )
+    api_key_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    user_id: Mapped[Optional[str]] = mapped_column(String(36))
+    status: Mapped[str] = mapped_column(
+        String(20), default=BatchStatus.QUEUED.value, nullable=False, index=True
+    )
+    input_file_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    output_file_id: Mapped[Optional[str]] = mapped_column(String(64))
+    total_items: Mapped[int] = mapped_column(Integer, nullable=False)
+    completed_items: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed_items: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Checkpoint: every input line before checkpoint_line has its result in
+    # the output file up to output_offset; input_offset is where it resumes
+    checkpoint_line: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    input_offset: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    output_offset: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    locked_by: Mapped[Optional[str]] = mapped_column(String(255))
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    error: Mapped[Optional[str]] = mapped_column(String(1024))
+    batch_data: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
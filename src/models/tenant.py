@@ -2,7 +2,18 @@ import enum
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import JSON, Boolean, DateTime, Enum, Float, ForeignKey, Integer, String
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -43,6 +54,7 @@ class User(Base, TimestampMixin):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     quota_limit: Mapped[Optional[int]] = mapped_column(Integer)
     current_quota_usage: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    quota_window: Mapped[Optional[str]] = mapped_column(String(16))  # QuotaWindow
     settings: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
     last_login: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
 
@@ -121,7 +133,7 @@ class ChatMessage(Base):
         String(36), ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False
     )
     role: Mapped[str] = mapped_column(String(50), nullable=False)
-    content: Mapped[str] = mapped_column(String(4096), nullable=False)
+    content: Mapped[str] = mapped_column(Text, nullable=False)
     tokens: Mapped[int] = mapped_column(Integer, nullable=False)
     timestamp: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
@@ -132,6 +144,42 @@ class ChatMessage(Base):
     session: Mapped[ChatSession] = relationship(back_populates="messages")
 
 
+class PromptTemplate(Base, TimestampMixin):
+    """Stored prompt template rendered server-side for chat completions"""
+
+    __tablename__ = "prompt_templates"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    name: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    model: Mapped[str] = mapped_column(String(255), nullable=False)
+    messages: Mapped[list] = mapped_column(JSON, nullable=False)
+    variables: Mapped[list] = mapped_column(JSON, nullable=False, default=list)
+    # Leading messages without placeholders and their token counts per
+    # encoding, computed when the template is saved
+    static_prefix_length: Mapped[int] = mapped_column(Integer, nullable=False)
+    static_prefix_tokens: Mapped[dict] = mapped_column(
+        JSON, nullable=False, default=dict
+    )
+    created_by: Mapped[Optional[str]] = mapped_column(
+        String(36), ForeignKey("users.id", ondelete="SET NULL")
+    )
+
+
+class Attachment(Base, TimestampMixin):
+    """Content-addressed message content, deduplicated by SHA-256"""
+
+    __tablename__ = "attachments"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)  # SHA-256 hex
+    size: Mapped[int] = mapped_column(Integer, nullable=False)  # uncompressed bytes
+    content: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # zlib
+    # Content token counts per encoding, computed at upload
+    token_counts: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    created_by: Mapped[Optional[str]] = mapped_column(
+        String(36), ForeignKey("users.id", ondelete="SET NULL")
+    )
+
+
 class CacheEntry(Base):
     """Cache for response reuse"""
 
@@ -1,5 +1,8 @@
-from typing import Dict, List, Optional
-from pydantic import BaseModel, EmailStr
+from typing import Dict, List, Optional, Union
+from pydantic import BaseModel, EmailStr, Field
+
+from src.core.config import get_settings
+from src.core.quota_window import QuotaWindow
 
 # Auth schemas
 class Token(BaseModel):
@@ -71,9 +74,16 @@ class ChatCompletionUsage(BaseModel):
     completion_tokens: int
     total_tokens: int
 
+class ChatRequestMessage(BaseModel):
+    role: str
+    content: Optional[str] = None
+    content_ref: Optional[str] = None  # SHA-256 of an uploaded attachment
+
 class ChatCompletionRequest(BaseModel):
     model: str
-    messages: List[ChatMessage]
+    messages: List[ChatRequestMessage] = []
+    template_id: Optional[str] = None
+    template_variables: Dict[str, str] = {}
     temperature: Optional[float] = 0.7
     max_tokens: Optional[int] = None
 
@@ -84,16 +94,148 @@ class ChatCompletionResponse(BaseModel):
     choices: List[ChatCompletionChoice]
     usage: ChatCompletionUsage
 
+# Async generation job schemas
+class GenerationJobResponse(BaseModel):
+    id: str
+    object: str = "chat.completion.job"
+    model: str
+    status: str
+    created: int
+    result: Optional[ChatCompletionResponse] = None
+    error: Optional[Dict[str, str]] = None
+
+# Embedding schemas
+class EmbeddingRequest(BaseModel):
+    model: str
+    input: Union[str, List[str]]
+
+class EmbeddingData(BaseModel):
+    object: str = "embedding"
+    index: int
+    embedding: List[float]
+
+class EmbeddingUsage(BaseModel):
+    prompt_tokens: int
+    total_tokens: int
+
+class EmbeddingResponse(BaseModel):
+    object: str = "list"
+    data: List[EmbeddingData]
+    model: str
+    usage: EmbeddingUsage
+
+# Chat session schemas
+class SessionCreate(BaseModel):
+    model: str
+    title: str = "New chat"
+    system_prompt: Optional[str] = None
+
+class SessionResponse(BaseModel):
+    id: str
+    title: str
+    model: str
+    total_tokens: int
+    total_messages: int
+
+class SessionMessageCreate(BaseModel):
+    content: str
+    temperature: Optional[float] = 0.7
+    max_tokens: Optional[int] = None
+
+class SessionMessageResponse(BaseModel):
+    role: str
+    content: str
+    tokens: int
+
+class SessionReply(BaseModel):
+    session: SessionResponse
+    message: ChatMessage
+    usage: ChatCompletionUsage
+
+# Prompt template schemas
+class PromptTemplateCreate(BaseModel):
+    name: str
+    model: str
+    messages: List[ChatMessage]
+
+class PromptTemplateResponse(BaseModel):
+    id: str
+    name: str
+    model: str
+    messages: List[ChatMessage]
+    variables: List[str]
+    static_prefix_length: int
+    static_prefix_tokens: int
+
+# Batch schemas
+class BatchFileResponse(BaseModel):
+    id: str
+    object: str = "file"
+    bytes: int
+    purpose: str = "batch"
+    lines: int
+
+class BatchCreate(BaseModel):
+    input_file_id: str = Field(..., pattern=r"^file-[0-9a-f]{32}$")
+    endpoint: str = "/v1/chat/completions"
+    completion_window: str = "24h"
+    metadata: Dict[str, str] = {}
+
+class BatchRequestCounts(BaseModel):
+    total: int
+    completed: int
+    failed: int
+
+class BatchResponse(BaseModel):
+    id: str
+    object: str = "batch"
+    endpoint: str
+    status: str
+    input_file_id: str
+    output_file_id: Optional[str]
+    created_at: int
+    completed_at: Optional[int]
+    request_counts: BatchRequestCounts
+    error: Optional[str] = None
+    metadata: Dict[str, str] = {}
+
+# Attachment schemas
+class AttachmentResponse(BaseModel):
+    id: str
+    size: int
+    model: str
+    tokens: int
+
+# Tokenization schemas
+class TokenizeRequest(BaseModel):
+    model: str
+    inputs: List[List[ChatMessage]] = Field(
+        ..., min_length=1, max_length=get_settings().TOKENIZE_MAX_INPUTS
+    )
+
+class TokenizeResult(BaseModel):
+    index: int
+    prompt_tokens: int
+    fits_quota: bool
+
+class TokenizeResponse(BaseModel):
+    model: str
+    data: List[TokenizeResult]
+    total_tokens: int
+    remaining_quota: int
+
 # Tenant schemas
 class TenantCreate(BaseModel):
     id: str
     name: str
     quota_limit: int
+    quota_window: Optional[QuotaWindow] = None
     config: Dict = {}
 
 class TenantUpdate(BaseModel):
     name: Optional[str] = None
     quota_limit: Optional[int] = None
+    quota_window: Optional[QuotaWindow] = None
     is_active: Optional[bool] = None
     config: Optional[Dict] = None
 
@@ -102,6 +244,7 @@ class TenantResponse(BaseModel):
     name: str
     db_name: str
     quota_limit: int
+    quota_window: Optional[QuotaWindow] = None
     current_quota_usage: int
     is_active: bool
     config: Dict
@@ -111,6 +254,7 @@ class APIKeyCreate(BaseModel):
     name: str
     permissions: Dict
     quota_limit: Optional[int] = None
+    quota_window: Optional[QuotaWindow] = None
 
 class APIKeyResponse(BaseModel):
     id: str
@@ -118,6 +262,7 @@ class APIKeyResponse(BaseModel):
     key: str
     permissions: Dict
     quota_limit: Optional[int] = None
+    quota_window: Optional[QuotaWindow] = None
     current_quota_usage: int
 
 # User schemas
@@ -127,6 +272,7 @@ class UserCreate(BaseModel):
     name: str
     role: Optional[str] = None  # Added role field
     quota_limit: Optional[int] = None
+    quota_window: Optional[QuotaWindow] = None
     settings: Optional[Dict] = None
 
 class UserUpdate(BaseModel):
@@ -135,6 +281,7 @@ class UserUpdate(BaseModel):
     password: Optional[str] = None
     is_active: Optional[bool] = None
     quota_limit: Optional[int] = None
+    quota_window: Optional[QuotaWindow] = None
     role: Optional[str] = None  # Added role field
     settings: Optional[Dict] = None
 
@@ -145,6 +292,7 @@ class UserResponse(BaseModel):
     is_active: bool
     role: str
     quota_limit: Optional[int] = None
+    quota_window: Optional[QuotaWindow] = None
     current_quota_usage: int
     settings: Dict
     last_login: Optional[str] = None  # Added last_login field
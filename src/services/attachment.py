@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import zlib
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from src.core.config import get_settings
+from src.core.database import get_tenant_db_session
+from src.core.exceptions import ValidationError
+from src.core.logging import get_logger
+from src.core.lru import ByteLRUCache
+from src.core.tokens import (
+    count_message_content_tokens,
+    count_text_tokens,
+    get_encoding,
+    get_message_format_tokens,
+)
+from src.models.tenant import Attachment
+from src.services.tokenizer import get_tokenizer_service
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+class AttachmentService:
+    """
+    Service for content-addressed message attachments
+
+    Content is stored once per tenant under its SHA-256, zlib-compressed,
+    with its token count computed at upload. Chat messages reference it with
+    ``content_ref`` instead of inlining it. Recently used content is kept
+    decompressed in a per-worker LRU bounded by ``ATTACHMENT_CACHE_MAX_BYTES``.
+    """
+
+    def __init__(self) -> None:
+        self._cache = ByteLRUCache(settings.ATTACHMENT_CACHE_MAX_BYTES)
+
+    async def _count_tokens(self, text: str, model: str) -> int:
+        tokenizer = await get_tokenizer_service()
+        return await tokenizer.run_offloaded(count_text_tokens, text, model)
+
+    async def _save_token_count(
+        self, tenant_id: str, attachment_id: str, encoding_name: str, tokens: int
+    ) -> None:
+        async with get_tenant_db_session(tenant_id) as db:
+            attachment = await db.get(Attachment, attachment_id)
+            if attachment:
+                attachment.token_counts = {
+                    **attachment.token_counts,
+                    encoding_name: tokens,
+                }
+                await db.flush()
+
+    async def store(
+        self,
+        tenant_id: str,
+        text: str,
+        model: str,
+        created_by: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Store content, deduplicated by hash
+
+        Returns:
+            Dict with id, size, tokens for the model's encoding and whether
+            the content was newly created
+        """
+        data = text.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        encoding_name = get_encoding(model).name
+
+        # Only the stored counts are needed, not the compressed content
+        async with get_tenant_db_session(tenant_id) as db:
+            existing = (
+                await db.execute(
+                    select(Attachment.id, Attachment.token_counts).where(
+                        Attachment.id == digest
+                    )
+                )
+            ).first()
+        if existing:
+            tokens = existing.token_counts.get(encoding_name)
+            if tokens is None:
+                tokens = await self._count_tokens(text, model)
+                await self._save_token_count(tenant_id, digest, encoding_name, tokens)
+            return {"id": digest, "size": len(data), "tokens": tokens, "created": False}
+
+        tokens = await self._count_tokens(text, model)
+        loop = asyncio.get_running_loop()
+        compressed = await loop.run_in_executor(None, zlib.compress, data)
+
+        async with get_tenant_db_session(tenant_id) as db:
+            # Another request may upload the same content concurrently
+            result = await db.execute(
+                insert(Attachment)
+                .values(
+                    id=digest,
+                    size=len(data),
+                    content=compressed,
+                    token_counts={encoding_name: tokens},
+                    created_by=created_by,
+                )
+                .on_conflict_do_nothing(index_elements=[Attachment.id])
+            )
+            created = result.rowcount == 1
+
+        self._cache.set(
+            (tenant_id, digest),
+            {
+                "content": text,
+                "size": len(data),
+                "token_counts": {encoding_name: tokens},
+            },
+            len(data),
+        )
+        logger.info(
+            "attachment_stored",
+            tenant_id=tenant_id,
+            attachment_id=digest,
+            size=len(data),
+            compressed_size=len(compressed),
+            tokens=tokens,
+            created=created,
+        )
+        return {"id": digest, "size": len(data), "tokens": tokens, "created": created}
+
+    async def get(
+        self, tenant_id: str, attachment_id: str, model: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get attachment content, size and token count for a model
+
+        Counts for an encoding not seen at upload are computed once and
+        stored with the attachment.
+        """
+        key = (tenant_id, attachment_id)
+        encoding_name = get_encoding(model).name
+        entry = self._cache.get(key)
+
+        if entry is None:
+            async with get_tenant_db_session(tenant_id) as db:
+                attachment = await db.get(Attachment, attachment_id)
+                if not attachment:
+                    return None
+                compressed, size = attachment.content, attachment.size
+                token_counts = dict(attachment.token_counts)
+
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(None, zlib.decompress, compressed)
+            entry = {
+                "content": data.decode(),
+                "size": size,
+                "token_counts": token_counts,
+            }
+            self._cache.set(key, entry, size)
+
+        if encoding_name not in entry["token_counts"]:
+            tokens = await self._count_tokens(entry["content"], model)
+            entry["token_counts"][encoding_name] = tokens
+            await self._save_token_count(
+                tenant_id, attachment_id, encoding_name, tokens
+            )
+
+        return {
+            "content": entry["content"],
+            "size": entry["size"],
+            "tokens": entry["token_counts"][encoding_name],
+        }
+
+    async def resolve(
+        self, tenant_id: str, messages: List[Dict[str, Any]], model: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Replace ``content_ref`` in messages with the referenced content
+
+        The precomputed counts seed the tokenizer cache, so attached content
+        is not re-encoded by context fitting or quota checks.
+
+        Raises:
+            ValidationError: If a message has neither content nor
+                ``content_ref``, or the referenced attachment does not exist
+        """
+        resolved: List[Dict[str, Any]] = []
+        primed: List[Dict[str, Any]] = []
+        primed_tokens: List[int] = []
+
+        for message in messages:
+            content_ref = message.get("content_ref")
+            if content_ref is None:
+                if not isinstance(message.get("content"), str):
+                    raise ValidationError(
+                        message="Message content or content_ref is required"
+                    )
+                resolved.append(message)
+                continue
+
+            attachment = await self.get(tenant_id, content_ref, model)
+            if not attachment:
+                raise ValidationError(
+                    message="Attachment not found",
+                    errors={"content_ref": content_ref},
+                )
+            fields = {
+                key: value
+                for key, value in message.items()
+                if key not in ("content", "content_ref")
+            }
+            message = {**fields, "content": attachment["content"]}
+            resolved.append(message)
+            primed.append(message)
+            primed_tokens.append(
+                get_message_format_tokens(message, model)
+                + count_message_content_tokens(fields, model)
+                + attachment["tokens"]
+            )
+
+        if primed:
+            tokenizer = await get_tokenizer_service()
+            tokenizer.prime(primed, model, primed_tokens)
+        return resolved
+
+
+# Global attachment service instance
+attachment_service: Optional[AttachmentService] = None
+
+
+async def get_attachment_service() -> AttachmentService:
+    """Get attachment service instance"""
+    global attachment_service
+    if attachment_service is None:
+        attachment_service = AttachmentService()
+    return attachment_service
@@ -0,0 +1,689 @@
+import asyncio
+import json
+import os
+import re
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import timedelta
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    BinaryIO,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import openai.error
+from prometheus_client import Counter, Gauge
+from sqlalchemy import or_, select, update
+
+from src.core.concurrency import AdaptiveConcurrencyLimiter
+from src.core.config import get_settings
+from src.core.database import get_tenant_db_session
+from src.core.exceptions import QuotaExceededError, ValidationError
+from src.core.logging import get_logger
+from src.core.utils import utc_now
+from src.models.system import APIKey, BatchJob, BatchStatus
+from src.services.model import get_model_service
+from src.services.quota import get_quota_service
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# Ids of stored batch files; anything else must never reach a path
+FILE_ID_PATTERN = re.compile(r"^file-[0-9a-f]{32}$")
+
+# Upstream errors that mean "slow down" rather than "this request is bad"
+THROTTLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    openai.error.Timeout,
+    openai.error.TryAgain,
+)
+
+batch_items_total = Counter(
+    "batch_items_total",
+    "Batch items processed",
+    ["result"],
+)
+
+batch_concurrency_limit = Gauge(
+    "batch_concurrency_limit",
+    "Current adaptive limit of in-flight batch upstream calls",
+)
+
+
+def _file_path(tenant_id: str, file_id: str) -> Path:
+    if not FILE_ID_PATTERN.match(file_id):
+        raise ValidationError(message="Invalid file id", errors={"file_id": file_id})
+    return Path(settings.BATCH_STORAGE_DIR) / tenant_id / f"{file_id}.jsonl"
+
+
+def _validate_line(line: bytes, line_number: int) -> None:
+    """Check that a JSONL line is a chat completion batch request"""
+    try:
+        request = json.loads(line)
+        if request.get("url", BATCH_ENDPOINT) != BATCH_ENDPOINT:
+            raise ValueError(f"url must be {BATCH_ENDPOINT}")
+        body = request["body"]
+        if not isinstance(body.get("messages"), list) or not body["messages"]:
+            raise ValueError("body.messages must be a non-empty list")
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValidationError(
+            message="Invalid batch input file",
+            errors={"line": line_number, "error": str(e)},
+        )
+
+
+class BatchService:
+    """
+    Service for batch input files and jobs
+
+    Input and output files are JSONL files under ``BATCH_STORAGE_DIR``, which
+    must be shared by all gateway replicas. Jobs are rows in the system
+    database, claimed and processed by ``BatchWorkerPool``.
+    """
+
+    async def store_file(
+        self, tenant_id: str, chunks: AsyncIterator[bytes]
+    ) -> Dict[str, Any]:
+        """
+        Store an uploaded JSONL input file, validating every line
+
+        Returns:
+            Dict with the file id, size in bytes and number of requests
+        """
+        file_id = f"file-{uuid.uuid4().hex}"
+        path = _file_path(tenant_id, file_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".part")
+
+        loop = asyncio.get_running_loop()
+        size = lines = 0
+        buffer = bytearray()
+        try:
+            f = await loop.run_in_executor(None, open, partial, "wb")
+            try:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > settings.BATCH_MAX_FILE_BYTES:
+                        raise ValidationError(message="Batch input file too large")
+                    await loop.run_in_executor(None, f.write, chunk)
+                    # Only the new chunk is scanned for line ends
+                    start = 0
+                    buffer += chunk
+                    end = buffer.find(b"\n", len(buffer) - len(chunk))
+                    while end >= 0:
+                        line = bytes(buffer[start:end])
+                        if line.strip():
+                            lines += 1
+                            _validate_line(line, lines)
+                        start = end + 1
+                        end = buffer.find(b"\n", start)
+                    del buffer[:start]
+                if buffer.strip():
+                    lines += 1
+                    _validate_line(bytes(buffer), lines)
+                    await loop.run_in_executor(None, f.write, b"\n")
+            finally:
+                await loop.run_in_executor(None, f.close)
+            if not lines or lines > settings.BATCH_MAX_ITEMS:
+                raise ValidationError(
+                    message=f"Batch input file must hold 1 to {settings.BATCH_MAX_ITEMS} requests"
+                )
+            os.replace(partial, path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+
+        logger.info(
+            "batch_file_stored", tenant_id=tenant_id, file_id=file_id, size=size, lines=lines
+        )
+        return {"id": file_id, "bytes": size, "lines": lines}
+
+    def file_path(self, tenant_id: str, file_id: str) -> Optional[Path]:
+        """Path of a tenant's batch file, if it exists"""
+        if not FILE_ID_PATTERN.match(file_id):
+            return None
+        path = _file_path(tenant_id, file_id)
+        return path if path.is_file() else None
+
+    async def create_job(
+        self,
+        tenant_id: str,
+        api_key: APIKey,
+        input_file_id: str,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> BatchJob:
+        """Queue a batch job for an uploaded input file"""
+        path = self.file_path(tenant_id, input_file_id)
+        if not path:
+            raise ValidationError(
+                message="Input file not found", errors={"input_file_id": input_file_id}
+            )
+
+        def count_lines() -> int:
+            with open(path, "rb") as f:
+                return sum(1 for line in f if line.strip())
+
+        total = await asyncio.get_running_loop().run_in_executor(None, count_lines)
+
+        async with get_tenant_db_session("system") as session:
+            job = BatchJob(
+                id=f"batch_{uuid.uuid4().hex[:24]}",
+                tenant_id=tenant_id,
+                api_key_id=api_key.id,
+                user_id=api_key.user_id,
+                status=BatchStatus.QUEUED.value,
+                input_file_id=input_file_id,
+                total_items=total,
+                batch_data={"metadata": metadata or {}},
+            )
+            session.add(job)
+            await session.commit()
+            return job
+
+    async def get_job(self, tenant_id: str, job_id: str) -> Optional[BatchJob]:
+        """Get a tenant's batch job"""
+        async with get_tenant_db_session("system") as session:
+            job = await session.get(BatchJob, job_id)
+            if not job or job.tenant_id != tenant_id:
+                return None
+            return job
+
+    async def list_jobs(
+        self, tenant_id: str, offset: int = 0, limit: int = 20
+    ) -> List[BatchJob]:
+        """List a tenant's batch jobs, newest first"""
+        async with get_tenant_db_session("system") as session:
+            result = await session.execute(
+                select(BatchJob)
+                .where(BatchJob.tenant_id == tenant_id)
+                .order_by(BatchJob.created_at.desc())
+                .offset(offset)
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+
+    async def cancel_job(self, tenant_id: str, job_id: str) -> Optional[BatchJob]:
+        """Request cancellation; the worker stops at its next checkpoint"""
+        async with get_tenant_db_session("system") as session:
+            job = await session.get(BatchJob, job_id)
+            if not job or job.tenant_id != tenant_id:
+                return None
+            if job.status == BatchStatus.QUEUED.value:
+                job.status = BatchStatus.CANCELLED.value
+                job.completed_at = utc_now()
+            elif job.status == BatchStatus.IN_PROGRESS.value:
+                job.status = BatchStatus.CANCELLING.value
+            await session.commit()
+            return job
+
+
+class BatchWorkerPool:
+    """
+    Background pool that processes batch jobs through ``ModelService``
+
+    Each process claims up to ``BATCH_WORKER_JOBS`` jobs with a renewable
+    lease, so jobs of a crashed or restarted process are picked up by any
+    replica once the lease expires. Upstream calls of all jobs share an
+    adaptive concurrency limit that backs off when the provider throttles,
+    so batches use spare capacity without starving interactive traffic.
+
+    Results are written in input order. Every ``BATCH_CHECKPOINT_ITEMS``
+    items the output is fsynced and the input line and file offsets are
+    stored with the job; a resumed job truncates its output to the last
+    checkpoint and continues from there, so only requests that were in
+    flight at the crash are sent again.
+    """
+
+    def __init__(self) -> None:
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.limiter = AdaptiveConcurrencyLimiter(
+            settings.BATCH_MIN_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY
+        )
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    def start(self) -> None:
+        """Start polling for jobs"""
+        self._poller = asyncio.ensure_future(self._poll())
+        logger.info("batch_worker_started", worker_id=self.worker_id)
+
+    async def stop(self) -> None:
+        """Checkpoint running jobs and release their leases"""
+        self._stopping.set()
+        if self._poller:
+            self._poller.cancel()
+        if self._jobs:
+            await asyncio.gather(*self._jobs.values(), return_exceptions=True)
+        logger.info("batch_worker_stopped", worker_id=self.worker_id)
+
+    async def _poll(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                while len(self._jobs) < settings.BATCH_WORKER_JOBS:
+                    job_id = await self._claim()
+                    if not job_id:
+                        break
+                    task = asyncio.ensure_future(self._run_job(job_id))
+                    self._jobs[job_id] = task
+                    task.add_done_callback(lambda _, j=job_id: self._jobs.pop(j, None))
+            except Exception as e:
+                logger.error("batch_claim_error", error=str(e), worker_id=self.worker_id)
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=settings.BATCH_POLL_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self) -> Optional[str]:
+        """Lease the oldest runnable job not leased by a live worker"""
+        now = utc_now()
+        async with get_tenant_db_session("system") as session:
+            result = await session.execute(
+                select(BatchJob)
+                .where(
+                    BatchJob.status.in_(
+                        [
+                            BatchStatus.QUEUED.value,
+                            BatchStatus.IN_PROGRESS.value,
+                            BatchStatus.CANCELLING.value,
+                        ]
+                    ),
+                    or_(BatchJob.locked_until.is_(None), BatchJob.locked_until < now),
+                )
+                .order_by(BatchJob.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            job = result.scalar_one_or_none()
+            if not job:
+                return None
+            job.locked_by = self.worker_id
+            job.locked_until = now + timedelta(seconds=settings.BATCH_LEASE_SECONDS)
+            if job.status == BatchStatus.QUEUED.value:
+                job.status = BatchStatus.IN_PROGRESS.value
+            if not job.output_file_id:
+                job.output_file_id = f"file-{uuid.uuid4().hex}"
+            await session.commit()
+            logger.info(
+                "batch_job_claimed",
+                job_id=job.id,
+                worker_id=self.worker_id,
+                checkpoint_line=job.checkpoint_line,
+            )
+            return job.id
+
+    async def _save(self, job_id: str, **values: Any) -> Optional[str]:
+        """
+        Update a job we hold the lease on, renewing the lease
+
+        Returns:
+            The job's current status, or None if the lease was lost
+        """
+        async with get_tenant_db_session("system") as session:
+            result = await session.execute(
+                update(BatchJob)
+                .where(BatchJob.id == job_id, BatchJob.locked_by == self.worker_id)
+                .values(**values)
+                .returning(BatchJob.status)
+            )
+            status = result.scalar_one_or_none()
+            await session.commit()
+            return status
+
+    async def _heartbeat(self, job_id: str, state: Dict[str, Any]) -> None:
+        """Renew the lease and pick up cancellation between checkpoints"""
+        while True:
+            await asyncio.sleep(settings.BATCH_LEASE_SECONDS / 3)
+            try:
+                status = await self._save(
+                    job_id,
+                    locked_until=utc_now()
+                    + timedelta(seconds=settings.BATCH_LEASE_SECONDS),
+                )
+            except Exception as e:
+                # Renewed on the next beat, well before the lease runs out
+                logger.error("batch_job_heartbeat_error", job_id=job_id, error=str(e))
+                continue
+            state["status"] = status
+
+    async def _run_job(self, job_id: str) -> None:
+        state: Dict[str, Any] = {"status": None}
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id, state))
+        try:
+            await self._process(job_id, state)
+        except Exception as e:
+            logger.error("batch_job_error", job_id=job_id, error=str(e))
+            await self._save(
+                job_id,
+                status=BatchStatus.FAILED.value,
+                error=str(e)[:1024],
+                completed_at=utc_now(),
+                locked_by=None,
+                locked_until=None,
+            )
+        finally:
+            heartbeat.cancel()
+
+    async def _process(self, job_id: str, state: Dict[str, Any]) -> None:
+        async with get_tenant_db_session("system") as session:
+            job = await session.get(BatchJob, job_id)
+            api_key = await session.get(APIKey, job.api_key_id)
+        if not api_key or not api_key.is_active:
+            raise ValueError("API key of the batch is no longer active")
+
+        state["status"] = job.status
+        input_path = _file_path(job.tenant_id, job.input_file_id)
+        output_path = _file_path(job.tenant_id, job.output_file_id)
+        loop = asyncio.get_running_loop()
+
+        line_number = job.checkpoint_line
+        written = job.checkpoint_line
+        checkpointed = job.checkpoint_line
+        resume_offset = job.input_offset
+        completed, failed = job.completed_items, job.failed_items
+        input_ends: Dict[int, int] = {}  # input offset after each pending line
+        results: Dict[int, Tuple[bytes, bool]] = {}
+        in_flight: Set[asyncio.Task] = set()
+        window = settings.BATCH_MAX_CONCURRENCY * 4
+        last_checkpoint = time.monotonic()
+
+        def open_files() -> Tuple[BinaryIO, BinaryIO]:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            output_path.touch()
+            source = open(input_path, "rb")
+            try:
+                output = open(output_path, "r+b")
+            except BaseException:
+                source.close()
+                raise
+            source.seek(job.input_offset)
+            output.truncate(job.output_offset)
+            output.seek(job.output_offset)
+            return source, output
+
+        # File I/O runs on the default executor, off the API worker's loop
+        source, output = await loop.run_in_executor(None, open_files)
+        try:
+            def read_lines() -> List[Tuple[bytes, int]]:
+                """Read up to a window of lines, with the offset after each"""
+                lines = []
+                while len(lines) < window:
+                    line = source.readline()
+                    if not line:
+                        break
+                    lines.append((line, source.tell()))
+                return lines
+
+            def sync() -> int:
+                output.flush()
+                os.fsync(output.fileno())
+                return output.tell()
+
+            async def checkpoint() -> None:
+                nonlocal checkpointed, last_checkpoint
+                output_offset = await loop.run_in_executor(None, sync)
+                state["status"] = await self._save(
+                    job_id,
+                    checkpoint_line=written,
+                    input_offset=resume_offset,
+                    output_offset=output_offset,
+                    completed_items=completed,
+                    failed_items=failed,
+                    locked_until=utc_now()
+                    + timedelta(seconds=settings.BATCH_LEASE_SECONDS),
+                )
+                checkpointed = written
+                last_checkpoint = time.monotonic()
+
+            def stopping() -> bool:
+                return self._stopping.is_set() or state["status"] in (
+                    None,
+                    BatchStatus.CANCELLING.value,
+                )
+
+            async def drain(wait_all: bool) -> None:
+                nonlocal written, resume_offset, completed, failed
+                if not in_flight:
+                    return
+                done, _ = await asyncio.wait(
+                    in_flight,
+                    return_when=asyncio.ALL_COMPLETED if wait_all else asyncio.FIRST_COMPLETED,
+                )
+                in_flight.difference_update(done)
+                # Write finished results in input order
+                records = []
+                while written in results:
+                    record, ok = results.pop(written)
+                    records.append(record)
+                    resume_offset = input_ends.pop(written)
+                    completed += ok
+                    failed += not ok
+                    written += 1
+                if records:
+                    await loop.run_in_executor(None, output.writelines, records)
+                if (
+                    written - checkpointed >= settings.BATCH_CHECKPOINT_ITEMS
+                    or time.monotonic() - last_checkpoint >= settings.BATCH_LEASE_SECONDS / 3
+                ):
+                    await checkpoint()
+
+            async def run(number: int, line: bytes) -> None:
+                try:
+                    results[number] = await self._execute(job, api_key, line)
+                except Exception as e:
+                    error = {"code": e.__class__.__name__, "message": str(e)}
+                    results[number] = (
+                        json.dumps({"response": None, "error": error}).encode() + b"\n",
+                        False,
+                    )
+
+            lines: Deque[Tuple[bytes, int]] = deque()
+            while not stopping():
+                if not lines:
+                    lines.extend(await loop.run_in_executor(None, read_lines))
+                    if not lines:
+                        break
+                line, line_end = lines.popleft()
+                if not line.strip():
+                    continue
+                input_ends[line_number] = line_end
+                in_flight.add(asyncio.ensure_future(run(line_number, line)))
+                line_number += 1
+                if len(in_flight) >= settings.BATCH_MAX_CONCURRENCY or (
+                    line_number - written >= window
+                ):
+                    await drain(wait_all=False)
+
+            await drain(wait_all=True)
+            await checkpoint()
+        finally:
+            await loop.run_in_executor(None, source.close)
+            await loop.run_in_executor(None, output.close)
+
+        if state["status"] is None:
+            logger.warning("batch_job_lease_lost", job_id=job_id, worker_id=self.worker_id)
+            return
+        if state["status"] == BatchStatus.CANCELLING.value:
+            final_status = BatchStatus.CANCELLED.value
+        elif self._stopping.is_set() and written < job.total_items:
+            # Shutting down: release the lease so another worker resumes now
+            await self._save(job_id, locked_by=None, locked_until=None)
+            logger.info("batch_job_released", job_id=job_id, checkpoint_line=written)
+            return
+        else:
+            final_status = BatchStatus.COMPLETED.value
+
+        await self._save(
+            job_id,
+            status=final_status,
+            completed_at=utc_now(),
+            locked_by=None,
+            locked_until=None,
+        )
+        logger.info(
+            "batch_job_finished",
+            job_id=job_id,
+            status=final_status,
+            completed_items=completed,
+            failed_items=failed,
+        )
+
+    async def _execute(
+        self, job: BatchJob, api_key: APIKey, line: bytes
+    ) -> Tuple[bytes, bool]:
+        """
+        Run one batch request
+
+        Returns:
+            Tuple of (output JSONL record, whether it succeeded)
+        """
+        request = json.loads(line)
+        body = request["body"]
+        model = body.get("model", settings.DEFAULT_MODEL)
+        messages = body["messages"]
+
+        def record(response: Optional[Dict], error: Optional[Dict]) -> bytes:
+            return (
+                json.dumps(
+                    {
+                        "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                        "custom_id": request.get("custom_id"),
+                        "response": response,
+                        "error": error,
+                    }
+                ).encode()
+                + b"\n"
+            )
+
+        model_service = await get_model_service()
+        quota_service = await get_quota_service()
+
+        for attempt in range(settings.BATCH_MAX_RETRIES + 1):
+            await self.limiter.acquire()
+            throttled = False
+            try:
+                prompt_tokens = await model_service.count_tokens(messages, model)
+                quota_error = None
+                async with get_tenant_db_session("system") as session:
+                    try:
+                        await quota_service.check_quota(
+                            job.tenant_id, job.user_id, prompt_tokens, session, api_key
+                        )
+                    except QuotaExceededError as e:
+                        quota_error = e
+                if quota_error:
+                    batch_items_total.labels(result="quota_exceeded").inc()
+                    return record(
+                        None, {"code": "quota_exceeded", "message": str(quota_error)}
+                    ), False
+
+                result = await model_service.generate(
+                    messages,
+                    model=model,
+                    temperature=body.get("temperature", 0.7),
+                    max_tokens=body.get("max_tokens"),
+                )
+            except THROTTLE_ERRORS as e:
+                throttled = True
+                error = e
+            except Exception as e:
+                batch_items_total.labels(result="failed").inc()
+                return record(
+                    None, {"code": e.__class__.__name__, "message": str(e)}
+                ), False
+            finally:
+                await self.limiter.release(throttled)
+                batch_concurrency_limit.set(self.limiter.limit)
+
+            if not throttled:
+                break
+            await asyncio.sleep(min(2**attempt, 30))
+        else:
+            batch_items_total.labels(result="failed").inc()
+            return record(
+                None, {"code": error.__class__.__name__, "message": str(error)}
+            ), False
+
+        try:
+            async with get_tenant_db_session("system") as session:
+                await quota_service.update_usage(
+                    tenant_id=job.tenant_id,
+                    user_id=job.user_id,
+                    prompt_tokens=result["usage"]["prompt_tokens"],
+                    completion_tokens=result["usage"]["completion_tokens"],
+                    model=model,
+                    request_id=f"{uuid.uuid4()}",
+                    metadata={
+                        "api_key_id": api_key.id,
+                        "provider": result.get("provider", "openai"),
+                        "batch_id": job.id,
+                    },
+                    session=session,
+                    api_key=api_key,
+                )
+        except Exception as e:
+            logger.error("usage_update_error", error=str(e), tenant_id=job.tenant_id)
+
+        batch_items_total.labels(result="completed").inc()
+        return record(
+            {
+                "status_code": 200,
+                "body": {
+                    "object": "chat.completion",
+                    "created": int(result.get("created", 0)),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": result["content"]},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": result["usage"],
+                },
+            },
+            None,
+        ), True
+
+
+# Global batch service and worker pool instances
+batch_service: Optional[BatchService] = None
+batch_worker_pool: Optional[BatchWorkerPool] = None
+
+
+async def get_batch_service() -> BatchService:
+    """Get batch service instance"""
+    global batch_service
+    if batch_service is None:
+        batch_service = BatchService()
+    return batch_service
+
+
+async def start_batch_worker_pool() -> None:
+    """Start processing batch jobs in this process"""
+    global batch_worker_pool
+    if batch_worker_pool is None:
+        batch_worker_pool = BatchWorkerPool()
+        batch_worker_pool.start()
+
+
+async def stop_batch_worker_pool() -> None:
+    """Checkpoint and release running batch jobs"""
+    global batch_worker_pool
+    if batch_worker_pool:
+        await batch_worker_pool.stop()
+        batch_worker_pool = None
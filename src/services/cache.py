@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from src.core.config import get_settings
+from src.core.logging import get_logger
+from src.core.similarity import SimHashIndex, normalize_text, simhash
+from src.models.system import Tenant
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+near_duplicate_lookups_total = Counter(
+    "near_duplicate_cache_lookups_total",
+    "Near-duplicate cache lookups",
+    ["tenant_id", "result"],
+)
+
+
+class NearDuplicateCacheService:
+    """
+    Opt-in cache serving responses for prompts that are near-duplicates of
+    earlier prompts sent with the same API key
+
+    Tenants enable it with ``config["near_duplicate_cache"]``, e.g.
+    ``{"enabled": true, "threshold": 0.95}``. Each (tenant, API key, model,
+    sampling parameters) namespace gets its own bounded SimHash index held
+    in process memory; answers are not shared between API keys, since a
+    prompt may carry one user's data. Entries are capped per index and, in
+    LRU order of the indexes, across all of them.
+    """
+
+    def __init__(self) -> None:
+        self._indexes: "OrderedDict[Tuple[str, str, str], SimHashIndex]" = (
+            OrderedDict()
+        )
+        self._entry_count = 0
+
+    @staticmethod
+    def get_threshold(tenant: Tenant) -> Optional[float]:
+        """Return the tenant's similarity threshold, or None if disabled"""
+        cache_config = (tenant.config or {}).get("near_duplicate_cache") or {}
+        if not cache_config.get("enabled"):
+            return None
+        return float(
+            cache_config.get("threshold", settings.NEAR_DUPLICATE_CACHE_THRESHOLD)
+        )
+
+    @staticmethod
+    def _namespace(
+        model: str, temperature: Optional[float], max_tokens: Optional[int]
+    ) -> str:
+        return f"{model}:{temperature}:{max_tokens}"
+
+    @staticmethod
+    def _fingerprint(messages: List[Dict[str, str]]) -> int:
+        text = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        return simhash(normalize_text(text))
+
+    def _get_index(
+        self, key: Tuple[str, str, str], create: bool
+    ) -> Optional[SimHashIndex]:
+        index = self._indexes.get(key)
+        if index is not None:
+            self._indexes.move_to_end(key)
+            return index
+        if not create:
+            return None
+
+        index = SimHashIndex(
+            max_entries=settings.NEAR_DUPLICATE_CACHE_MAX_ENTRIES,
+            bands=settings.NEAR_DUPLICATE_CACHE_BANDS,
+            ttl=settings.NEAR_DUPLICATE_CACHE_TTL,
+        )
+        self._indexes[key] = index
+        while len(self._indexes) > settings.NEAR_DUPLICATE_CACHE_MAX_INDEXES:
+            _, evicted = self._indexes.popitem(last=False)
+            self._entry_count -= len(evicted)
+        return index
+
+    def _evict(self) -> None:
+        """Evict entries of the least recently used indexes over the total cap"""
+        while self._entry_count > settings.NEAR_DUPLICATE_CACHE_MAX_TOTAL_ENTRIES:
+            key, index = next(iter(self._indexes.items()))
+            if index:
+                index.evict_oldest()
+                self._entry_count -= 1
+            if not index:
+                del self._indexes[key]
+
+    def lookup(
+        self,
+        tenant: Tenant,
+        api_key_id: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Tuple[Optional[float], Optional[Dict[str, Any]]]:
+        """
+        Look up a cached response for a near-duplicate prompt
+
+        Returns:
+            Tuple of (best similarity found, cached response). The response is
+            only returned when the similarity reaches the tenant threshold.
+            Both are None when the cache is disabled for the tenant.
+        """
+        threshold = self.get_threshold(tenant)
+        if threshold is None:
+            return None, None
+
+        key = (tenant.id, api_key_id, self._namespace(model, temperature, max_tokens))
+        index = self._get_index(key, create=False)
+        match = None
+        if index is not None:
+            size = len(index)
+            match = index.query(self._fingerprint(messages))
+            # Expired entries are dropped by the query
+            self._entry_count -= size - len(index)
+        if match is None:
+            near_duplicate_lookups_total.labels(tenant_id=tenant.id, result="miss").inc()
+            return 0.0, None
+
+        score, response = match
+        if score < threshold:
+            near_duplicate_lookups_total.labels(tenant_id=tenant.id, result="miss").inc()
+            return score, None
+
+        near_duplicate_lookups_total.labels(tenant_id=tenant.id, result="hit").inc()
+        logger.debug(
+            "near_duplicate_cache_hit", tenant_id=tenant.id, model=model, score=score
+        )
+        return score, response
+
+    def store(
+        self,
+        tenant: Tenant,
+        api_key_id: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        response: Dict[str, Any],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> None:
+        """Store a response for later near-duplicate lookups"""
+        if self.get_threshold(tenant) is None:
+            return
+
+        key = (tenant.id, api_key_id, self._namespace(model, temperature, max_tokens))
+        index = self._get_index(key, create=True)
+        size = len(index)
+        index.add(self._fingerprint(messages), response)
+        self._entry_count += len(index) - size
+        self._evict()
+
+
+# Global near-duplicate cache service instance
+near_duplicate_cache_service: Optional[NearDuplicateCacheService] = None
+
+
+async def get_near_duplicate_cache_service() -> NearDuplicateCacheService:
+    """Get near-duplicate cache service instance"""
+    global near_duplicate_cache_service
+    if near_duplicate_cache_service is None:
+        near_duplicate_cache_service = NearDuplicateCacheService()
+    return near_duplicate_cache_service
@@ -0,0 +1,96 @@
+from typing import Any, Hashable, List, Optional, Tuple
+
+import openai
+from prometheus_client import Histogram
+
+from src.core.batching import MicroBatcher, split_usage
+from src.core.config import get_settings
+from src.core.logging import get_logger
+from src.services.model import get_model_service
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+embedding_batch_inputs = Histogram(
+    "embedding_batch_inputs",
+    "Inputs per upstream embedding call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+
+
+class EmbeddingService:
+    """
+    Service for embeddings with cross-request micro-batching
+
+    Inputs from concurrent requests for the same model are merged into one
+    upstream call, flushed when ``EMBEDDING_BATCH_MAX_INPUTS`` inputs are
+    pending or ``EMBEDDING_BATCH_WINDOW_MS`` after the first one. The
+    upstream usage of a batch is split back across its inputs in proportion
+    to their local token counts.
+    """
+
+    def __init__(self) -> None:
+        self.batcher = MicroBatcher(
+            self._embed_batch,
+            max_items=settings.EMBEDDING_BATCH_MAX_INPUTS,
+            max_delay=settings.EMBEDDING_BATCH_WINDOW_MS / 1000,
+            # Only an invalid input is worth retrying without the others
+            split_errors=(openai.error.InvalidRequestError,),
+        )
+
+    async def _embed_batch(
+        self, model: Hashable, items: List[Tuple[str, int]]
+    ) -> List[Tuple[List[float], int]]:
+        """Embed (text, local token count) items in one upstream call"""
+        embedding_batch_inputs.observe(len(items))
+        model_service = await get_model_service()
+        result = await model_service.embed([text for text, _ in items], str(model))
+        tokens = split_usage(
+            result["usage"]["prompt_tokens"], [local for _, local in items]
+        )
+        return list(zip(result["embeddings"], tokens))
+
+    async def embed(
+        self, inputs: List[str], model: str, input_tokens: List[int]
+    ) -> Tuple[List[List[float]], int]:
+        """
+        Embed inputs, batched with concurrent requests
+
+        Args:
+            inputs: Texts to embed
+            model: Embedding model
+            input_tokens: Local token count of each input
+
+        Returns:
+            Tuple of (embeddings in input order, prompt tokens billed)
+        """
+        results: List[Any] = await self.batcher.submit(
+            model, list(zip(inputs, input_tokens))
+        )
+        return [embedding for embedding, _ in results], sum(
+            tokens for _, tokens in results
+        )
+
+    async def close(self) -> None:
+        """Flush pending batches"""
+        await self.batcher.close()
+
+
+# Global embedding service instance
+embedding_service: Optional[EmbeddingService] = None
+
+
+async def get_embedding_service() -> EmbeddingService:
+    """Get embedding service instance"""
+    global embedding_service
+    if embedding_service is None:
+        embedding_service = EmbeddingService()
+    return embedding_service
+
+
+async def close_embedding_service() -> None:
+    """Flush and drop the embedding service"""
+    global embedding_service
+    if embedding_service:
+        await embedding_service.close()
+        embedding_service = None
@@ -0,0 +1,134 @@
+import math
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from prometheus_client import Counter
+
+from src.core.config import get_settings
+from src.core.exceptions import IdempotencyConflictError, ValidationError
+from src.core.logging import get_logger
+from src.core.redis import get_redis
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# (status code, JSON body, headers) of a response
+StoredResponse = Tuple[int, Dict[str, Any], Dict[str, str]]
+
+idempotency_requests_total = Counter(
+    "idempotency_requests_total",
+    "Requests carrying an Idempotency-Key",
+    ["result"],
+)
+
+
+class IdempotencyService:
+    """
+    Service for ``Idempotency-Key`` handling
+
+    The first request with a key stores an in-flight marker (SET NX) and runs;
+    its response is then stored for ``IDEMPOTENCY_TTL``. Replays of a
+    completed key get the stored response, and replays of an in-flight key
+    wait for the original request instead of calling upstream again. A
+    failed request releases its key so the client can retry it.
+    """
+
+    async def execute(
+        self,
+        tenant_id: str,
+        key: str,
+        fingerprint: str,
+        call: Callable[[], Awaitable[StoredResponse]],
+    ) -> Tuple[StoredResponse, bool]:
+        """
+        Run ``call`` once per tenant and idempotency key
+
+        Args:
+            tenant_id: Tenant ID
+            key: Client supplied idempotency key
+            fingerprint: Hash of the request, a replay must match it
+            call: Runs the request
+
+        Returns:
+            Tuple of (response, whether it was replayed)
+        """
+        redis_key = f"{tenant_id}:{key}"
+        redis_service = await get_redis()
+        deadline = time.monotonic() + settings.IDEMPOTENCY_MAX_WAIT
+
+        while True:
+            attempt = uuid.uuid4().hex
+            existing = await redis_service.claim_idempotency_key(
+                redis_key,
+                {
+                    "state": "in_progress",
+                    "fingerprint": fingerprint,
+                    "attempt": attempt,
+                },
+                settings.IDEMPOTENCY_LOCK_TTL,
+            )
+            if existing is None:
+                break
+            if existing["fingerprint"] != fingerprint:
+                raise ValidationError(
+                    message="Idempotency-Key was already used with a different request",
+                    errors={"idempotency_key": key},
+                )
+            if existing["state"] == "completed":
+                idempotency_requests_total.labels(result="replayed").inc()
+                logger.info(
+                    "idempotent_replay", tenant_id=tenant_id, idempotency_key=key
+                )
+                response = existing["response"]
+                return (
+                    response["status_code"],
+                    response["body"],
+                    response["headers"],
+                ), True
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                idempotency_requests_total.labels(result="conflict").inc()
+                raise IdempotencyConflictError()
+            idempotency_requests_total.labels(result="waited").inc()
+            await redis_service.wait_idempotency_key(
+                redis_key, existing["attempt"], math.ceil(remaining)
+            )
+
+        idempotency_requests_total.labels(result="new").inc()
+        try:
+            status_code, body, headers = await call()
+        except BaseException:
+            await redis_service.finish_idempotency_key(redis_key, attempt, None, 0)
+            raise
+
+        record = {
+            "state": "completed",
+            "fingerprint": fingerprint,
+            "attempt": attempt,
+            "response": {"status_code": status_code, "body": body, "headers": headers},
+        }
+        stored = await redis_service.finish_idempotency_key(
+            redis_key, attempt, record, settings.IDEMPOTENCY_TTL
+        )
+        if not stored:
+            # The lock expired and a retry claimed the key; its record wins
+            logger.warning(
+                "idempotency_attempt_superseded",
+                tenant_id=tenant_id,
+                idempotency_key=key,
+            )
+        return (status_code, body, headers), False
+
+
+# Global idempotency service instance
+idempotency_service: Optional[IdempotencyService] = None
+
+
+async def get_idempotency_service() -> IdempotencyService:
+    """Get idempotency service instance"""
+    global idempotency_service
+    if idempotency_service is None:
+        idempotency_service = IdempotencyService()
+    return idempotency_service
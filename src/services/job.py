@@ -0,0 +1,361 @@
+import asyncio
+import enum
+import json
+import os
+import signal
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import openai.error
+from prometheus_client import Counter
+
+from src.core.config import get_settings
+from src.core.database import get_tenant_db_session
+from src.core.logging import get_logger
+from src.core.redis import get_redis
+from src.models.system import APIKey
+from src.services.model import get_model_service
+from src.services.quota import get_quota_service
+from src.services.ratelimit import get_rate_limit_service
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Upstream errors worth retrying on another attempt
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.ServiceUnavailableError,
+    openai.error.Timeout,
+    openai.error.TryAgain,
+    openai.error.APIConnectionError,
+)
+
+generation_jobs_total = Counter(
+    "generation_jobs_total",
+    "Async generation jobs finished by workers",
+    ["result"],
+)
+
+
+class JobStatus(str, enum.Enum):
+    """Async generation job status enumeration"""
+
+    QUEUED = "queued"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+FINISHED_STATUSES = (JobStatus.COMPLETED.value, JobStatus.FAILED.value)
+
+
+class GenerationJobService:
+    """
+    Service for async chat completion jobs
+
+    Jobs are appended to the ``JOB_STREAM`` Redis stream and run by
+    ``GenerationWorker`` processes reading it as one consumer group. The job
+    record (status, result or error) lives in Redis for ``JOB_RESULT_TTL``.
+    """
+
+    async def enqueue(
+        self,
+        tenant_id: str,
+        api_key: APIKey,
+        messages: List[Dict[str, Any]],
+        model: str,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        rate_limit_lease: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Queue a chat completion and return its job record
+
+        ``rate_limit_lease`` from ``RateLimitService.admit_tokens`` is
+        reconciled by the worker once the actual usage is known.
+        """
+        job = {
+            "id": f"job_{uuid.uuid4().hex}",
+            "object": "chat.completion.job",
+            "tenant_id": tenant_id,
+            "model": model,
+            "status": JobStatus.QUEUED.value,
+            "created": int(time.time()),
+            "attempts": 0,
+            "result": None,
+            "error": None,
+        }
+        payload = {
+            "api_key_id": api_key.id,
+            "user_id": api_key.user_id,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "rate_limit_lease": rate_limit_lease,
+        }
+        redis_service = await get_redis()
+        await redis_service.enqueue_generation_job(
+            job, payload, settings.JOB_RESULT_TTL
+        )
+        logger.info("generation_job_queued", tenant_id=tenant_id, job_id=job["id"])
+        return job
+
+    async def get(
+        self, tenant_id: str, job_id: str, wait: int = 0
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get a tenant's job, optionally waiting for it to finish
+
+        Args:
+            tenant_id: Tenant ID
+            job_id: Job ID
+            wait: Seconds to wait for an unfinished job (long-poll)
+        """
+        redis_service = await get_redis()
+        job = await redis_service.get_generation_job(job_id)
+        if not job or job["tenant_id"] != tenant_id:
+            return None
+        if wait and job["status"] not in FINISHED_STATUSES:
+            if await redis_service.wait_generation_job(
+                job_id, min(wait, settings.JOB_MAX_WAIT)
+            ):
+                job = await redis_service.get_generation_job(job_id) or job
+        return job
+
+
+class GenerationWorker:
+    """
+    Consumer of the generation job stream
+
+    Runs up to ``JOB_WORKER_CONCURRENCY`` jobs at once. A job is acknowledged
+    only once its result is stored, and running jobs are touched
+    periodically so their idle time stays low; jobs of a worker that died
+    go idle and are claimed by another worker after
+    ``JOB_CLAIM_IDLE_SECONDS``, up to ``JOB_MAX_ATTEMPTS`` times.
+    """
+
+    def __init__(self) -> None:
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running: Dict[Any, asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(settings.JOB_WORKER_CONCURRENCY)
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """Stop reading new jobs; running jobs are finished"""
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """Consume jobs until stopped"""
+        redis_service = await get_redis()
+        await redis_service.ensure_job_consumer_group()
+        heartbeat = asyncio.ensure_future(self._heartbeat())
+        logger.info("generation_worker_started", consumer=self.consumer)
+        try:
+            while not self._stopping.is_set():
+                await self._slots.acquire()
+                free = settings.JOB_WORKER_CONCURRENCY - len(self._running)
+                try:
+                    messages = await redis_service.read_generation_jobs(
+                        self.consumer,
+                        count=free,
+                        block_ms=1000,
+                        min_idle_ms=settings.JOB_CLAIM_IDLE_SECONDS * 1000,
+                    )
+                except Exception as e:
+                    logger.error("generation_job_read_error", error=str(e))
+                    messages = []
+                    await asyncio.sleep(1)
+                finally:
+                    self._slots.release()
+
+                for message_id, fields in messages:
+                    await self._slots.acquire()
+                    task = asyncio.ensure_future(self._handle(message_id, fields))
+                    self._running[message_id] = task
+                    task.add_done_callback(
+                        lambda _, m=message_id: (
+                            self._running.pop(m, None),
+                            self._slots.release(),
+                        )
+                    )
+            if self._running:
+                await asyncio.gather(*self._running.values(), return_exceptions=True)
+        finally:
+            heartbeat.cancel()
+            logger.info("generation_worker_stopped", consumer=self.consumer)
+
+    async def _heartbeat(self) -> None:
+        """Keep running jobs from being claimed by other workers"""
+        redis_service = await get_redis()
+        while True:
+            await asyncio.sleep(settings.JOB_CLAIM_IDLE_SECONDS / 3)
+            try:
+                await redis_service.touch_generation_jobs(
+                    self.consumer, list(self._running)
+                )
+            except Exception as e:
+                logger.error("generation_job_heartbeat_error", error=str(e))
+
+    async def _handle(self, message_id: Any, fields: Dict[Any, Any]) -> None:
+        redis_service = await get_redis()
+        job_id = fields[b"job_id"].decode()
+        job = await redis_service.get_generation_job(job_id)
+        if not job or job["status"] in FINISHED_STATUSES:
+            # Expired, or finished by a worker that died before acknowledging
+            await redis_service.ack_generation_job(message_id)
+            return
+
+        payload = json.loads(fields[b"payload"])
+        rate_limit_service = await get_rate_limit_service()
+        job["attempts"] += 1
+        if job["attempts"] > settings.JOB_MAX_ATTEMPTS:
+            await rate_limit_service.reconcile_tokens(
+                payload.get("rate_limit_lease"), 0
+            )
+            await self._finish(
+                message_id,
+                job,
+                error={
+                    "code": "max_attempts_exceeded",
+                    "message": "Job did not complete",
+                },
+            )
+            return
+        job["status"] = JobStatus.IN_PROGRESS.value
+        await redis_service.set_generation_job(job, settings.JOB_RESULT_TTL)
+
+        try:
+            result = await self._generate(job, payload)
+        except RETRYABLE_ERRORS as e:
+            if job["attempts"] < settings.JOB_MAX_ATTEMPTS:
+                # Leave the message pending; it is claimed again once idle
+                logger.warning("generation_job_retry", job_id=job_id, error=str(e))
+                job["status"] = JobStatus.QUEUED.value
+                await redis_service.set_generation_job(job, settings.JOB_RESULT_TTL)
+                return
+            await rate_limit_service.reconcile_tokens(
+                payload.get("rate_limit_lease"), 0
+            )
+            await self._finish(
+                message_id, job, error={"code": e.__class__.__name__, "message": str(e)}
+            )
+        except Exception as e:
+            logger.error("generation_job_error", job_id=job_id, error=str(e))
+            await rate_limit_service.reconcile_tokens(
+                payload.get("rate_limit_lease"), 0
+            )
+            await self._finish(
+                message_id, job, error={"code": e.__class__.__name__, "message": str(e)}
+            )
+        else:
+            await self._finish(message_id, job, result=result)
+
+    async def _generate(self, job: Dict[str, Any], payload: Dict[str, Any]) -> Dict:
+        """Run the completion and record its usage, which cannot fail the job"""
+        async with get_tenant_db_session("system") as session:
+            api_key = await session.get(APIKey, payload["api_key_id"])
+        if not api_key or not api_key.is_active:
+            raise ValueError("API key of the job is no longer active")
+
+        model_service = await get_model_service()
+        quota_service = await get_quota_service()
+        result = await model_service.generate(
+            payload["messages"],
+            model=job["model"],
+            temperature=payload["temperature"],
+            max_tokens=payload["max_tokens"],
+        )
+        rate_limit_service = await get_rate_limit_service()
+        await rate_limit_service.reconcile_tokens(
+            payload.get("rate_limit_lease"), result["usage"]["total_tokens"]
+        )
+        try:
+            async with get_tenant_db_session("system") as session:
+                await quota_service.update_usage(
+                    tenant_id=job["tenant_id"],
+                    user_id=api_key.user_id,
+                    prompt_tokens=result["usage"]["prompt_tokens"],
+                    completion_tokens=result["usage"]["completion_tokens"],
+                    model=job["model"],
+                    request_id=job["id"],
+                    metadata={
+                        "temperature": payload["temperature"],
+                        "max_tokens": payload["max_tokens"],
+                        "api_key_id": api_key.id,
+                        "provider": result.get("provider", "openai"),
+                        "job_id": job["id"],
+                    },
+                    session=session,
+                    api_key=api_key,
+                )
+        except Exception as e:
+            # The completion is done and paid for, so the job still succeeds
+            logger.error(
+                "usage_update_error",
+                error=str(e),
+                tenant_id=job["tenant_id"],
+                user_id=api_key.user_id or "default",
+                job_id=job["id"],
+            )
+
+        return {
+            "id": f"chatcmpl-{job['id']}",
+            "object": "chat.completion",
+            "created": int(result.get("created", 0)),
+            "model": job["model"],
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": result["content"]},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": result["usage"],
+        }
+
+    async def _finish(
+        self,
+        message_id: Any,
+        job: Dict[str, Any],
+        result: Optional[Dict] = None,
+        error: Optional[Dict] = None,
+    ) -> None:
+        """Store the outcome, wake long-polling clients, then acknowledge"""
+        redis_service = await get_redis()
+        job["status"] = JobStatus.FAILED.value if error else JobStatus.COMPLETED.value
+        job["result"] = result
+        job["error"] = error
+        await redis_service.set_generation_job(
+            job, settings.JOB_RESULT_TTL, finished=True
+        )
+        await redis_service.ack_generation_job(message_id)
+        generation_jobs_total.labels(result=job["status"]).inc()
+        logger.info(
+            "generation_job_finished",
+            job_id=job["id"],
+            status=job["status"],
+            attempts=job["attempts"],
+        )
+
+
+async def run_generation_worker() -> None:
+    """Run a generation worker until SIGTERM or SIGINT"""
+    worker = GenerationWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+
+
+# Global generation job service instance
+generation_job_service: Optional[GenerationJobService] = None
+
+
+async def get_generation_job_service() -> GenerationJobService:
+    """Get generation job service instance"""
+    global generation_job_service
+    if generation_job_service is None:
+        generation_job_service = GenerationJobService()
+    return generation_job_service
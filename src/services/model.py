@@ -2,6 +2,7 @@ import traceback
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional
 
+import openai
 import openai.error
 from langchain.chat_models import AzureChatOpenAI, ChatOpenAI
 from langchain.schema import AIMessage, ChatMessage, HumanMessage, SystemMessage
@@ -10,6 +11,7 @@ from src.core.config import get_settings
 from src.core.exceptions import ModelNotAvailableError
 from src.core.logging import get_logger
 from src.models.tenant import ModelProvider
+from src.services.tokenizer import get_tokenizer_service
 
 settings = get_settings()
 logger = get_logger(__name__)
@@ -35,6 +37,17 @@ class BaseModelProvider(ABC):
         """Count tokens in the input"""
         pass
 
+    async def embed(self, inputs: List[str], model: str) -> Dict[str, Any]:
+        """
+        Embed a batch of texts
+
+        Returns:
+            Dict with one embedding per input, in input order, and usage
+        """
+        raise ModelNotAvailableError(
+            f"{self.__class__.__name__} does not support embeddings", model=model
+        )
+
 
 class OpenAIProvider(BaseModelProvider):
     """OpenAI API provider"""
@@ -44,6 +57,7 @@ class OpenAIProvider(BaseModelProvider):
         import os
 
         os.environ["OPENAI_API_KEY"] = api_key
+        self.api_key = api_key
         self.client = ChatOpenAI(temperature=0.7, request_timeout=60)
 
     def _convert_messages(self, messages: List[Dict[str, str]]) -> List[ChatMessage]:
@@ -138,8 +152,37 @@ class OpenAIProvider(BaseModelProvider):
 
     async def count_tokens(self, messages: List[Dict[str, str]], model: str) -> int:
         """Count tokens in the input using tiktoken"""
-        langchain_messages = self._convert_messages(messages)
-        return self.client.get_num_tokens_from_messages(langchain_messages)
+        tokenizer = await get_tokenizer_service()
+        return await tokenizer.count_messages(messages, model)
+
+    async def embed(self, inputs: List[str], model: str) -> Dict[str, Any]:
+        """Embed a batch of texts using the OpenAI API"""
+        try:
+            response = await openai.Embedding.acreate(
+                model=model,
+                input=inputs,
+                api_key=self.api_key,
+                request_timeout=60,
+            )
+        except openai.error.OpenAIError as e:
+            logger.error(
+                "openai_embedding_error",
+                error=str(e),
+                error_type=e.__class__.__name__,
+                http_status=getattr(e, "http_status", None),
+                model=model,
+                input_count=len(inputs),
+            )
+            raise
+
+        data = sorted(response["data"], key=lambda item: item["index"])
+        return {
+            "embeddings": [item["embedding"] for item in data],
+            "usage": {
+                "prompt_tokens": response["usage"]["prompt_tokens"],
+                "total_tokens": response["usage"]["total_tokens"],
+            },
+        }
 
 
 class AzureProvider(BaseModelProvider):
@@ -167,8 +210,9 @@ class AzureProvider(BaseModelProvider):
         pass
 
     async def count_tokens(self, messages: List[Dict[str, str]], model: str) -> int:
-        """Count tokens using Azure's implementation"""
-        pass
+        """Count tokens using tiktoken, Azure deployments share OpenAI encodings"""
+        tokenizer = await get_tokenizer_service()
+        return await tokenizer.count_messages(messages, model)
 
 
 class ModelService:
@@ -266,6 +310,25 @@ class ModelService:
 
         return await self.providers[provider].count_tokens(messages, model)
 
+    async def embed(
+        self,
+        inputs: List[str],
+        model: str,
+        provider: Optional[ModelProvider] = None,
+    ) -> Dict[str, Any]:
+        """Embed a batch of texts using specified model and provider"""
+        if not provider:
+            provider = self._get_default_provider(model)
+
+        if provider not in self.providers:
+            raise ModelNotAvailableError(
+                f"Provider {provider} not configured",
+                model=model,
+                available_models=list(self.providers.keys()),
+            )
+
+        return await self.providers[provider].embed(inputs, model)
+
     def _get_default_provider(self, model: str) -> ModelProvider:
         """Get default provider for a model"""
         return ModelProvider.OPENAI
@@ -1,6 +1,6 @@
 import json
 import uuid
-from typing import Dict, Optional
+from typing import Awaitable, Callable, Dict, Optional
 
 import httpx
 from sqlalchemy import select
@@ -11,10 +11,13 @@ from src.core.config import get_settings
 from src.core.database import get_tenant_db_session
 from src.core.exceptions import QuotaExceededError, WebhookDeliveryError
 from src.core.logging import get_logger
-from src.core.redis import get_redis
+from src.core.quota_window import is_lifetime
+from src.core.redis import CONNECTION_ERRORS, get_redis
 from src.core.utils import calculate_token_cost, format_webhook_payload
 from src.models.system import Tenant, Webhook
 from src.models.tenant import UsageLog, User
+from src.services.quota_fallback import get_quota_fallback
+from src.services.quota_lease import get_quota_lease_manager
 
 settings = get_settings()
 logger = get_logger(__name__)
@@ -25,9 +28,20 @@ class QuotaService:
 
     async def check_quota(
         self, tenant_id: str, user_id: str, requested_tokens: int, session: AsyncSession,
-        api_key: Optional["APIKey"] = None  # Type hint as string to avoid circular import
-    ) -> None:
-        """Check if requested tokens are within quota limits"""
+        api_key: Optional["APIKey"] = None,  # Type hint as string to avoid circular import
+        exact_tokens: Optional[Callable[[], Awaitable[int]]] = None,
+    ) -> int:
+        """
+        Check if requested tokens are within quota limits
+
+        ``requested_tokens`` may be a fast upper-bound estimate. When it does
+        not fit under every limit and ``exact_tokens`` is given, the exact
+        count is computed and checked instead, so exact tokenization only
+        runs for requests close to a limit.
+
+        Returns:
+            The token count the request was admitted with
+        """
         try:
             # Get tenant from system database
             tenant = await session.get(Tenant, tenant_id)
@@ -42,38 +56,94 @@ class QuotaService:
                     logger.error("user_not_found", user_id=user_id, tenant_id=tenant_id)
                     raise ValueError(f"User not found: {user_id}")
 
-                # Get current usage from Redis
-                redis = await get_redis()
-                usage = await redis.get_token_usage(tenant_id, user_id, api_key.id if api_key else None)
-
-                # Check tenant quota
-                tenant_usage = usage["tenant_usage"]
-                if tenant_usage + requested_tokens > tenant.quota_limit:
-                    raise QuotaExceededError(
-                        message="Tenant token quota exceeded",
-                        quota_limit=tenant.quota_limit,
-                        current_usage=tenant_usage,
+            windows = [
+                tenant.quota_window,
+                user.quota_window,
+                api_key.quota_window if api_key else None,
+            ]
+            usage_key = (
+                tenant_id, user_id, api_key.id if api_key else None, tuple(windows)
+            )
+            fallback = await get_quota_fallback()
+
+            usage = None
+            if not fallback.active:
+                try:
+                    # Serve from this worker's quota lease when it covers the
+                    # request. Leases draw from lifetime counters only.
+                    if settings.QUOTA_LEASING_ENABLED and all(
+                        map(is_lifetime, windows)
+                    ):
+                        leases = await get_quota_lease_manager()
+                        if await leases.admit(
+                            tenant_id,
+                            user_id,
+                            api_key.id if api_key else None,
+                            [
+                                tenant.quota_limit,
+                                user.quota_limit,
+                                api_key.quota_limit if api_key else None,
+                            ],
+                            requested_tokens,
+                        ):
+                            return requested_tokens
+
+                    # Get current usage from Redis
+                    redis = await get_redis()
+                    usage = await redis.get_token_usage(
+                        tenant_id, user_id, api_key.id if api_key else None, windows
                     )
+                    fallback.observe(usage_key, usage)
+                except CONNECTION_ERRORS as e:
+                    fallback.enter(e)
+
+            # (scope, usage field, window, limit) of every quota of the request
+            scopes = [
+                ("Tenant", "tenant_usage", windows[0], tenant.quota_limit),
+                ("User", "user_usage", windows[1], user.quota_limit),
+            ]
+            if api_key:
+                scopes.append(
+                    ("API key", "api_key_usage", windows[2], api_key.quota_limit)
+                )
 
-                # Check user quota if exists and set
-                user_usage = usage.get("user_usage", 0)
-                if user and user.quota_limit is not None:
-                    if user_usage + requested_tokens > user.quota_limit:
-                        raise QuotaExceededError(
-                            message="User token quota exceeded",
-                            quota_limit=user.quota_limit,
-                            current_usage=user_usage,
-                        )
+            # Without Redis, admit against this worker's share of the headroom
+            if usage is None:
+                blocked = fallback.admit(
+                    usage_key, [limit for *_, limit in scopes], requested_tokens
+                )
+                if blocked is None:
+                    return requested_tokens
+                scope, field, window, limit = scopes[blocked]
+                raise self._quota_exceeded(
+                    scope, window, limit, fallback.journal.usage(usage_key)[field]
+                )
 
-                # Check API key quota if exists
-                if api_key and api_key.quota_limit is not None:
-                    api_key_usage = usage.get("api_key_usage", 0)
-                    if api_key_usage + requested_tokens > api_key.quota_limit:
-                        raise QuotaExceededError(
-                            message="API key token quota exceeded",
-                            quota_limit=api_key.quota_limit,
-                            current_usage=api_key_usage,
-                        )
+            # (scope, window, limit, current usage) for every limit that applies
+            limits = [
+                (scope, window, limit, usage.get(field, 0))
+                for scope, field, window, limit in scopes
+                if limit is not None
+            ]
+
+            fits = all(
+                current + requested_tokens <= limit for _, _, limit, current in limits
+            )
+            if not fits and exact_tokens is not None:
+                estimated_tokens = requested_tokens
+                requested_tokens = await exact_tokens()
+                logger.debug(
+                    "quota_exact_count",
+                    tenant_id=tenant_id,
+                    estimated_tokens=estimated_tokens,
+                    exact_tokens=requested_tokens,
+                )
+
+            for scope, window, limit, current in limits:
+                if current + requested_tokens > limit:
+                    raise self._quota_exceeded(scope, window, limit, current)
+
+            return requested_tokens
 
         except SQLAlchemyError as e:
             logger.error(
@@ -85,6 +155,18 @@ class QuotaService:
             )
             raise
 
+    @staticmethod
+    def _quota_exceeded(
+        scope: str, window: Optional[str], limit: int, current: int
+    ) -> QuotaExceededError:
+        return QuotaExceededError(
+            message=f"{scope} token quota exceeded"
+            if is_lifetime(window)
+            else f"{scope} {window} token quota exceeded",
+            quota_limit=limit,
+            current_usage=current,
+        )
+
     async def update_usage(
         self,
         tenant_id: str,
@@ -111,40 +193,11 @@ class QuotaService:
                 completion_tokens=completion_tokens,
             )
 
-            # First update Redis counters
-            redis = await get_redis()
-            new_usage = await redis.update_token_quota(
-                tenant_id,
-                user_id,
-                total_tokens,
-                api_key.id if api_key else None
-            )
-
-            # Update tenant quota in system database
             tenant = await session.get(Tenant, tenant_id)
             if not tenant:
                 logger.error("tenant_not_found_update", tenant_id=tenant_id)
                 raise ValueError(f"Tenant not found: {tenant_id}")
 
-            tenant.current_quota_usage = new_usage["tenant_usage"]
-            await session.commit()
-            logger.debug(
-                "tenant_quota_updated",
-                tenant_id=tenant_id,
-                current_usage=new_usage["tenant_usage"],
-            )
-
-            # Update API key quota if applicable
-            if api_key and api_key.quota_limit is not None:
-                api_key.current_quota_usage = new_usage.get("api_key_usage", 0)
-                await session.commit()
-                logger.debug(
-                    "api_key_quota_updated",
-                    api_key_id=api_key.id,
-                    current_usage=api_key.current_quota_usage,
-                )
-
-            # Update user quota and usage log in tenant database
             async with get_tenant_db_session(tenant_id) as tenant_session:
                 user = await tenant_session.get(User, user_id)
                 if not user:
@@ -153,6 +206,66 @@ class QuotaService:
                     )
                     raise ValueError(f"User not found: {user_id}")
 
+                windows = [
+                    tenant.quota_window,
+                    user.quota_window,
+                    api_key.quota_window if api_key else None,
+                ]
+                usage_key = (
+                    tenant_id, user_id, api_key.id if api_key else None, tuple(windows)
+                )
+                fallback = await get_quota_fallback()
+
+                # First update Redis counters, or charge this worker's quota lease
+                new_usage = None
+                if not fallback.active:
+                    try:
+                        if settings.QUOTA_LEASING_ENABLED and all(
+                            map(is_lifetime, windows)
+                        ):
+                            leases = await get_quota_lease_manager()
+                            new_usage = await leases.consume(
+                                tenant_id,
+                                user_id,
+                                api_key.id if api_key else None,
+                                total_tokens,
+                            )
+                        if new_usage is None:
+                            redis = await get_redis()
+                            new_usage = await redis.update_token_quota(
+                                tenant_id,
+                                user_id,
+                                total_tokens,
+                                api_key.id if api_key else None,
+                                windows,
+                            )
+                        fallback.observe(usage_key, new_usage)
+                    except CONNECTION_ERRORS as e:
+                        new_usage = None
+                        fallback.enter(e)
+                # Without Redis, journal the usage to replay when it is back
+                if new_usage is None:
+                    new_usage = fallback.record(usage_key, total_tokens)
+
+                # Update tenant quota in system database
+                tenant.current_quota_usage = new_usage["tenant_usage"]
+                await session.flush()
+                logger.debug(
+                    "tenant_quota_updated",
+                    tenant_id=tenant_id,
+                    current_usage=new_usage["tenant_usage"],
+                )
+
+                # Update API key quota if applicable
+                if api_key and api_key.quota_limit is not None:
+                    api_key.current_quota_usage = new_usage.get("api_key_usage", 0)
+                    await session.flush()
+                    logger.debug(
+                        "api_key_quota_updated",
+                        api_key_id=api_key.id,
+                        current_usage=api_key.current_quota_usage,
+                    )
+
                 # Update user's quota usage
                 user.current_quota_usage = new_usage["user_usage"]
 
@@ -172,8 +285,9 @@ class QuotaService:
                 )
                 tenant_session.add(usage_log)
 
-                # Save user updates and usage log
-                await tenant_session.commit()
+                # Write user updates and usage log; committed with the
+                # caller's session or the request's unit of work
+                await tenant_session.flush()
                 logger.debug(
                     "user_quota_updated",
                     tenant_id=tenant_id,
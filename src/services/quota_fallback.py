@@ -0,0 +1,229 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge
+
+from src.core.config import get_settings
+from src.core.logging import get_logger
+from src.core.quota_journal import QuotaJournal, UsageKey
+from src.core.redis import CONNECTION_ERRORS, get_redis
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+quota_degraded_mode = Gauge(
+    "quota_degraded_mode",
+    "1 while quotas are enforced from local counters because Redis is down",
+)
+quota_degraded_requests_total = Counter(
+    "quota_degraded_requests_total",
+    "Quota checks answered from local counters",
+    ["result"],
+)
+quota_degraded_journal_tokens = Gauge(
+    "quota_degraded_journal_tokens",
+    "Tokens charged while degraded and not yet replayed into Redis",
+)
+quota_degraded_replayed_tokens_total = Counter(
+    "quota_degraded_replayed_tokens_total",
+    "Tokens charged while degraded and replayed into Redis",
+)
+
+
+class QuotaFallbackService:
+    """
+    Degraded-mode quota enforcement while Redis is unreachable
+
+    A connection error from a quota call switches the worker to degraded
+    mode: quota calls skip Redis and are answered from a ``QuotaJournal``,
+    which admits each worker a ``QUOTA_DEGRADED_HEADROOM_SHARE`` of the
+    headroom last seen, and journals the usage charged. Redis is probed every
+    ``QUOTA_DEGRADED_PROBE_INTERVAL`` seconds; once it answers, the journal
+    is replayed into the usage counters and the worker leaves degraded mode.
+
+    Journaled usage is already in the usage logs, so the reconciler must not
+    raise counters up to them before it is replayed. Every
+    ``QUOTA_WORKER_REPORT_INTERVAL`` seconds a worker with an empty journal
+    reports so in Redis; a worker that stops reporting may hold a journal.
+    """
+
+    def __init__(self) -> None:
+        self.journal = QuotaJournal(
+            settings.QUOTA_DEGRADED_HEADROOM_SHARE,
+            settings.QUOTA_DEGRADED_MAX_ENTRIES,
+        )
+        self.active = False
+        self.since: Optional[float] = None
+        self.worker_id = uuid.uuid4().hex
+        self._probe: Optional[asyncio.Task] = None
+        self._reporter: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start reporting this worker's journal state"""
+        if self._reporter is None:
+            self._reporter = asyncio.ensure_future(self._report_loop())
+
+    async def _report(self) -> None:
+        redis_service = await get_redis()
+        await redis_service.report_quota_worker(self.worker_id, time.time())
+
+    async def _report_loop(self) -> None:
+        """Report an empty journal on an interval"""
+        while True:
+            if not self.active and not self.journal.pending_tokens:
+                try:
+                    await self._report()
+                except Exception as e:
+                    logger.warning("quota_worker_report_failed", error=str(e))
+            await asyncio.sleep(settings.QUOTA_WORKER_REPORT_INTERVAL)
+
+    def enter(self, error: Exception) -> None:
+        """Switch to degraded mode after a Redis connection error"""
+        if self.active:
+            return
+        self.active = True
+        self.since = time.time()
+        quota_degraded_mode.set(1)
+        logger.error("quota_degraded_mode_entered", error=str(error))
+        self._probe = asyncio.ensure_future(self._recover())
+
+    def observe(self, key: UsageKey, usage: Dict[str, int]) -> None:
+        """Remember usage read from Redis, to fall back on later"""
+        self.journal.observe(key, usage)
+
+    def admit(
+        self, key: UsageKey, limits: List[Optional[int]], tokens: int
+    ) -> Optional[int]:
+        """
+        Check a request against the local allowance
+
+        Args:
+            key: Usage key of the request
+            limits: Limit of each scope of the key, None where unlimited
+            tokens: Tokens requested
+
+        Returns:
+            Index of the first scope whose allowance the request exceeds, or
+            None if it is admitted
+        """
+        for index, allowance in enumerate(self.journal.allowance(key, limits)):
+            if allowance is not None and tokens > allowance:
+                quota_degraded_requests_total.labels(result="rejected").inc()
+                return index
+        quota_degraded_requests_total.labels(result="admitted").inc()
+        return None
+
+    def record(self, key: UsageKey, tokens: int) -> Dict[str, int]:
+        """Charge usage locally until it can be replayed into Redis"""
+        usage = self.journal.record(key, tokens)
+        quota_degraded_journal_tokens.inc(tokens)
+        return usage
+
+    def status(self) -> Dict[str, Any]:
+        """Degraded mode state for health checks"""
+        return {
+            "mode": "degraded" if self.active else "normal",
+            "degraded_since": self.since,
+            "journal_tokens": self.journal.pending_tokens,
+        }
+
+    async def _replay(self) -> None:
+        """Add the journaled usage to the Redis counters"""
+        redis_service = await get_redis()
+        while self.journal.pending_tokens:
+            pending = self.journal.drain()
+            for (key, hour), tokens in list(pending.items()):
+                tenant_id, user_id, api_key_id, windows = key
+                try:
+                    # Into the window buckets of the hour it was charged in
+                    usage = await redis_service.update_token_quota(
+                        tenant_id, user_id, tokens, api_key_id, list(windows), hour
+                    )
+                except Exception:
+                    for (unsent, charged_at), unsent_tokens in pending.items():
+                        self.journal.record(unsent, unsent_tokens, charged_at)
+                    raise
+                pending.pop((key, hour))
+                current_hour = datetime.utcnow().replace(
+                    minute=0, second=0, microsecond=0
+                )
+                if hour == current_hour:
+                    # Usage of earlier hours is over windows that have moved on
+                    self.journal.observe(key, usage)
+                quota_degraded_journal_tokens.dec(tokens)
+                quota_degraded_replayed_tokens_total.inc(tokens)
+
+    async def _recover(self) -> None:
+        """Probe Redis until it answers, then replay the journal"""
+        while self.active:
+            await asyncio.sleep(settings.QUOTA_DEGRADED_PROBE_INTERVAL)
+            try:
+                redis_service = await get_redis()
+                await redis_service.ping()
+                await self._replay()
+                await self._report()
+            except CONNECTION_ERRORS:
+                continue
+            except Exception as e:
+                logger.error("quota_journal_replay_failed", error=str(e))
+                continue
+            logger.info(
+                "quota_degraded_mode_left",
+                seconds=round(time.time() - self.since, 1),
+            )
+            self.active = False
+            self.since = None
+            quota_degraded_mode.set(0)
+
+    async def close(self) -> None:
+        """Stop probing and make a last attempt to replay the journal"""
+        for task in (self._probe, self._reporter):
+            if task:
+                task.cancel()
+        self._probe = self._reporter = None
+        if self.journal.pending_tokens:
+            try:
+                await self._replay()
+            except Exception as e:
+                logger.error(
+                    "quota_journal_lost",
+                    tokens=self.journal.pending_tokens,
+                    error=str(e),
+                )
+                # Left registered, so reconciliation waits for it to expire
+                return
+        try:
+            redis_service = await get_redis()
+            await redis_service.remove_quota_worker(self.worker_id)
+        except Exception as e:
+            logger.warning("quota_worker_report_failed", error=str(e))
+
+
+# Global quota fallback service instance
+quota_fallback: Optional[QuotaFallbackService] = None
+
+
+async def get_quota_fallback() -> QuotaFallbackService:
+    """Get quota fallback service instance"""
+    global quota_fallback
+    if quota_fallback is None:
+        quota_fallback = QuotaFallbackService()
+    return quota_fallback
+
+
+async def start_quota_fallback() -> QuotaFallbackService:
+    """Start reporting this worker's journal state to the reconciler"""
+    fallback = await get_quota_fallback()
+    fallback.start()
+    return fallback
+
+
+async def close_quota_fallback() -> None:
+    """Replay journaled usage and drop the quota fallback service"""
+    global quota_fallback
+    if quota_fallback:
+        await quota_fallback.close()
+        quota_fallback = None
@@ -0,0 +1,205 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from src.core.config import get_settings
+from src.core.logging import get_logger
+from src.core.quota_lease import QuotaLease
+from src.core.redis import get_redis
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+USAGE_FIELDS = ("tenant_usage", "user_usage", "api_key_usage")
+
+quota_lease_requests_total = Counter(
+    "quota_lease_requests_total",
+    "Quota admissions by lease outcome",
+    ["result"],
+)
+
+LeaseKey = Tuple[str, str, str]
+
+
+class QuotaLeaseManager:
+    """
+    Per-worker quota leases
+
+    For each active (tenant, user, API key) a worker takes a block of tokens
+    from the shared Redis usage counters and admits requests against it
+    locally, so most requests make no Redis round trip for quota. Blocks are
+    sized to ``QUOTA_LEASE_TARGET_SECONDS`` of the observed token rate, and
+    never exceed ``QUOTA_LEASE_MAX_HEADROOM_SHARE`` of the headroom left
+    under the tightest limit, so blocks shrink near a limit. Leased tokens
+    count as used in Redis, so workers together can not lease past a limit;
+    overshoot is bounded by the usage of requests in flight, as without
+    leasing. Unused tokens go back to the counters when a lease expires
+    (``QUOTA_LEASE_TTL``) and on shutdown.
+    """
+
+    def __init__(self) -> None:
+        self._leases: Dict[LeaseKey, QuotaLease] = {}
+        self._locks: Dict[LeaseKey, asyncio.Lock] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def _lease(self, key: LeaseKey) -> QuotaLease:
+        if key not in self._leases:
+            self._leases[key] = QuotaLease(ttl=settings.QUOTA_LEASE_TTL)
+            self._locks[key] = asyncio.Lock()
+        if self._sweeper is None:
+            self._sweeper = asyncio.ensure_future(self._sweep())
+        return self._leases[key]
+
+    async def admit(
+        self,
+        tenant_id: str,
+        user_id: str,
+        api_key_id: Optional[str],
+        limits: List[Optional[int]],
+        tokens: int,
+    ) -> bool:
+        """
+        Admit a request against the local lease, renewing it when needed
+
+        Args:
+            tenant_id: Tenant ID
+            user_id: User ID
+            api_key_id: Optional API key ID
+            limits: Quota limit of the tenant, user and API key (None if unset)
+            tokens: Tokens requested
+
+        Returns:
+            bool: True if admitted; False if the lease can not cover the
+            request and the caller should check the counters directly
+        """
+        key = (tenant_id, user_id, api_key_id or "")
+        lease = self._lease(key)
+        if not lease.expired and lease.available >= tokens:
+            quota_lease_requests_total.labels(result="hit").inc()
+            return True
+
+        async with self._locks[key]:
+            if self._leases.get(key) is not lease:
+                # Dropped by the sweeper while we waited
+                return await self.admit(tenant_id, user_id, api_key_id, limits, tokens)
+            # Another request may have renewed the lease while we waited
+            if not lease.expired and lease.available >= tokens:
+                quota_lease_requests_total.labels(result="hit").inc()
+                return True
+
+            returned = lease.take_unused() if lease.expired else 0
+            need = tokens - lease.available
+            redis_service = await get_redis()
+            granted, counters = await redis_service.lease_token_quota(
+                tenant_id,
+                user_id,
+                api_key_id,
+                limits,
+                returned=returned,
+                block=lease.next_block(
+                    need,
+                    settings.QUOTA_LEASE_TARGET_SECONDS,
+                    settings.QUOTA_LEASE_MIN_BLOCK,
+                    settings.QUOTA_LEASE_MAX_BLOCK,
+                ),
+                need=need,
+                share=settings.QUOTA_LEASE_MAX_HEADROOM_SHARE,
+            )
+            lease.grant(granted, counters)
+
+        admitted = lease.available >= tokens
+        quota_lease_requests_total.labels(
+            result="renewed" if admitted else "fallback"
+        ).inc()
+        return admitted
+
+    async def consume(
+        self, tenant_id: str, user_id: str, api_key_id: Optional[str], tokens: int
+    ) -> Optional[Dict[str, int]]:
+        """
+        Charge actual usage to the local lease
+
+        Tokens beyond the lease are added to the counters directly.
+
+        Returns:
+            Approximate usage per scope, or None if there is no lease and the
+            caller should update the counters itself
+        """
+        lease = self._leases.get((tenant_id, user_id, api_key_id or ""))
+        if lease is None:
+            return None
+
+        overflow = lease.consume(tokens)
+        if overflow:
+            redis_service = await get_redis()
+            return await redis_service.update_token_quota(
+                tenant_id, user_id, overflow, api_key_id
+            )
+        return dict(zip(USAGE_FIELDS, lease.usage()))
+
+    async def _release(self, key: LeaseKey) -> None:
+        """Return a lease's unused tokens to the counters"""
+        unused = self._leases[key].take_unused()
+        if unused:
+            tenant_id, user_id, api_key_id = key
+            redis_service = await get_redis()
+            await redis_service.lease_token_quota(
+                tenant_id,
+                user_id,
+                api_key_id or None,
+                [None, None, None],
+                returned=unused,
+                block=0,
+                need=0,
+                share=0.0,
+            )
+
+    async def _sweep(self) -> None:
+        """Return the tokens of expired leases and forget idle ones"""
+        while True:
+            await asyncio.sleep(settings.QUOTA_LEASE_TTL)
+            for key, lease in list(self._leases.items()):
+                if not lease.expired or self._locks[key].locked():
+                    continue
+                try:
+                    async with self._locks[key]:
+                        await self._release(key)
+                        if lease.expired and not lease.available:
+                            self._leases.pop(key, None)
+                            self._locks.pop(key, None)
+                except Exception as e:
+                    logger.error("quota_lease_release_failed", error=str(e))
+
+    async def close(self) -> None:
+        """Return all unused tokens"""
+        if self._sweeper:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for key in list(self._leases):
+            try:
+                await self._release(key)
+            except Exception as e:
+                logger.error("quota_lease_release_failed", error=str(e))
+        self._leases.clear()
+        self._locks.clear()
+
+
+# Global quota lease manager instance
+quota_lease_manager: Optional[QuotaLeaseManager] = None
+
+
+async def get_quota_lease_manager() -> QuotaLeaseManager:
+    """Get quota lease manager instance"""
+    global quota_lease_manager
+    if quota_lease_manager is None:
+        quota_lease_manager = QuotaLeaseManager()
+    return quota_lease_manager
+
+
+async def close_quota_lease_manager() -> None:
+    """Return leased tokens and drop the quota lease manager"""
+    global quota_lease_manager
+    if quota_lease_manager:
+        await quota_lease_manager.close()
+        quota_lease_manager = None
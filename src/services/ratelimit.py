@@ -0,0 +1,400 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+from sqlalchemy import select
+
+from src.core.auth import AuthService
+from src.core.config import get_settings
+from src.core.database import get_tenant_db_session
+from src.core.exceptions import RateLimitExceededError
+from src.core.logging import get_logger
+from src.core.ratelimit import (
+    RateLimitResult,
+    RateLimitRule,
+    rate_limit_rules,
+    token_bucket_rules,
+)
+from src.core.redis import get_redis
+from src.core.shm import SharedCounterTable, key_hash
+from src.models.system import APIKey, Tenant
+from src.models.tenant import ModelConfig
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+rate_limited_requests_total = Counter(
+    "rate_limited_requests_total",
+    "Requests rejected by the request rate limiter",
+    ["scope"],
+)
+
+
+class RateLimitService:
+    """
+    Service for per-tenant and per-API-key request rate limits, and
+    tokens/requests-per-minute buckets per tenant, API key and model
+
+    API keys are resolved to their tenant and rate limit config through a
+    per-worker cache (``RATE_LIMIT_KEY_CACHE_TTL`` seconds), so the limiter
+    costs one Redis round trip per request and no database query. Unknown
+    keys are cached too; authentication rejects them later. Model limits
+    are cached the same way.
+
+    Token buckets are charged with the estimated tokens of a request when
+    it is admitted, and reconciled with its actual usage afterwards.
+
+    With ``RATE_LIMIT_SHM_ENABLED`` request limits are counted in a table
+    shared by the worker processes of the host instead, and synced to
+    Redis every ``RATE_LIMIT_SHM_SYNC_INTERVAL_MS`` by one of them. Requests
+    close to a limit sync their own counters first, so the limit is exact
+    where it matters and the sync interval only bounds overshoot while far
+    from it.
+    """
+
+    def __init__(self) -> None:
+        self._keys: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = (
+            OrderedDict()
+        )
+        self._model_limits: "OrderedDict[Tuple[str, str], Tuple[float, Dict]]" = (
+            OrderedDict()
+        )
+        self._table: Optional[SharedCounterTable] = None
+        self._table_failed = False
+        self._syncer: Optional[asyncio.Task] = None
+
+    async def resolve_key(self, api_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Tenant ID, API key ID and tenant config of an active API key
+
+        Returns:
+            Dict with tenant_id, api_key_id and config, or None if the key is
+            unknown or inactive
+        """
+        key_hash = AuthService.hash_api_key(api_key)
+        cached = self._keys.get(key_hash)
+        if cached and cached[0] > time.monotonic():
+            self._keys.move_to_end(key_hash)
+            return cached[1]
+
+        async with get_tenant_db_session("system") as session:
+            result = await session.execute(
+                select(APIKey.id, APIKey.tenant_id, Tenant.config)
+                .join(Tenant, Tenant.id == APIKey.tenant_id)
+                .where(
+                    APIKey.key_hash == key_hash,
+                    APIKey.is_active.is_(True),
+                    Tenant.is_active.is_(True),
+                )
+            )
+            row = result.first()
+
+        resolved = (
+            {
+                "tenant_id": row.tenant_id,
+                "api_key_id": row.id,
+                "config": row.config or {},
+            }
+            if row
+            else None
+        )
+        self._keys[key_hash] = (
+            time.monotonic() + settings.RATE_LIMIT_KEY_CACHE_TTL,
+            resolved,
+        )
+        self._keys.move_to_end(key_hash)
+        while len(self._keys) > settings.RATE_LIMIT_KEY_CACHE_MAX_ENTRIES:
+            self._keys.popitem(last=False)
+        return resolved
+
+    async def check(
+        self, tenant_id: str, api_key_id: str, tenant_config: Dict[str, Any]
+    ) -> Optional[RateLimitResult]:
+        """
+        Admit a request against the tenant and API key limits
+
+        Returns:
+            Result of the most restrictive limit, or None if none applies
+        """
+        rules = rate_limit_rules(
+            tenant_id,
+            api_key_id,
+            tenant_config,
+            settings.RATE_LIMIT_DEFAULT_LIMIT,
+            settings.RATE_LIMIT_DEFAULT_PERIOD,
+        )
+        if not rules:
+            return None
+
+        checked = None
+        if settings.RATE_LIMIT_SHM_ENABLED:
+            checked = await self._check_shared(rules)
+        if checked is None:
+            redis_service = await get_redis()
+            checked = await redis_service.check_rate_limits(
+                tenant_id, [(rule.key, rule.limit, rule.period) for rule in rules]
+            )
+        allowed, windows = checked
+
+        # Report the window that blocked the request, or the one closest to
+        # blocking it
+        if allowed:
+            index = min(range(len(rules)), key=lambda i: windows[i][0])
+        else:
+            index = max(
+                (i for i in range(len(rules)) if windows[i][0] <= 0),
+                key=lambda i: windows[i][1],
+            )
+            rate_limited_requests_total.labels(scope=rules[index].scope).inc()
+            logger.info(
+                "rate_limited",
+                tenant_id=tenant_id,
+                api_key_id=api_key_id,
+                scope=rules[index].scope,
+            )
+        remaining, reset_ms = windows[index]
+        return RateLimitResult(
+            allowed=allowed,
+            limit=rules[index].limit,
+            remaining=remaining,
+            reset=reset_ms / 1000,
+        )
+
+    def _shared_table(self) -> Optional[SharedCounterTable]:
+        if self._table is None and not self._table_failed:
+            try:
+                self._table = SharedCounterTable(
+                    settings.RATE_LIMIT_SHM_PATH, settings.RATE_LIMIT_SHM_SLOTS
+                )
+            except OSError as e:
+                self._table_failed = True
+                logger.error("rate_limit_shm_unavailable", error=str(e))
+                return None
+            self._syncer = asyncio.ensure_future(self._sync_shared())
+        return self._table
+
+    async def _check_shared(
+        self, rules: List[RateLimitRule]
+    ) -> Optional[Tuple[bool, List[Tuple[int, int]]]]:
+        """
+        Admit a request against the host-local counters
+
+        Returns:
+            Same as ``RedisService.check_rate_limits``, or None if the table
+            is unavailable or full and Redis should be asked directly
+        """
+        table = self._shared_table()
+        if table is None:
+            return None
+        keys = [(key_hash(rule.key), rule.period * 1000) for rule in rules]
+        estimates = [table.estimate(key, period_ms) for key, period_ms in keys]
+        if None in estimates:
+            return None
+
+        near = [
+            i
+            for i, rule in enumerate(rules)
+            if estimates[i][0] + 1
+            > rule.limit * settings.RATE_LIMIT_SHM_EXACT_THRESHOLD
+        ]
+        if near:
+            await self._push([count for i in near for count in table.take(*keys[i])])
+            estimates = [table.estimate(key, period_ms) for key, period_ms in keys]
+            if None in estimates:
+                return None
+
+        allowed = all(
+            count + 1 <= rule.limit for rule, (count, _) in zip(rules, estimates)
+        )
+        if allowed:
+            for key, period_ms in keys:
+                table.add(key, period_ms)
+        windows = [
+            (math.floor(rule.limit - count) - (1 if allowed else 0), reset_ms)
+            for rule, (count, reset_ms) in zip(rules, estimates)
+        ]
+        return allowed, windows
+
+    async def _push(self, counts: List[Tuple[int, int, int, int]]) -> None:
+        """Push host-local counts to Redis and record the cluster totals"""
+        if not counts:
+            return
+        try:
+            redis_service = await get_redis()
+            totals = await redis_service.sync_rate_limit_counters(counts)
+        except Exception as e:
+            self._table.restore(counts)
+            logger.warning("rate_limit_shm_sync_failed", error=str(e))
+            return
+        for (key, period_ms, window, _), total in zip(counts, totals):
+            self._table.set_global(key, period_ms, window, total)
+
+    async def _sync_shared(self) -> None:
+        """Sync the host-local counters, taking turns with other workers"""
+        interval_ms = settings.RATE_LIMIT_SHM_SYNC_INTERVAL_MS
+        while True:
+            await asyncio.sleep(interval_ms / 1000)
+            if self._table.try_begin_sync(interval_ms):
+                await self._push(self._table.drain())
+
+    async def close(self) -> None:
+        """Push outstanding host-local counts and release the shared table"""
+        if self._syncer:
+            self._syncer.cancel()
+            self._syncer = None
+        if self._table:
+            await self._push(self._table.drain())
+            self._table.close()
+            self._table = None
+
+    async def model_rate_limit(self, tenant_id: str, model: str) -> Dict[str, Any]:
+        """``rate_limit`` of a tenant's active config for a model"""
+        cache_key = (tenant_id, model)
+        cached = self._model_limits.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            self._model_limits.move_to_end(cache_key)
+            return cached[1]
+
+        async with get_tenant_db_session(tenant_id) as session:
+            result = await session.execute(
+                select(ModelConfig.rate_limit)
+                .where(ModelConfig.model_name == model, ModelConfig.is_active.is_(True))
+                .order_by(ModelConfig.priority.desc())
+                .limit(1)
+            )
+            limits = result.scalar_one_or_none() or {}
+
+        self._model_limits[cache_key] = (
+            time.monotonic() + settings.RATE_LIMIT_KEY_CACHE_TTL,
+            limits,
+        )
+        self._model_limits.move_to_end(cache_key)
+        while len(self._model_limits) > settings.RATE_LIMIT_KEY_CACHE_MAX_ENTRIES:
+            self._model_limits.popitem(last=False)
+        return limits
+
+    async def admit_tokens(
+        self, tenant: Tenant, api_key: APIKey, model: str, tokens: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Charge a request to its TPM/RPM buckets
+
+        Args:
+            tenant: Tenant
+            api_key: API key
+            model: Requested model
+            tokens: Estimated tokens of the request (prompt plus max_tokens)
+
+        Returns:
+            Lease to pass to ``reconcile_tokens``, or None if no bucket applies
+
+        Raises:
+            RateLimitExceededError: If a bucket does not hold the request
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return None
+        try:
+            rules = token_bucket_rules(
+                tenant.id,
+                api_key.id,
+                model,
+                tenant.config,
+                await self.model_rate_limit(tenant.id, model),
+            )
+            if not rules:
+                return None
+            redis_service = await get_redis()
+            amounts = [tokens if rule.unit == "tokens" else 1 for rule in rules]
+            allowed, wait_ms, levels = await redis_service.take_token_buckets(
+                tenant.id,
+                "admit",
+                [
+                    (rule.key, rule.per_minute, rule.refill_per_ms, amount)
+                    for rule, amount in zip(rules, amounts)
+                ],
+            )
+        except Exception as e:
+            # Fail open: a Redis outage must not take the API down
+            logger.error("token_rate_limit_failed", tenant_id=tenant.id, error=str(e))
+            return None
+
+        if not allowed:
+            blocked = next(
+                rule
+                for rule, amount, level in zip(rules, amounts, levels)
+                if level < min(amount, rule.per_minute)
+            )
+            rate_limited_requests_total.labels(
+                scope=f"{blocked.scope}_{blocked.unit}"
+            ).inc()
+            logger.info(
+                "token_rate_limited",
+                tenant_id=tenant.id,
+                api_key_id=api_key.id,
+                model=model,
+                scope=blocked.scope,
+                unit=blocked.unit,
+            )
+            raise RateLimitExceededError(
+                message=f"{blocked.unit.capitalize()} per minute limit exceeded "
+                f"for {blocked.scope.replace('_', ' ')}",
+                retry_after=max(1, math.ceil(wait_ms / 1000)),
+            )
+
+        return {
+            "tenant_id": tenant.id,
+            "buckets": [
+                [rule.key, rule.per_minute, rule.refill_per_ms]
+                for rule in rules
+                if rule.unit == "tokens"
+            ],
+            "charged": tokens,
+        }
+
+    async def reconcile_tokens(
+        self, lease: Optional[Dict[str, Any]], actual_tokens: int
+    ) -> None:
+        """
+        Correct the token buckets of an admitted request by its actual usage
+
+        Refunds unused estimate, or charges usage beyond it. A lease is only
+        reconciled once.
+        """
+        if not lease or not lease["buckets"]:
+            return
+        buckets, lease["buckets"] = lease["buckets"], []
+        delta = actual_tokens - lease["charged"]
+        if not delta:
+            return
+        try:
+            redis_service = await get_redis()
+            await redis_service.take_token_buckets(
+                lease["tenant_id"],
+                "reconcile",
+                [(key, capacity, rate, delta) for key, capacity, rate in buckets],
+            )
+        except Exception as e:
+            logger.error("token_rate_limit_reconcile_failed", error=str(e))
+
+
+# Global rate limit service instance
+rate_limit_service: Optional[RateLimitService] = None
+
+
+async def get_rate_limit_service() -> RateLimitService:
+    """Get rate limit service instance"""
+    global rate_limit_service
+    if rate_limit_service is None:
+        rate_limit_service = RateLimitService()
+    return rate_limit_service
+
+
+async def close_rate_limit_service() -> None:
+    """Push outstanding rate limit counts and drop the rate limit service"""
+    global rate_limit_service
+    if rate_limit_service:
+        await rate_limit_service.close()
+        rate_limit_service = None
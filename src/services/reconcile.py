@@ -0,0 +1,318 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+from sqlalchemy import case, func, select
+
+from src.core.bulkhead import Bulkhead
+from src.core.config import get_settings
+from src.core.database import get_tenant_db_session
+from src.core.logging import get_logger
+from src.core.quota_window import bucket_usage, quota_buckets
+from src.core.redis import get_redis, token_quota_key
+from src.models.system import APIKey, Tenant
+from src.models.tenant import UsageLog, User
+from src.services.quota_fallback import get_quota_fallback
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+quota_reconcile_counters_total = Counter(
+    "quota_reconcile_counters_total",
+    "Usage counters checked against usage logs",
+    ["result"],
+)
+quota_reconcile_drift_tokens_total = Counter(
+    "quota_reconcile_drift_tokens_total",
+    "Absolute drift of the usage counters from usage logs, in tokens",
+)
+
+
+class QuotaReconciler:
+    """
+    Rebuilds and corrects the Redis usage counters from usage logs
+
+    Usage logs are the record of truth. Each tenant database is aggregated
+    with one GROUP BY over (user, API key, UTC hour), with hours only for
+    the span quota windows can cover, so one query yields lifetime totals
+    and every window bucket. Tenant databases are aggregated concurrently
+    (``QUOTA_RECONCILE_CONCURRENCY``).
+
+    Counters are read after the logs are aggregated and corrected in one
+    pipeline per tenant, by adding the drift rather than overwriting, so
+    usage charged meanwhile is kept. Usage is charged to Redis before its
+    log is committed, so a counter behind the logs has lost usage, while one
+    ahead of them may only hold usage still in flight: missing counters are
+    always rebuilt and counters behind by ``QUOTA_RECONCILE_MIN_DRIFT``
+    tokens or more are raised, but counters ahead are only reported. That
+    includes lifetime counters holding leased tokens with quota leasing.
+
+    Usage journaled by a degraded worker is logged but not yet in Redis, so
+    runs and tenants are skipped while any worker may still hold a journal:
+    this one is degraded, or another stopped reporting an empty journal
+    (see ``QuotaFallbackService``) less than ``QUOTA_WORKER_EXPIRY`` ago.
+    """
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self, only_missing: bool = False) -> Dict[str, int]:
+        """
+        Reconcile the counters of every active tenant
+
+        Args:
+            only_missing: Only rebuild missing counters, e.g. on cold start
+
+        Returns:
+            Totals of counters checked, missing, drifted and corrected, and
+            the absolute drift in tokens
+        """
+        if await self._journals_pending():
+            logger.info("quota_reconcile_skipped", reason="journal_pending")
+            return {}
+
+        async with get_tenant_db_session("system", Bulkhead.BACKGROUND) as session:
+            tenants = (
+                await session.execute(
+                    select(Tenant.id, Tenant.quota_window).where(
+                        Tenant.is_active.is_(True)
+                    )
+                )
+            ).all()
+            key_windows = dict(
+                (
+                    await session.execute(
+                        select(APIKey.id, APIKey.quota_window).where(
+                            APIKey.quota_window.is_not(None)
+                        )
+                    )
+                ).all()
+            )
+
+        semaphore = asyncio.Semaphore(settings.QUOTA_RECONCILE_CONCURRENCY)
+
+        async def reconcile(tenant_id: str, window: Optional[str]) -> Dict[str, int]:
+            async with semaphore:
+                try:
+                    return await self._reconcile_tenant(
+                        tenant_id, window, key_windows, only_missing
+                    )
+                except Exception as e:
+                    logger.error(
+                        "quota_reconcile_failed", tenant_id=tenant_id, error=str(e)
+                    )
+                    return {}
+
+        reports = await asyncio.gather(
+            *(reconcile(tenant.id, tenant.quota_window) for tenant in tenants)
+        )
+        totals: Dict[str, int] = defaultdict(int)
+        for report in reports:
+            for name, value in report.items():
+                totals[name] += value
+        logger.info(
+            "quota_reconciled",
+            tenants=len(tenants),
+            only_missing=only_missing,
+            **totals
+        )
+        return dict(totals)
+
+    async def _journals_pending(self) -> bool:
+        """Whether any worker may hold usage journaled while degraded"""
+        fallback = await get_quota_fallback()
+        if fallback.active or fallback.journal.pending_tokens:
+            return True
+
+        redis_service = await get_redis(Bulkhead.BACKGROUND)
+        now = time.time()
+        pending = False
+        for worker_id, at in (await redis_service.get_quota_workers()).items():
+            if now - at > settings.QUOTA_WORKER_EXPIRY:
+                # Gone without deregistering; a journal it held is lost
+                logger.warning("quota_worker_expired", worker_id=worker_id)
+                await redis_service.remove_quota_worker(worker_id)
+            elif now - at > 3 * settings.QUOTA_WORKER_REPORT_INTERVAL:
+                pending = True
+        return pending
+
+    async def _aggregate(
+        self, tenant_id: str, since: datetime
+    ) -> Tuple[List[Any], Dict[str, Optional[str]]]:
+        """Usage per (user, API key, UTC hour since ``since``), and user windows"""
+        api_key_id = UsageLog.usage_data["api_key_id"].as_string()
+        hour = case(
+            (
+                UsageLog.timestamp >= since,
+                func.date_trunc("hour", func.timezone("UTC", UsageLog.timestamp)),
+            ),
+            else_=None,
+        )
+        async with get_tenant_db_session(tenant_id, Bulkhead.BACKGROUND) as session:
+            rows = (
+                await session.execute(
+                    select(
+                        UsageLog.user_id,
+                        api_key_id.label("api_key_id"),
+                        hour.label("hour"),
+                        func.sum(UsageLog.total_tokens).label("tokens"),
+                    ).group_by(UsageLog.user_id, api_key_id, hour)
+                )
+            ).all()
+            user_windows = dict(
+                (
+                    await session.execute(
+                        select(User.id, User.quota_window).where(
+                            User.quota_window.is_not(None)
+                        )
+                    )
+                ).all()
+            )
+        return rows, user_windows
+
+    async def _reconcile_tenant(
+        self,
+        tenant_id: str,
+        tenant_window: Optional[str],
+        key_windows: Dict[str, Optional[str]],
+        only_missing: bool,
+    ) -> Dict[str, int]:
+        """Reconcile the counters of one tenant"""
+        now = datetime.utcnow()
+        rolling_hours = settings.QUOTA_ROLLING_WINDOW_HOURS
+        since = min(
+            now.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+            now.replace(minute=0, second=0, microsecond=0)
+            - timedelta(hours=rolling_hours - 1),
+        )
+        rows, user_windows = await self._aggregate(
+            tenant_id, since.replace(tzinfo=timezone.utc)
+        )
+
+        # Lifetime total and hourly usage of every counter
+        scopes: Dict[str, Tuple[Optional[str], List]] = {}
+        for row in rows:
+            charged = [(token_quota_key(tenant_id), tenant_window)]
+            charged.append(
+                (token_quota_key(tenant_id, row.user_id), user_windows.get(row.user_id))
+            )
+            if row.api_key_id:
+                charged.append(
+                    (
+                        token_quota_key(tenant_id, row.user_id, row.api_key_id),
+                        key_windows.get(row.api_key_id),
+                    )
+                )
+            for key, window in charged:
+                scope = scopes.setdefault(key, (window, [0, defaultdict(int)]))
+                scope[1][0] += row.tokens
+                if row.hour is not None:
+                    scope[1][1][row.hour] += row.tokens
+
+        # Expected value and TTL of every counter bucket
+        expected: List[Tuple[str, Optional[str], int, int]] = []
+        for key, (window, (total, hourly)) in scopes.items():
+            ttls = {
+                suffix: ttl
+                for suffix, _, ttl in quota_buckets(window, now, rolling_hours)
+            }
+            for (suffix, field), value in bucket_usage(
+                window, now, total, hourly, rolling_hours
+            ).items():
+                expected.append((key + suffix, field, value, ttls[suffix]))
+
+        if await self._journals_pending():
+            # A worker went degraded during the run
+            logger.info(
+                "quota_reconcile_skipped", tenant_id=tenant_id, reason="journal_pending"
+            )
+            return {}
+
+        # Read after aggregating: everything logged is charged by now
+        redis_service = await get_redis(Bulkhead.BACKGROUND)
+        current = await redis_service.read_counters(
+            [(key, field) for key, field, _, _ in expected]
+        )
+
+        report = {"checked": len(expected), "missing": 0, "drifted": 0}
+        report.update(corrected=0, drift_tokens=0)
+        adjustments = []
+        for (key, field, value, ttl), actual in zip(expected, current):
+            drift = value - (actual or 0)
+            if actual is None and value:
+                report["missing"] += 1
+                quota_reconcile_counters_total.labels(result="missing").inc()
+            elif abs(drift) >= max(settings.QUOTA_RECONCILE_MIN_DRIFT, 1):
+                report["drifted"] += 1
+                report["drift_tokens"] += abs(drift)
+                quota_reconcile_counters_total.labels(result="drifted").inc()
+                quota_reconcile_drift_tokens_total.inc(abs(drift))
+                logger.info(
+                    "quota_counter_drift",
+                    tenant_id=tenant_id,
+                    key=key,
+                    field=field,
+                    counter=actual,
+                    logged=value,
+                )
+                if only_missing or drift < 0:
+                    # Ahead of the logs: usage in flight looks the same
+                    continue
+            else:
+                quota_reconcile_counters_total.labels(result="ok").inc()
+                continue
+            adjustments.append((key, field, drift, ttl))
+
+        if adjustments:
+            await redis_service.adjust_counters(adjustments)
+            report["corrected"] = len(adjustments)
+        return report
+
+    async def _schedule(self) -> None:
+        """Rebuild missing counters now, then reconcile on an interval"""
+        only_missing = True
+        while True:
+            try:
+                redis_service = await get_redis(Bulkhead.BACKGROUND)
+                name = "quota_reconcile:startup" if only_missing else "quota_reconcile"
+                ttl = 60 if only_missing else settings.QUOTA_RECONCILE_INTERVAL - 1
+                # One run per interval across all workers and replicas
+                if await redis_service.try_lock(name, max(ttl, 1)):
+                    await self.run(only_missing=only_missing)
+            except Exception as e:
+                logger.error("quota_reconcile_failed", error=str(e))
+            only_missing = False
+            await asyncio.sleep(settings.QUOTA_RECONCILE_INTERVAL)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._schedule())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+# Global quota reconciler instance
+quota_reconciler: Optional[QuotaReconciler] = None
+
+
+async def start_quota_reconciler() -> QuotaReconciler:
+    """Start reconciling usage counters in the background"""
+    global quota_reconciler
+    if quota_reconciler is None:
+        quota_reconciler = QuotaReconciler()
+    quota_reconciler.start()
+    return quota_reconciler
+
+
+async def stop_quota_reconciler() -> None:
+    """Stop the background reconciliation"""
+    global quota_reconciler
+    if quota_reconciler:
+        await quota_reconciler.stop()
+        quota_reconciler = None
@@ -0,0 +1,238 @@
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from src.core.config import get_settings
+from src.core.database import get_tenant_db_session
+from src.core.logging import get_logger
+from src.core.redis import get_redis
+from src.core.tokens import get_message_format_tokens
+from src.core.utils import utc_now
+from src.models.tenant import ChatMessage, ChatSession
+from src.services.tokenizer import get_tokenizer_service
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+class ChatSessionService:
+    """
+    Service for server-side conversation sessions
+
+    Messages are stored with their token counts (including chat format
+    overhead), so a turn only tokenizes the new user message. The most recent
+    ``SESSION_WINDOW_MESSAGES`` messages are cached in Redis and sent with
+    each turn, after the session's system prompt.
+    """
+
+    async def create_session(
+        self,
+        tenant_id: str,
+        user_id: str,
+        model: str,
+        title: str,
+        system_prompt: Optional[str] = None,
+    ) -> ChatSession:
+        """Create a chat session, counting the system prompt once"""
+        session_data: Dict[str, Any] = {}
+        if system_prompt:
+            tokenizer = await get_tokenizer_service()
+            [tokens] = await tokenizer.count_message_list(
+                [{"role": "system", "content": system_prompt}], model
+            )
+            session_data = {
+                "system_prompt": system_prompt,
+                "system_prompt_tokens": tokens,
+            }
+
+        async with get_tenant_db_session(tenant_id) as db:
+            chat_session = ChatSession(
+                id=str(uuid.uuid4()),
+                user_id=user_id,
+                title=title,
+                model=model,
+                total_tokens=session_data.get("system_prompt_tokens", 0),
+                total_messages=0,
+                session_data=session_data,
+            )
+            db.add(chat_session)
+            await db.commit()
+            return chat_session
+
+    async def get_session(
+        self, tenant_id: str, session_id: str, user_id: str
+    ) -> Optional[ChatSession]:
+        """Get a chat session owned by a user"""
+        async with get_tenant_db_session(tenant_id) as db:
+            chat_session = await db.get(ChatSession, session_id)
+            if not chat_session or chat_session.user_id != user_id:
+                return None
+            return chat_session
+
+    async def list_messages(
+        self, tenant_id: str, session_id: str, offset: int = 0, limit: int = 100
+    ) -> List[ChatMessage]:
+        """List stored messages of a session in conversation order"""
+        async with get_tenant_db_session(tenant_id) as db:
+            result = await db.execute(
+                select(ChatMessage)
+                .where(ChatMessage.session_id == session_id)
+                .order_by(ChatMessage.timestamp)
+                .offset(offset)
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+
+    async def get_window(
+        self, tenant_id: str, chat_session: ChatSession
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Get the recent message window of a session
+
+        Returns:
+            Tuple of (messages with role, content and tokens, cache hit)
+        """
+        if chat_session.total_messages == 0:
+            return [], True
+
+        redis = await get_redis()
+        window = await redis.get_session_window(tenant_id, chat_session.id)
+        if window:
+            return window, True
+
+        async with get_tenant_db_session(tenant_id) as db:
+            result = await db.execute(
+                select(ChatMessage)
+                .where(ChatMessage.session_id == chat_session.id)
+                .order_by(ChatMessage.timestamp.desc())
+                .limit(settings.SESSION_WINDOW_MESSAGES)
+            )
+            rows = list(result.scalars().all())
+
+        window = [
+            {"role": row.role, "content": row.content, "tokens": row.tokens}
+            for row in reversed(rows)
+        ]
+        return window, False
+
+    def build_prompt(
+        self,
+        chat_session: ChatSession,
+        window: List[Dict[str, Any]],
+        new_message: Dict[str, Any],
+    ) -> Tuple[List[Dict[str, str]], List[int]]:
+        """
+        Build the prompt messages and their stored token counts
+
+        Returns:
+            Tuple of (messages, token count of each message)
+        """
+        messages: List[Dict[str, str]] = []
+        tokens: List[int] = []
+
+        system_prompt = chat_session.session_data.get("system_prompt")
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+            tokens.append(chat_session.session_data["system_prompt_tokens"])
+
+        for message in [*window, new_message]:
+            messages.append({"role": message["role"], "content": message["content"]})
+            tokens.append(message["tokens"])
+
+        return messages, tokens
+
+    async def append_turn(
+        self,
+        tenant_id: str,
+        chat_session: ChatSession,
+        window_cached: bool,
+        user_message: Dict[str, Any],
+        assistant_content: str,
+        completion_tokens: int,
+    ) -> ChatSession:
+        """
+        Store a user message and the assistant reply and update totals
+
+        The session row is locked while the turn is written and the cached
+        window updated, so concurrent turns of a session neither lose total
+        updates nor interleave their messages in the window.
+        """
+        assistant_message = {
+            "role": "assistant",
+            "content": assistant_content,
+            "tokens": get_message_format_tokens(
+                {"role": "assistant", "content": assistant_content},
+                chat_session.model,
+            )
+            + completion_tokens,
+        }
+        new_messages = [user_message, assistant_message]
+
+        async with get_tenant_db_session(tenant_id) as db:
+            stored = (
+                await db.execute(
+                    select(ChatSession)
+                    .where(ChatSession.id == chat_session.id)
+                    .with_for_update()
+                )
+            ).scalar_one()
+            for message in new_messages:
+                db.add(
+                    ChatMessage(
+                        id=str(uuid.uuid4()),
+                        session_id=stored.id,
+                        role=message["role"],
+                        content=message["content"],
+                        tokens=message["tokens"],
+                        # Explicit timestamps keep the pair ordered, now()
+                        # is the same for the whole transaction
+                        timestamp=utc_now(),
+                        message_data={},
+                    )
+                )
+            stored.total_tokens += sum(message["tokens"] for message in new_messages)
+            stored.total_messages += len(new_messages)
+            await db.flush()
+
+            if not window_cached:
+                # The window read before the lock may miss concurrent turns
+                result = await db.execute(
+                    select(ChatMessage)
+                    .where(ChatMessage.session_id == stored.id)
+                    .order_by(ChatMessage.timestamp.desc())
+                    .limit(settings.SESSION_WINDOW_MESSAGES)
+                )
+                new_messages = [
+                    {"role": row.role, "content": row.content, "tokens": row.tokens}
+                    for row in reversed(list(result.scalars().all()))
+                ]
+
+            redis = await get_redis()
+            await redis.push_session_messages(
+                tenant_id,
+                stored.id,
+                new_messages,
+                max_messages=settings.SESSION_WINDOW_MESSAGES,
+                ttl=settings.SESSION_CACHE_TTL,
+                replace=not window_cached,
+            )
+            try:
+                await db.commit()
+            except Exception:
+                # Rebuilt from the database on the next turn
+                await redis.drop_session_window(tenant_id, stored.id)
+                raise
+        return stored
+
+
+# Global chat session service instance
+chat_session_service: Optional[ChatSessionService] = None
+
+
+async def get_chat_session_service() -> ChatSessionService:
+    """Get chat session service instance"""
+    global chat_session_service
+    if chat_session_service is None:
+        chat_session_service = ChatSessionService()
+    return chat_session_service
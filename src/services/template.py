@@ -0,0 +1,180 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from src.core.config import get_settings
+from src.core.database import get_tenant_db_session
+from src.core.logging import get_logger
+from src.core.templates import (
+    render_template,
+    static_prefix_length,
+    template_variables,
+)
+from src.core.tokens import get_encoding
+from src.models.tenant import PromptTemplate
+from src.services.tokenizer import get_tokenizer_service
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+def _snapshot(template: PromptTemplate) -> Dict[str, Any]:
+    """Detached copy of a template row for the in-process cache"""
+    return {
+        "id": template.id,
+        "name": template.name,
+        "model": template.model,
+        "messages": template.messages,
+        "variables": template.variables,
+        "static_prefix_length": template.static_prefix_length,
+        "static_prefix_tokens": template.static_prefix_tokens,
+    }
+
+
+class PromptTemplateService:
+    """
+    Service for tenant-scoped prompt templates
+
+    Templates are stored once and referenced by ID in chat completions. The
+    leading messages without placeholders are tokenized when the template is
+    saved, and their counts seed the tokenizer cache when it is rendered, so
+    a long static system prompt is never re-encoded per request. Templates
+    are cached per worker for ``TEMPLATE_CACHE_TTL`` seconds.
+    """
+
+    def __init__(self) -> None:
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+
+    async def create_template(
+        self,
+        tenant_id: str,
+        name: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        created_by: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Store a template, counting its static prefix once"""
+        prefix_length = static_prefix_length(messages)
+        tokenizer = await get_tokenizer_service()
+        prefix_tokens = await tokenizer.count_message_list(
+            messages[:prefix_length], model
+        )
+
+        async with get_tenant_db_session(tenant_id) as db:
+            template = PromptTemplate(
+                id=str(uuid.uuid4()),
+                name=name,
+                model=model,
+                messages=messages,
+                variables=sorted(template_variables(messages)),
+                static_prefix_length=prefix_length,
+                static_prefix_tokens={get_encoding(model).name: prefix_tokens},
+                created_by=created_by,
+            )
+            db.add(template)
+            await db.commit()
+            snapshot = _snapshot(template)
+
+        logger.info(
+            "prompt_template_created",
+            tenant_id=tenant_id,
+            template_id=snapshot["id"],
+            static_prefix_tokens=sum(prefix_tokens),
+        )
+        return snapshot
+
+    async def get_template(
+        self, tenant_id: str, template_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """Get a template, from the in-process cache when fresh"""
+        key = (tenant_id, template_id)
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            self._cache.move_to_end(key)
+            return cached[1]
+
+        async with get_tenant_db_session(tenant_id) as db:
+            template = await db.get(PromptTemplate, template_id)
+            if not template:
+                self._cache.pop(key, None)
+                return None
+            snapshot = _snapshot(template)
+
+        self._cache[key] = (time.monotonic() + settings.TEMPLATE_CACHE_TTL, snapshot)
+        self._cache.move_to_end(key)
+        while len(self._cache) > settings.TEMPLATE_CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+        return snapshot
+
+    async def get_template_by_name(
+        self, tenant_id: str, name: str
+    ) -> Optional[Dict[str, Any]]:
+        """Get a template by its unique name"""
+        async with get_tenant_db_session(tenant_id) as db:
+            result = await db.execute(
+                select(PromptTemplate).where(PromptTemplate.name == name)
+            )
+            template = result.scalar_one_or_none()
+            return _snapshot(template) if template else None
+
+    async def list_templates(
+        self, tenant_id: str, offset: int = 0, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """List a tenant's templates by name"""
+        async with get_tenant_db_session(tenant_id) as db:
+            result = await db.execute(
+                select(PromptTemplate)
+                .order_by(PromptTemplate.name)
+                .offset(offset)
+                .limit(limit)
+            )
+            return [_snapshot(template) for template in result.scalars().all()]
+
+    async def delete_template(self, tenant_id: str, template_id: str) -> bool:
+        """Delete a template"""
+        self._cache.pop((tenant_id, template_id), None)
+        async with get_tenant_db_session(tenant_id) as db:
+            template = await db.get(PromptTemplate, template_id)
+            if not template:
+                return False
+            await db.delete(template)
+            await db.commit()
+            return True
+
+    async def render(
+        self, template: Dict[str, Any], variables: Dict[str, Any], model: str
+    ) -> Tuple[List[Dict[str, str]], int, int]:
+        """
+        Render a template for a request model
+
+        Returns:
+            Tuple of (messages, length of the static prefix with a known
+            count for the model's encoding, token count of that prefix)
+        """
+        messages = render_template(template["messages"], variables)
+
+        prefix_tokens = template["static_prefix_tokens"].get(get_encoding(model).name)
+        if prefix_tokens is None:
+            return messages, 0, 0
+
+        prefix_length = template["static_prefix_length"]
+        tokenizer = await get_tokenizer_service()
+        tokenizer.prime(messages[:prefix_length], model, prefix_tokens)
+        return messages, prefix_length, sum(prefix_tokens)
+
+
+# Global prompt template service instance
+prompt_template_service: Optional[PromptTemplateService] = None
+
+
+async def get_prompt_template_service() -> PromptTemplateService:
+    """Get prompt template service instance"""
+    global prompt_template_service
+    if prompt_template_service is None:
+        prompt_template_service = PromptTemplateService()
+    return prompt_template_service
@@ -0,0 +1,323 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from src.core.config import get_settings
+from src.core.logging import get_logger
+from src.core.redis import get_redis
+from src.core.tokens import (
+    REPLY_PRIMING_TOKENS,
+    TokenEstimator,
+    count_message_content_tokens,
+    count_text_tokens,
+    get_encoding,
+    get_message_format_tokens,
+)
+from src.core.utils import chunk_text, generate_hash
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Chunks produced per pool job when chunking a document stream
+CHUNK_BATCH_SIZE = 16
+
+tokenizer_queue_seconds = Histogram(
+    "tokenizer_queue_seconds",
+    "Time offloaded tokenization jobs wait for a pool worker",
+)
+
+tokenizer_duration_seconds = Histogram(
+    "tokenizer_duration_seconds",
+    "Time spent tokenizing a request",
+    ["mode"],
+)
+
+token_cache_requests_total = Counter(
+    "token_cache_requests_total",
+    "Per-message token count cache lookups",
+    ["result"],
+)
+
+token_cache_tokens_saved_total = Counter(
+    "token_cache_tokens_saved_total",
+    "Tokens that did not need encoding thanks to the token count cache",
+)
+
+
+def _message_size(messages: List[Dict[str, Any]]) -> int:
+    """Total characters of the string fields of a list of messages"""
+    return sum(
+        len(value)
+        for message in messages
+        for value in message.values()
+        if isinstance(value, str)
+    )
+
+
+class TokenizerService:
+    """
+    Service for counting prompt tokens without stalling the event loop
+
+    Token counts are cached per message, keyed by encoding name and content
+    hash, in a bounded in-memory LRU with an optional Redis tier, so a
+    multi-turn conversation only encodes the messages added since the last
+    turn. Messages that still need encoding are tokenized inline when small
+    and dispatched to a thread pool sized from the CPU count when above
+    ``TOKENIZE_OFFLOAD_THRESHOLD`` characters; tiktoken releases the GIL
+    while encoding, so the threads run in parallel with the event loop.
+    """
+
+    def __init__(self) -> None:
+        self.pool_size = settings.TOKENIZER_POOL_SIZE or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.pool_size, thread_name_prefix="tokenizer"
+        )
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self.estimator = TokenEstimator(
+            margin=settings.TOKEN_ESTIMATE_MARGIN,
+            window=settings.TOKEN_ESTIMATE_WINDOW,
+            min_samples=settings.TOKEN_ESTIMATE_MIN_SAMPLES,
+        )
+
+    def _cache_get(self, key: str) -> Optional[int]:
+        tokens = self._cache.get(key)
+        if tokens is not None:
+            self._cache.move_to_end(key)
+        return tokens
+
+    def _cache_set(self, key: str, tokens: int) -> None:
+        self._cache[key] = tokens
+        self._cache.move_to_end(key)
+        while len(self._cache) > settings.TOKEN_CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+
+    async def _redis_get(self, keys: List[str]) -> List[Optional[int]]:
+        if not settings.TOKEN_CACHE_REDIS_ENABLED or not keys:
+            return [None] * len(keys)
+        try:
+            redis = await get_redis()
+            return await redis.get_token_counts(keys)
+        except Exception as e:
+            logger.warning("token_cache_redis_error", operation="get", error=str(e))
+            return [None] * len(keys)
+
+    async def _redis_set(self, counts: Dict[str, int]) -> None:
+        if not settings.TOKEN_CACHE_REDIS_ENABLED or not counts:
+            return
+        try:
+            redis = await get_redis()
+            await redis.set_token_counts(counts, settings.TOKEN_CACHE_TTL)
+        except Exception as e:
+            logger.warning("token_cache_redis_error", operation="set", error=str(e))
+
+    async def count_message_list(
+        self, messages: List[Dict[str, Any]], model: str
+    ) -> List[int]:
+        """
+        Count tokens of each message, including its chat format overhead
+
+        Reply priming tokens are not included, see ``count_messages``.
+        """
+        encoding = get_encoding(model)
+        keys = [f"{encoding.name}:{generate_hash(message)}" for message in messages]
+        content_tokens: List[Optional[int]] = [self._cache_get(key) for key in keys]
+
+        missing = [i for i, tokens in enumerate(content_tokens) if tokens is None]
+        memory_hits = len(messages) - len(missing)
+        redis_hits = 0
+
+        if missing:
+            cached = await self._redis_get([keys[i] for i in missing])
+            for i, tokens in zip(missing, cached):
+                if tokens is not None:
+                    content_tokens[i] = tokens
+                    self._cache_set(keys[i], tokens)
+                    redis_hits += 1
+            missing = [i for i in missing if content_tokens[i] is None]
+
+        saved = sum(tokens for tokens in content_tokens if tokens is not None)
+
+        if missing:
+            to_encode = [messages[i] for i in missing]
+            encoded = await self._encode(to_encode, model)
+            for i, tokens in zip(missing, encoded):
+                content_tokens[i] = tokens
+                self._cache_set(keys[i], tokens)
+            await self._redis_set({keys[i]: content_tokens[i] for i in missing})
+
+        token_cache_requests_total.labels(result="memory_hit").inc(memory_hits)
+        token_cache_requests_total.labels(result="redis_hit").inc(redis_hits)
+        token_cache_requests_total.labels(result="miss").inc(len(missing))
+        token_cache_tokens_saved_total.inc(saved)
+
+        return [
+            get_message_format_tokens(message, model) + tokens
+            for message, tokens in zip(messages, content_tokens)
+        ]
+
+    def prime(
+        self,
+        messages: List[Dict[str, Any]],
+        model: str,
+        message_tokens: List[int],
+    ) -> None:
+        """
+        Seed the in-memory cache with known per-message counts
+
+        ``message_tokens`` are counts as returned by ``count_message_list``,
+        e.g. stored alongside a prompt template, so they are not re-encoded.
+        """
+        encoding = get_encoding(model)
+        for message, tokens in zip(messages, message_tokens):
+            self._cache_set(
+                f"{encoding.name}:{generate_hash(message)}",
+                tokens - get_message_format_tokens(message, model),
+            )
+
+    async def count_messages(self, messages: List[Dict[str, Any]], model: str) -> int:
+        """Count prompt tokens of a list of chat messages"""
+        per_message = await self.count_message_list(messages, model)
+        return REPLY_PRIMING_TOKENS + sum(per_message)
+
+    async def count_texts(self, texts: List[str], model: str) -> List[int]:
+        """Count tokens of plain texts, e.g. embedding inputs"""
+
+        def count_all() -> List[int]:
+            encoding = get_encoding(model)
+            return [count_text_tokens(text, model, encoding) for text in texts]
+
+        if sum(len(text) for text in texts) >= settings.TOKENIZE_OFFLOAD_THRESHOLD:
+            return await self.run_offloaded(count_all)
+
+        start = time.perf_counter()
+        tokens = count_all()
+        tokenizer_duration_seconds.labels(mode="inline").observe(
+            time.perf_counter() - start
+        )
+        return tokens
+
+    def estimate_messages(self, messages: List[Dict[str, Any]], model: str) -> int:
+        """Fast upper-bound prompt token estimate, see ``TokenEstimator``"""
+        return self.estimator.estimate(messages, model)
+
+    def observe_usage(
+        self, messages: List[Dict[str, Any]], model: str, prompt_tokens: int
+    ) -> None:
+        """Calibrate the estimator from upstream-reported prompt tokens"""
+        self.estimator.observe(messages, model, prompt_tokens)
+
+    async def _encode(self, messages: List[Dict[str, Any]], model: str) -> List[int]:
+        """Encode messages inline, or on the pool when they are large"""
+
+        def encode_all() -> List[int]:
+            encoding = get_encoding(model)
+            return [
+                count_message_content_tokens(message, model, encoding)
+                for message in messages
+            ]
+
+        if _message_size(messages) >= settings.TOKENIZE_OFFLOAD_THRESHOLD:
+            return await self.run_offloaded(encode_all)
+
+        start = time.perf_counter()
+        tokens = encode_all()
+        tokenizer_duration_seconds.labels(mode="inline").observe(
+            time.perf_counter() - start
+        )
+        return tokens
+
+    async def run_offloaded(self, func: Any, *args: Any) -> Any:
+        """Run a tokenization function on the pool, recording queue and run time"""
+        submitted_at = time.perf_counter()
+
+        def timed() -> Any:
+            started_at = time.perf_counter()
+            tokenizer_queue_seconds.observe(started_at - submitted_at)
+            try:
+                return func(*args)
+            finally:
+                tokenizer_duration_seconds.labels(mode="offloaded").observe(
+                    time.perf_counter() - started_at
+                )
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, timed)
+
+    async def chunk_documents(
+        self,
+        documents: AsyncIterator[Tuple[str, str]],
+        max_tokens: int,
+        model: str,
+        overlap: int,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Chunk a stream of (id, text) documents in parallel on the pool
+
+        At most two documents per pool worker are in flight, so memory stays
+        flat however long the stream is. Each document's chunks are pulled
+        from ``chunk_text`` a batch at a time, so a long document is never
+        held as a list of chunks. Chunks are yielded in input order.
+        """
+        window = self.pool_size * 2
+        pending: Deque[Tuple[str, Iterator[str], asyncio.Future]] = deque()
+
+        def next_chunks(chunks: Iterator[str]) -> List[str]:
+            return list(islice(chunks, CHUNK_BATCH_SIZE))
+
+        async def drain_one() -> AsyncIterator[Dict[str, Any]]:
+            document_id, chunks, future = pending.popleft()
+            index = 0
+            batch = await future
+            while batch:
+                for text in batch:
+                    yield {"id": document_id, "index": index, "text": text}
+                    index += 1
+                if len(batch) < CHUNK_BATCH_SIZE:
+                    break
+                batch = await self.run_offloaded(next_chunks, chunks)
+
+        try:
+            async for document_id, text in documents:
+                chunks = chunk_text(text, max_tokens, model, overlap)
+                future = asyncio.ensure_future(self.run_offloaded(next_chunks, chunks))
+                pending.append((document_id, chunks, future))
+                if len(pending) >= window:
+                    async for item in drain_one():
+                        yield item
+            while pending:
+                async for item in drain_one():
+                    yield item
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+
+    def close(self) -> None:
+        """Shut down the tokenizer pool"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global tokenizer service instance
+tokenizer_service: Optional[TokenizerService] = None
+
+
+async def get_tokenizer_service() -> TokenizerService:
+    """Get tokenizer service instance"""
+    global tokenizer_service
+    if tokenizer_service is None:
+        tokenizer_service = TokenizerService()
+        logger.info("tokenizer_pool_started", pool_size=tokenizer_service.pool_size)
+    return tokenizer_service
+
+
+async def close_tokenizer_service() -> None:
+    """Shut down the tokenizer service"""
+    global tokenizer_service
+    if tokenizer_service:
+        tokenizer_service.close()
+        tokenizer_service = None
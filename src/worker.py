@@ -0,0 +1,25 @@
+import asyncio
+
+from src.core.config import get_settings
+from src.core.logging import setup_logging
+from src.core.redis import close_redis
+from src.services.job import run_generation_worker
+from src.services.quota_fallback import close_quota_fallback
+from src.services.quota_lease import close_quota_lease_manager
+
+settings = get_settings()
+
+
+async def main() -> None:
+    """Run an async generation job worker, scaled independently of the API"""
+    try:
+        await run_generation_worker()
+    finally:
+        await close_quota_lease_manager()
+        await close_quota_fallback()
+        await close_redis()
+
+
+if __name__ == "__main__":
+    setup_logging(settings.LOG_LEVEL)
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from src.core.batching import MicroBatcher, split_usage
+
+
+def test_split_usage_sums_to_total():
+    assert split_usage(10, [1, 1, 1]) == [4, 3, 3]
+    assert split_usage(7, [2, 0, 5]) == [2, 0, 5]
+    assert split_usage(5, [0, 0]) == [3, 2]
+    assert sum(split_usage(1001, [3, 7, 11, 13])) == 1001
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submissions_share_one_batch():
+    calls = []
+
+    async def handler(key, items):
+        calls.append((key, list(items)))
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher(handler, max_items=100, max_delay=0.01)
+    results = await asyncio.gather(
+        batcher.submit("m", [1, 2]), batcher.submit("m", [3]), batcher.submit("n", [4])
+    )
+
+    assert results == [[10, 20], [30], [40]]
+    assert sorted(calls) == [("m", [1, 2, 3]), ("n", [4])]
+
+
+@pytest.mark.asyncio
+async def test_flushes_at_max_items_and_propagates_errors():
+    calls = []
+
+    async def handler(key, items):
+        calls.append(list(items))
+        if 0 in items:
+            raise RuntimeError("upstream failed")
+        return items
+
+    batcher = MicroBatcher(handler, max_items=2, max_delay=10)
+    assert await asyncio.gather(batcher.submit("m", [1]), batcher.submit("m", [2])) == [
+        [1],
+        [2],
+    ]
+    assert calls == [[1, 2]]
+
+    with pytest.raises(RuntimeError):
+        await batcher.submit("m", [0, 5])
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_retries_submissions_alone():
+    calls = []
+
+    async def handler(key, items):
+        calls.append(list(items))
+        if 0 in items:
+            raise ValueError("invalid input")
+        return items
+
+    batcher = MicroBatcher(
+        handler, max_items=100, max_delay=0.01, split_errors=(ValueError,)
+    )
+    results = await asyncio.gather(
+        batcher.submit("m", [1, 2]),
+        batcher.submit("m", [0]),
+        batcher.submit("m", [3]),
+        return_exceptions=True,
+    )
+
+    assert results[0] == [1, 2] and results[2] == [3]
+    assert isinstance(results[1], ValueError)
+    assert calls[0] == [1, 2, 0, 3]
+    assert sorted(calls[1:]) == [[0], [1, 2], [3]]
+
+
+@pytest.mark.asyncio
+async def test_other_errors_fail_the_whole_batch():
+    calls = []
+
+    async def handler(key, items):
+        calls.append(list(items))
+        raise RuntimeError("rate limited")
+
+    batcher = MicroBatcher(
+        handler, max_items=100, max_delay=0.01, split_errors=(ValueError,)
+    )
+    results = await asyncio.gather(
+        batcher.submit("m", [1]), batcher.submit("m", [2]), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert calls == [[1, 2]]
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from src.core.concurrency import AdaptiveConcurrencyLimiter
+
+
+@pytest.mark.asyncio
+async def test_limit_grows_on_success_and_halves_when_throttled():
+    limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=4)
+    for _ in range(20):
+        await limiter.acquire()
+        await limiter.release()
+    assert limiter.limit == 4
+
+    await limiter.acquire()
+    await limiter.release(throttled=True)
+    assert limiter.limit == 2
+
+    for _ in range(3):
+        await limiter.acquire()
+        await limiter.release(throttled=True)
+    assert limiter.limit == 1
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_a_free_slot():
+    limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=1)
+    await limiter.acquire()
+
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    await limiter.release()
+    await asyncio.wait_for(waiter, 1)
+    assert limiter.in_flight == 1
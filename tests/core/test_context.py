@@ -0,0 +1,73 @@
+import pytest
+
+from src.core.context import (
+    ContextPolicy,
+    fit_messages,
+    get_context_limit,
+    get_context_policy,
+)
+from src.core.exceptions import ContextLengthExceededError
+from src.core.tokens import REPLY_PRIMING_TOKENS
+
+MESSAGES = [
+    {"role": "system", "content": "rules"},
+    {"role": "user", "content": "task"},
+    {"role": "assistant", "content": "a1"},
+    {"role": "user", "content": "q2"},
+    {"role": "assistant", "content": "a2"},
+    {"role": "user", "content": "q3"},
+]
+TOKENS = [10, 10, 10, 10, 10, 10]
+
+
+def contents(messages):
+    return [message["content"] for message in messages]
+
+
+def test_get_context_limit_matches_longest_prefix():
+    limits = {"gpt-4": 8192, "gpt-4-32k": 32768}
+    assert get_context_limit("gpt-4-0613", limits, 4096) == 8192
+    assert get_context_limit("gpt-4-32k-0613", limits, 4096) == 32768
+    assert get_context_limit("claude", limits, 4096) == 4096
+
+
+def test_fitting_conversation_is_unchanged():
+    limit = 60 + REPLY_PRIMING_TOKENS
+    assert fit_messages(MESSAGES, TOKENS, limit, ContextPolicy.REJECT) is MESSAGES
+
+
+def test_reject_policy_raises():
+    with pytest.raises(ContextLengthExceededError):
+        fit_messages(MESSAGES, TOKENS, 50, ContextPolicy.REJECT)
+
+
+def test_drop_oldest_keeps_system_and_recent_turns():
+    limit = 40 + REPLY_PRIMING_TOKENS
+    fitted = fit_messages(MESSAGES, TOKENS, limit, ContextPolicy.DROP_OLDEST)
+    assert contents(fitted) == ["rules", "q2", "a2", "q3"]
+
+
+def test_truncate_middle_keeps_first_turn():
+    limit = 40 + REPLY_PRIMING_TOKENS
+    fitted = fit_messages(MESSAGES, TOKENS, limit, ContextPolicy.TRUNCATE_MIDDLE)
+    assert contents(fitted) == ["rules", "task", "a2", "q3"]
+
+
+def test_reserved_tokens_reduce_budget():
+    limit = 60 + REPLY_PRIMING_TOKENS
+    fitted = fit_messages(
+        MESSAGES, TOKENS, limit, ContextPolicy.DROP_OLDEST, reserved_tokens=20
+    )
+    assert contents(fitted) == ["rules", "q2", "a2", "q3"]
+
+
+def test_trimming_that_cannot_fit_raises():
+    with pytest.raises(ContextLengthExceededError):
+        fit_messages(MESSAGES, TOKENS, 15, ContextPolicy.DROP_OLDEST)
+
+
+def test_get_context_policy_falls_back_on_unknown_values():
+    default = ContextPolicy.DROP_OLDEST
+    assert get_context_policy(None, default) == default
+    assert get_context_policy({"context_policy": "reject"}, default) == "reject"
+    assert get_context_policy({"context_policy": "newest"}, default) == default
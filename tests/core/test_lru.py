@@ -0,0 +1,22 @@
+from src.core.lru import ByteLRUCache
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = ByteLRUCache(max_bytes=10)
+    cache.set("a", "aaaa", 4)
+    cache.set("b", "bbbb", 4)
+    assert cache.get("a") == "aaaa"
+
+    cache.set("c", "ccc", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.size == 7
+
+
+def test_skips_values_larger_than_budget_and_replaces_existing():
+    cache = ByteLRUCache(max_bytes=10)
+    cache.set("a", "small", 5)
+    cache.set("a", "huge", 11)
+    assert cache.get("a") is None
+    assert cache.size == 0
+    assert len(cache) == 0
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+from src.core.quota_journal import QuotaJournal
+
+KEY = ("t1", "u1", "k1", (None, "daily", None))
+HOUR = datetime(2024, 5, 1, 23)
+
+
+def test_allowance_is_a_share_of_the_last_seen_headroom():
+    journal = QuotaJournal(share=0.1)
+    journal.observe(KEY, {"tenant_usage": 9_000, "user_usage": 100, "api_key_usage": 0})
+
+    assert journal.allowance(KEY, [10_000, None, 500]) == [100, None, 50]
+    journal.record(KEY, 40)
+    assert journal.allowance(KEY, [10_000, None, 500]) == [60, None, 10]
+
+
+def test_unseen_counters_get_a_share_of_the_limit():
+    journal = QuotaJournal(share=0.1)
+    assert journal.allowance(KEY, [10_000, 1_000, None]) == [1_000, 100, None]
+
+    # Exhausted limits allow nothing
+    journal.observe(KEY, {"tenant_usage": 12_000})
+    assert journal.allowance(KEY, [10_000, 1_000, None])[0] == 0
+
+
+def test_drain_hands_over_the_journal_once():
+    journal = QuotaJournal(share=0.1)
+    journal.observe(KEY, {"tenant_usage": 10, "user_usage": 5, "api_key_usage": 1})
+    other = ("t1", "u2", None, (None, None, None))
+
+    assert journal.record(KEY, 20, HOUR) == {
+        "tenant_usage": 30,
+        "user_usage": 25,
+        "api_key_usage": 21,
+    }
+    journal.record(other, 7, HOUR)
+    journal.record(KEY, 3, HOUR.replace(minute=59))
+    assert journal.pending_tokens == 30
+
+    assert journal.drain() == {(KEY, HOUR): 23, (other, HOUR): 7}
+    assert journal.pending_tokens == 0
+    assert journal.drain() == {}
+    assert journal.usage(KEY) == {
+        "tenant_usage": 10,
+        "user_usage": 5,
+        "api_key_usage": 1,
+    }
+
+
+def test_known_usage_is_bounded():
+    journal = QuotaJournal(share=0.1, max_entries=2)
+    journal.observe(KEY, {"tenant_usage": 1, "user_usage": 2, "api_key_usage": 3})
+    assert journal.usage(KEY) == {
+        "tenant_usage": 0,
+        "user_usage": 2,
+        "api_key_usage": 3,
+    }
+
+
+def test_journal_keeps_the_hour_usage_was_charged_in():
+    journal = QuotaJournal(share=0.1)
+    journal.record(KEY, 5, HOUR.replace(minute=30))
+    journal.record(KEY, 7, datetime(2024, 5, 2, 0, 10))
+
+    assert journal.usage(KEY)["user_usage"] == 12
+    assert journal.drain() == {(KEY, HOUR): 5, (KEY, datetime(2024, 5, 2)): 7}
@@ -0,0 +1,41 @@
+import time
+
+from src.core.quota_lease import QuotaLease
+
+
+def test_consume_reports_tokens_beyond_the_lease():
+    lease = QuotaLease(ttl=10)
+    lease.grant(100, [1100, 600])
+    assert not lease.expired
+
+    assert lease.consume(60) == 0
+    assert lease.usage() == [1060, 560]
+    assert lease.consume(60) == 20
+    assert lease.available == 0
+
+
+def test_take_unused_expires_the_lease():
+    lease = QuotaLease(ttl=10)
+    lease.grant(100, [100])
+    assert lease.take_unused() == 100
+    assert lease.available == 0
+    assert lease.expired
+
+
+def test_next_block_follows_rate_within_bounds():
+    lease = QuotaLease(ttl=10)
+    assert lease.next_block(10, 5.0, 1_000, 100_000) == 1_000
+    assert lease.next_block(5_000, 5.0, 1_000, 100_000) == 5_000
+
+    lease.rate = 10_000.0
+    assert lease.next_block(10, 5.0, 1_000, 100_000) == 50_000
+    lease.rate = 1e9
+    assert lease.next_block(10, 5.0, 1_000, 100_000) == 100_000
+
+
+def test_rate_tracks_consumption():
+    lease = QuotaLease(ttl=10, half_life=0.01)
+    lease.grant(10_000, [0])
+    time.sleep(0.02)
+    lease.consume(500)
+    assert lease.rate > 0
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from src.core.quota_window import QuotaWindow, bucket_usage, is_lifetime, quota_buckets
+
+
+def test_lifetime_is_a_plain_counter():
+    now = datetime(2026, 10, 19, 13, 30)
+    assert quota_buckets(None, now) == [("", [], -1)]
+    assert quota_buckets(QuotaWindow.LIFETIME, now) == [("", [], -1)]
+    assert is_lifetime("lifetime") and not is_lifetime("daily")
+
+
+def test_daily_sums_the_hours_of_the_day():
+    suffix, fields, ttl = quota_buckets("daily", datetime(2026, 10, 19, 2, 5))[0]
+    assert suffix == ":hours:20261019"
+    assert fields == ["0", "1", "2"]
+    assert ttl == 2 * 86_400
+
+
+def test_monthly_sums_the_days_of_the_month():
+    [(suffix, fields, ttl)] = quota_buckets("monthly", datetime(2026, 2, 3, 23))
+    assert suffix == ":days:202602"
+    assert fields == ["1", "2", "3"]
+    assert ttl == 29 * 86_400
+
+
+def test_rolling_spans_day_hashes():
+    buckets = quota_buckets("rolling", datetime(2026, 10, 19, 1, 59), rolling_hours=5)
+    assert [(suffix, fields) for suffix, fields, _ in buckets] == [
+        (":hours:20261018", ["21", "22", "23"]),
+        (":hours:20261019", ["0", "1"]),
+    ]
+
+    # The current hour is always the last field
+    [(_, fields, _)] = quota_buckets("rolling", datetime(2026, 10, 19, 23), 24)
+    assert fields == [str(hour) for hour in range(24)]
+
+
+def test_bucket_usage_rebuilds_windows_from_hourly_usage():
+    now = datetime(2026, 10, 19, 1, 30)
+    hourly = {
+        datetime(2026, 10, 18, 21): 5,
+        datetime(2026, 10, 18, 23): 7,
+        datetime(2026, 10, 19, 1): 11,
+    }
+
+    assert bucket_usage(None, now, 100, hourly) == {("", None): 100}
+    assert bucket_usage("daily", now, 100, hourly) == {
+        (":hours:20261019", "0"): 0,
+        (":hours:20261019", "1"): 11,
+    }
+    assert bucket_usage("monthly", now, 100, hourly) == {
+        (":days:202610", str(day)): 0 for day in range(1, 19)
+    } | {(":days:202610", "18"): 12, (":days:202610", "19"): 11}
+    # Hours outside the window are left out
+    assert bucket_usage("rolling", now, 100, hourly, rolling_hours=4) == {
+        (":hours:20261018", "22"): 0,
+        (":hours:20261018", "23"): 7,
+        (":hours:20261019", "0"): 0,
+        (":hours:20261019", "1"): 11,
+    }
@@ -0,0 +1,109 @@
+from src.core.ratelimit import (
+    RateLimitResult,
+    rate_limit_rules,
+    token_bucket_rules,
+    validate_rate_limit_config,
+)
+
+
+def test_default_key_limit_without_tenant_config():
+    rules = rate_limit_rules("t1", "k1", {}, default_limit=100, default_period=3600)
+    assert [(r.scope, r.key, r.limit, r.period) for r in rules] == [
+        ("api_key", "api_key:k1", 100, 3600)
+    ]
+
+
+def test_tenant_and_key_limits_from_config():
+    config = {
+        "rate_limit": {
+            "tenant": {"requests": 6000, "period": 60},
+            "api_key": {"requests": 0},
+        }
+    }
+    rules = rate_limit_rules("t1", "k1", config, default_limit=100, default_period=3600)
+    assert [(r.scope, r.limit, r.period) for r in rules] == [("tenant", 6000, 60)]
+
+
+def test_legacy_flat_config_limits_the_tenant():
+    config = {"rate_limit": {"requests": 500, "period": 60}}
+    rules = rate_limit_rules("t1", "k1", config, default_limit=100, default_period=3600)
+    assert [(r.scope, r.key, r.limit, r.period) for r in rules] == [
+        ("tenant", "tenant:t1", 500, 60),
+        ("api_key", "api_key:k1", 100, 3600),
+    ]
+
+
+def test_validate_rate_limit_config_accepts_both_shapes():
+    assert validate_rate_limit_config({"requests": 500, "period": 60}) == []
+    assert (
+        validate_rate_limit_config(
+            {"tenant": {"requests": 6000, "period": 60}, "api_key": {"requests": 0}}
+        )
+        == []
+    )
+    assert validate_rate_limit_config({"requests": 500}) == [
+        "rate_limit must contain 'requests' and 'period' fields"
+    ]
+    errors = validate_rate_limit_config({"tenant": {"requests": "many", "period": 0}})
+    assert errors == [
+        "rate_limit.tenant.requests must be a non-negative integer",
+        "rate_limit.tenant.period must be a positive integer",
+    ]
+    assert validate_rate_limit_config([]) == ["rate_limit must be an object"]
+
+
+def test_headers_include_retry_after_only_when_rejected():
+    allowed = RateLimitResult(allowed=True, limit=10, remaining=3, reset=12.2)
+    assert allowed.headers() == {
+        "X-RateLimit-Limit": "10",
+        "X-RateLimit-Remaining": "3",
+        "X-RateLimit-Reset": "13",
+    }
+
+    rejected = RateLimitResult(allowed=False, limit=10, remaining=0, reset=0.2)
+    assert rejected.headers()["Retry-After"] == "1"
+
+
+def test_token_buckets_per_scope_with_model_config_first():
+    config = {
+        "rate_limit": {
+            "tenant": {"tpm": 200000, "rpm": 1000},
+            "models": {"gpt-4": {"tpm": 1}, "gpt-3.5-turbo": {"rpm": 500}},
+        }
+    }
+    rules = token_bucket_rules("t1", "k1", "gpt-4", config, {"tpm": 80000})
+    assert [(r.key, r.per_minute) for r in rules] == [
+        ("tenant:t1:tokens", 200000),
+        ("tenant:t1:requests", 1000),
+        ("model:t1:gpt-4:tokens", 80000),
+    ]
+    assert rules[0].refill_per_ms == 200000 / 60000
+
+    rules = token_bucket_rules("t1", "k1", "gpt-3.5-turbo", config, {})
+    assert [(r.scope, r.unit) for r in rules][-1] == ("model", "requests")
+
+
+def test_no_token_buckets_without_config():
+    assert token_bucket_rules("t1", "k1", "gpt-4", None) == []
+
+
+def test_validate_rate_limit_config_checks_token_buckets():
+    config = {
+        "tenant": {"tpm": 200000, "rpm": 1000},
+        "api_key": {"tpm": 40000},
+        "models": {"gpt-4": {"tpm": 80000, "rpm": 200}},
+    }
+    assert validate_rate_limit_config(config) == []
+
+    config = {
+        "tenant": {"tpm": "200k", "rpn": 5},
+        "models": {"gpt-4": {"rpm": 0, "requests": 10}},
+        "model": {},
+    }
+    assert sorted(validate_rate_limit_config(config)) == [
+        "rate_limit.model is not a known field",
+        "rate_limit.models.gpt-4.requests is not a known field",
+        "rate_limit.models.gpt-4.rpm must be a positive integer",
+        "rate_limit.tenant.rpn is not a known field",
+        "rate_limit.tenant.tpm must be a positive integer",
+    ]
@@ -0,0 +1,100 @@
+import multiprocessing
+
+from src.core.shm import SharedCounterTable, key_hash
+
+PERIOD = 60_000
+NOW = 600_000  # start of window 10
+
+
+def _hit(path: str, key: int, times: int) -> None:
+    table = SharedCounterTable(path, slots=64)
+    for _ in range(times):
+        table.add(key, PERIOD, now_ms=NOW)
+    table.close()
+
+
+def test_counts_are_shared_between_processes(tmp_path):
+    path = str(tmp_path / "counters")
+    key = key_hash("tenant:t1")
+    workers = [
+        multiprocessing.Process(target=_hit, args=(path, key, 200)) for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    table = SharedCounterTable(path, slots=64)
+    assert table.estimate(key, PERIOD, now_ms=NOW) == (800, PERIOD)
+
+
+def test_estimate_weights_the_previous_window(tmp_path):
+    table = SharedCounterTable(str(tmp_path / "counters"), slots=64)
+    key = key_hash("api_key:k1")
+    table.add(key, PERIOD, amount=100, now_ms=NOW)
+    table.set_global(key, PERIOD, 10, 50, now_ms=NOW)
+
+    # A quarter into the next window, 3/4 of the previous one still counts
+    count, reset_ms = table.estimate(key, PERIOD, now_ms=NOW + PERIOD + 15_000)
+    assert count == 150 * 0.75
+    assert reset_ms == 45_000
+
+
+def test_drain_takes_pending_counts_once(tmp_path):
+    table = SharedCounterTable(str(tmp_path / "counters"), slots=64)
+    key = key_hash("tenant:t1")
+    table.add(key, PERIOD, amount=3, now_ms=NOW)
+    assert table.drain() == [(key, PERIOD, 10, 3)]
+    assert table.drain() == [(key, PERIOD, 10, 0)]
+
+    # Counts of a window that ended before a sync are still pushed
+    table.add(key, PERIOD, amount=2, now_ms=NOW)
+    table.add(key, PERIOD, amount=1, now_ms=NOW + PERIOD)
+    assert table.drain() == [(key, PERIOD, 10, 2), (key, PERIOD, 11, 1)]
+
+
+def test_restore_puts_back_current_counts(tmp_path):
+    table = SharedCounterTable(str(tmp_path / "counters"), slots=64)
+    key = key_hash("tenant:t1")
+    table.add(key, PERIOD, amount=5, now_ms=NOW)
+    table.restore(table.take(key, PERIOD, now_ms=NOW), now_ms=NOW)
+    assert table.estimate(key, PERIOD, now_ms=NOW)[0] == 5
+
+
+def test_full_table_and_stale_slots(tmp_path):
+    table = SharedCounterTable(str(tmp_path / "counters"), slots=4, max_probe=4)
+    keys = [key_hash(f"tenant:{i}") for i in range(5)]
+    for key in keys[:4]:
+        assert table.add(key, PERIOD, now_ms=NOW)
+    assert not table.add(keys[4], PERIOD, now_ms=NOW)
+    assert table.estimate(keys[4], PERIOD, now_ms=NOW) is None
+
+    # Synced slots two windows old are reused
+    table.drain()
+    assert table.add(keys[4], PERIOD, now_ms=NOW + 2 * PERIOD)
+
+
+def test_sync_is_claimed_once_per_interval(tmp_path):
+    path = str(tmp_path / "counters")
+    first = SharedCounterTable(path, slots=64)
+    second = SharedCounterTable(path, slots=64)
+    assert first.try_begin_sync(250, now_ms=NOW)
+    assert not second.try_begin_sync(250, now_ms=NOW + 100)
+    assert second.try_begin_sync(250, now_ms=NOW + 250)
+
+
+def test_colliding_key_keeps_its_slot_when_an_earlier_one_goes_stale(tmp_path):
+    table = SharedCounterTable(str(tmp_path / "counters"), slots=8, max_probe=8)
+    table.add(1, PERIOD, now_ms=NOW)
+    table.add(9, PERIOD, now_ms=NOW)  # Collides with key 1, probes to slot 2
+    table.drain()
+    table.add(9, PERIOD, amount=5, now_ms=NOW + PERIOD)
+
+    # Key 1's slot is stale two windows later, key 9 must still be found
+    count, _ = table.estimate(9, PERIOD, now_ms=NOW + 2 * PERIOD)
+    assert count == 5
+    assert [table._read(i)[0] for i in range(8)].count(9) == 1
+
+    # The stale slot is reclaimed by a new key of the chain
+    table.add(17, PERIOD, now_ms=NOW + 2 * PERIOD)
+    assert table._read(1)[0] == 17
@@ -0,0 +1,55 @@
+from src.core.similarity import SimHashIndex, normalize_text, similarity, simhash
+
+
+def test_normalize_text_strips_volatile_fragments():
+    a = normalize_text("Order  8812 placed at 2024-05-01T10:22:31Z by 3f2b9c1e-1d2a-4c3b-9e8f-0a1b2c3d4e5f")
+    b = normalize_text("order 8812 placed at 2025-01-09T08:00:00Z  by 9c1d2e3f-4a5b-4c6d-8e7f-1a2b3c4d5e6f")
+    assert a == b
+
+
+def test_normalize_text_keeps_numbers():
+    a = normalize_text("What is 17 * 23? Answer with the number only.")
+    b = normalize_text("What is 91 * 44? Answer with the number only.")
+    assert a != b
+    assert simhash(a) != simhash(b)
+
+
+def test_similar_texts_have_close_fingerprints():
+    base = normalize_text("Summarize the following support ticket for the on-call engineer " * 5)
+    edited = base + " please"
+    unrelated = normalize_text("Write a haiku about autumn leaves falling in the quiet park")
+
+    assert similarity(simhash(base), simhash(edited)) > 0.9
+    assert similarity(simhash(base), simhash(unrelated)) < 0.9
+
+
+def test_index_returns_best_match():
+    index = SimHashIndex(max_entries=10, bands=8)
+    fingerprint = simhash(normalize_text("translate this paragraph into french please"))
+    index.add(fingerprint, "cached")
+
+    score, value = index.query(fingerprint ^ 0b101)
+    assert value == "cached"
+    assert score == 1 - 2 / 64
+
+
+def test_index_is_bounded():
+    index = SimHashIndex(max_entries=2, bands=8)
+    index.add(1, "a")
+    index.add(2 << 20, "b")
+    index.add(3 << 40, "c")
+
+    assert len(index) == 2
+    match = index.query(1)
+    assert match is None or match[1] != "a"
+
+
+def test_evict_oldest_removes_least_recently_used():
+    index = SimHashIndex(max_entries=10, bands=8)
+    index.add(1, "a")
+    index.add(2 << 20, "b")
+    index.query(1)
+    index.evict_oldest()
+
+    assert len(index) == 1
+    assert index.query(1)[1] == "a"
@@ -0,0 +1,32 @@
+import pytest
+
+from src.core.exceptions import ValidationError
+from src.core.templates import (
+    render_template,
+    static_prefix_length,
+    template_variables,
+)
+
+TEMPLATE = [
+    {"role": "system", "content": 'Answer as JSON like {"answer": "..."}'},
+    {"role": "system", "content": "Company policy: be polite."},
+    {"role": "user", "content": "Customer {{ name }} asks: {{question}}"},
+]
+
+
+def test_template_variables_and_static_prefix():
+    assert template_variables(TEMPLATE) == {"name", "question"}
+    assert static_prefix_length(TEMPLATE) == 2
+    assert static_prefix_length(TEMPLATE[:2]) == 2
+
+
+def test_render_template_leaves_literal_braces():
+    rendered = render_template(TEMPLATE, {"name": "Ada", "question": "Refund?"})
+    assert rendered[0] == TEMPLATE[0]
+    assert rendered[2]["content"] == "Customer Ada asks: Refund?"
+
+
+def test_render_template_requires_all_variables():
+    with pytest.raises(ValidationError) as exc_info:
+        render_template(TEMPLATE, {"name": "Ada"})
+    assert exc_info.value.extra["errors"] == {"template_variables": ["question"]}
@@ -0,0 +1,70 @@
+from src.core.tokens import (
+    REPLY_PRIMING_TOKENS,
+    TokenEstimator,
+    count_message_tokens,
+    count_single_message_tokens,
+)
+
+
+class WhitespaceEncoding:
+    """Stand-in encoding with one token per whitespace-separated word"""
+
+    name = "whitespace"
+
+    def encode_ordinary(self, text):
+        return text.split()
+
+
+def test_count_single_message_applies_overhead():
+    encoding = WhitespaceEncoding()
+    message = {"role": "user", "content": "hello there"}
+    # 3 per message + 1 for role + 2 for content
+    assert count_single_message_tokens(message, "gpt-4", encoding) == 6
+
+
+def test_count_message_tokens_name_adjustment():
+    encoding = WhitespaceEncoding()
+    message = {"role": "user", "name": "bob", "content": "hi"}
+    assert count_single_message_tokens(message, "gpt-4", encoding) == 3 + 3 + 1
+    assert count_single_message_tokens(message, "gpt-3.5-turbo-0301", encoding) == 4 + 3 - 1
+
+
+def test_count_message_tokens_adds_reply_priming():
+    encoding = WhitespaceEncoding()
+    messages = [
+        {"role": "system", "content": "be brief"},
+        {"role": "user", "content": "what is two plus two"},
+    ]
+    expected = REPLY_PRIMING_TOKENS + (3 + 1 + 2) + (3 + 1 + 5)
+    assert count_message_tokens(messages, "gpt-4", encoding) == expected
+
+
+def test_count_message_tokens_ignores_non_string_values():
+    encoding = WhitespaceEncoding()
+    messages = [{"role": "user", "content": "hi", "function_call": None}]
+    assert count_message_tokens(messages, "gpt-4", encoding) == REPLY_PRIMING_TOKENS + 5
+
+
+def test_count_message_tokens_ignores_content_ref():
+    encoding = WhitespaceEncoding()
+    messages = [{"role": "user", "content": "hi", "content_ref": None}]
+    assert count_message_tokens(messages, "gpt-4", encoding) == REPLY_PRIMING_TOKENS + 5
+
+
+def test_estimator_is_byte_bound_until_calibrated():
+    estimator = TokenEstimator(margin=0.1, min_samples=2)
+    messages = [{"role": "user", "content": "héllo"}]
+    # "user" (4 bytes) + "héllo" (6 bytes) + 3 format + 3 priming
+    assert estimator.estimate(messages, "gpt-4") == 16
+
+
+def test_estimator_uses_highest_observed_ratio_with_margin():
+    estimator = TokenEstimator(margin=0.25, min_samples=2)
+    messages = [{"role": "user", "content": "x" * 96}]
+    # 100 bytes, 6 format tokens
+    estimator.observe(messages, "gpt-4", 6 + 20)
+    estimator.observe(messages, "gpt-4", 6 + 40)
+
+    assert estimator.ratio("gpt-4") == 0.5
+    assert estimator.estimate(messages, "gpt-4") == 6 + 50
+    assert estimator.ratio("gpt-3.5-turbo") == 1.0
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from src.core import utils
+from src.core.utils import chunk_text
+
+
+class CharEncoding:
+    """Stand-in encoding with one token per character"""
+
+    name = "chars"
+
+    def encode_ordinary(self, text):
+        return [ord(c) for c in text]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+
+@pytest.fixture(autouse=True)
+def char_encoding(monkeypatch):
+    monkeypatch.setattr(utils, "get_encoding", lambda model: CharEncoding())
+
+
+def test_chunk_text_short_text_is_single_chunk():
+    assert list(chunk_text("hello", max_tokens=10, overlap=2)) == ["hello"]
+
+
+def test_chunk_text_overlaps_chunks():
+    chunks = list(chunk_text("abcdefghij", max_tokens=4, overlap=1))
+    assert chunks == ["abcd", "defg", "ghij"]
+
+
+def test_chunk_text_streams_segments():
+    pieces = ["abc def ", "ghi jkl ", "mno"]
+    chunks = list(chunk_text(pieces, max_tokens=5, overlap=0, segment_chars=4))
+    assert "".join(chunks) == "abc def ghi jkl mno"
+    assert all(len(chunk) <= 5 for chunk in chunks)
+
+
+def test_chunk_text_is_lazy():
+    chunks = chunk_text("x" * 1000, max_tokens=10, overlap=0)
+    assert next(chunks) == "x" * 10
+
+
+def test_segments_of_a_large_string_take_linear_time():
+    text = "lorem ipsum " * (32 * 1024 * 1024 // 12)
+    start = time.perf_counter()
+    segments = list(utils._iter_segments(text, 65_536))
+    elapsed = time.perf_counter() - start
+
+    assert "".join(segments) == text
+    assert all(len(segment) <= 65_536 for segment in segments)
+    assert elapsed < 1.0
+
+
+def test_chunk_text_rejects_overlap_not_below_max_tokens():
+    with pytest.raises(ValueError):
+        list(chunk_text("abc", max_tokens=2, overlap=2))